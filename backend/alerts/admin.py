@@ -3,6 +3,6 @@ from .models import Alert
 
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
-    list_display = ('title', 'equipment', 'type', 'status', 'created_at')
-    list_filter = ('type', 'status', 'equipment__site__company')
+    list_display = ('title', 'equipment', 'type', 'status', 'rule', 'created_at')
+    list_filter = ('type', 'status', 'company')
     search_fields = ('title', 'message')
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search(using, **kwargs):
+    # Sur SQLite, une migration qui reconstruit alerts_alert supprime ses triggers
+    from django.db import connections
+    from .search import install, is_installed
+    connection = connections[using]
+    # Seulement si la migration de l'index est appliquée (pas après un retour en arrière)
+    if is_installed(connection):
+        install(connection)
 
 
 class AlertsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'alerts'
+
+    def ready(self):
+        post_migrate.connect(install_search, sender=self)
@@ -0,0 +1,172 @@
+"""
+Opérations en masse sur les alertes (acquittement, résolution, réouverture, suppression).
+
+Les alertes visées sont désignées par identifiants (``alert_ids``), par un
+filtre (``filter``: site, équipement, type, statut, règle, période de création)
+ou les deux (intersection). Chaque transition de l'automate
+(active -> acknowledged, active/acknowledged -> resolved, resolved -> active)
+est un UPDATE par statut d'origine, avec ``resolved_at`` et ``updated_at``
+calculés en SQL: le nombre de lignes modifiées par statut d'origine est exact
+sans relire les alertes. Les alertes qui ne peuvent pas suivre la transition
+sont comptées comme ignorées.
+
+Ces écritures contournent les signaux ``post_save`` / ``post_delete``:
+cache des alertes ouvertes, statut des équipements, traces de suppression et
+génération du cache de l'entreprise sont mis à jour ici, une fois par lot.
+"""
+from collections import Counter
+
+from django.db import connections, models, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Now
+
+from metrics.rollups import parse_datetime_param
+from metrics.status import update_statuses
+from metrics.thresholds import open_alert_cache
+from sync.models import Tombstone
+from vigileos.cache import bump_generation
+from .models import Alert
+
+# Action -> (statut cible, statuts d'origine admis)
+TRANSITIONS = {
+    'acknowledge': ('acknowledged', ('active',)),
+    'resolve': ('resolved', ('active', 'acknowledged')),
+    'reopen': ('active', ('resolved',)),
+}
+# Taille des listes d'identifiants passées en IN (limite de paramètres SQLite)
+CHUNK_SIZE = 10000
+
+# Clé du filtre -> (lookup, conversion)
+FILTERS = {
+    'site': ('equipment__site_id', int),
+    'equipment': ('equipment_id', int),
+    'type': ('type', str),
+    'status': ('status', str),
+    'rule': ('rule', str),
+}
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+def select_alerts(queryset, data):
+    """Restreint ``queryset`` aux alertes désignées par la requête; ValueError si rien ne les désigne"""
+    alert_ids = data.get('alert_ids')
+    criteria = data.get('filter')
+    if not alert_ids and not criteria:
+        raise ValueError("alert_ids ou filter requis")
+
+    if alert_ids:
+        if not isinstance(alert_ids, list):
+            raise ValueError("alert_ids: liste d'identifiants attendue")
+        try:
+            queryset = queryset.filter(id__in=[int(pk) for pk in alert_ids])
+        except (TypeError, ValueError):
+            raise ValueError("alert_ids: liste d'identifiants attendue")
+
+    if criteria:
+        if not isinstance(criteria, dict):
+            raise ValueError('filter: objet attendu')
+        unknown = set(criteria) - set(FILTERS) - {'from', 'to'}
+        if unknown:
+            raise ValueError(f"filter: critères inconnus {', '.join(sorted(unknown))}")
+        for key, (lookup, cast) in FILTERS.items():
+            if key not in criteria:
+                continue
+            # Une valeur ou une liste de valeurs
+            values = criteria[key] if isinstance(criteria[key], list) else [criteria[key]]
+            try:
+                values = [cast(value) for value in values]
+            except (TypeError, ValueError):
+                raise ValueError(f'filter.{key}: valeur invalide')
+            queryset = queryset.filter(**{f'{lookup}__in': values})
+        for key, lookup in (('from', 'created_at__gte'), ('to', 'created_at__lt')):
+            if key in criteria:
+                parsed = parse_datetime_param(str(criteria[key]), f'filter.{key}')
+                queryset = queryset.filter(**{lookup: parsed})
+    return queryset.order_by()
+
+
+def _after_write(company_id, touched):
+    """Effets des signaux d'enregistrement, pour un lot de (équipement, règle)"""
+    keys = [key for key in touched if key[1]]
+    if keys:
+        open_alert_cache.invalidate(keys)
+        transaction.on_commit(lambda: open_alert_cache.invalidate(keys))
+    for equipment_ids in _chunks({equipment_id for equipment_id, _ in touched}):
+        update_statuses(equipment_ids)
+    bump_generation([company_id])
+
+
+def transition(queryset, action, company_id):
+    """
+    Applique ``action`` (voir TRANSITIONS) aux alertes de ``queryset``.
+    Renvoie {'updated', 'by_status': {statut d'origine: nombre}, 'skipped'}.
+    """
+    target, sources = TRANSITIONS[action]
+    eligible = queryset.filter(status__in=sources)
+    if action == 'reopen':
+        # Le moteur de seuils suit une seule alerte ouverte par (équipement, règle), quelle que
+        # soit sa sévérité: seule la plus récente d'une règle se rouvre, et seulement si aucune
+        # autre n'est ouverte
+        same_rule = Alert.objects.filter(equipment_id=OuterRef('equipment_id'), rule=OuterRef('rule'))
+        eligible = eligible.filter(
+            Q(rule='')
+            | ~Exists(same_rule.filter(pk__gt=OuterRef('pk'))) & ~Exists(same_rule.filter(status__in=Alert.OPEN_STATUSES))
+        )
+
+    values = {'status': target, 'updated_at': Now()}
+    if target == 'resolved':
+        values['resolved_at'] = Now()
+    elif target == 'active':
+        values['resolved_at'] = None
+
+    with transaction.atomic():
+        selected = queryset.count()
+        touched = set(eligible.values_list('equipment_id', 'rule').distinct())
+        by_status = {source: eligible.filter(status=source).update(**values) for source in sources}
+        updated = sum(by_status.values())
+        if updated:
+            _after_write(company_id, touched)
+    return {'updated': updated, 'by_status': by_status, 'skipped': max(0, selected - updated)}
+
+
+def _cascades():
+    """Relations vers Alert qui demandent une suppression en cascade (l'index de recherche suit par trigger)"""
+    return [rel for rel in Alert._meta.related_objects if rel.on_delete is not models.DO_NOTHING]
+
+
+def _delete_ids(using, pks):
+    """DELETE SQL par paquets d'identifiants, sans passer par le collecteur ni les signaux"""
+    connection = connections[using]
+    table = connection.ops.quote_name(Alert._meta.db_table)
+    column = connection.ops.quote_name(Alert._meta.pk.column)
+    with connection.cursor() as cursor:
+        for chunk in _chunks(pks):
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def delete(queryset, company_id):
+    """
+    Supprime les alertes de ``queryset`` par paquets d'identifiants, avec leurs traces
+    de suppression. Renvoie {'deleted', 'by_status': {statut: nombre}}.
+    """
+    with transaction.atomic(using=queryset.db):
+        rows = list(queryset.values_list('id', 'equipment_id', 'rule', 'status'))
+        pks = [pk for pk, _, _, _ in rows]
+        if _cascades():
+            # Dépendances à supprimer: suppression standard, signaux par alerte compris
+            for chunk in _chunks(pks):
+                Alert.objects.using(queryset.db).filter(pk__in=chunk).delete()
+        elif rows:
+            _delete_ids(queryset.db, pks)
+            Tombstone.objects.bulk_create(
+                [Tombstone(company_id=company_id, model='alert', object_id=pk) for pk in pks],
+                batch_size=CHUNK_SIZE,
+            )
+            _after_write(company_id, {(equipment_id, rule) for _, equipment_id, rule, _ in rows})
+    by_status = Counter(status for _, _, _, status in rows)
+    return {'deleted': len(rows), 'by_status': dict(by_status)}
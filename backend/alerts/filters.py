@@ -0,0 +1,33 @@
+from django.db import connection
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .search import SearchRank, supports_search
+
+
+class AlertSearchFilter(SearchFilter):
+    """
+    ``?search=`` sur l'index plein texte: tous les mots, chacun en préfixe, avec
+    un score ``search_rank``. Repli sur les ``icontains`` de ``search_fields``
+    pour une base sans index.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not supports_search(connection):
+            return super().filter_queryset(request, queryset, view)
+        query = ' '.join(terms)
+        return queryset.filter(search__document__match=query).annotate(
+            search_rank=SearchRank('search__document', query)
+        )
+
+
+class AlertOrderingFilter(OrderingFilter):
+    """Sans ``?ordering=``, une recherche trie par pertinence puis par date"""
+
+    def get_ordering(self, request, queryset, view):
+        if (
+            self.ordering_param not in request.query_params
+            and 'search_rank' in queryset.query.annotations
+        ):
+            return ['-search_rank', '-created_at']
+        return super().get_ordering(request, queryset, view)
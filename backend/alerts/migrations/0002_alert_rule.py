@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='rule',
+            field=models.CharField(blank=True, default='', help_text="Règle de seuil à l'origine de l'alerte (vide pour une alerte manuelle)", max_length=50, verbose_name='Règle'),
+        ),
+    ]
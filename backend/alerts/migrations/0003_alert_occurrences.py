@@ -0,0 +1,47 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:33
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+
+def resolve_duplicate_open_alerts(apps, schema_editor):
+    """Ne garde ouverte que l'alerte la plus récente par (equipment, rule, type)"""
+    Alert = apps.get_model('alerts', 'Alert')
+    open_alerts = Alert.objects.filter(status__in=['active', 'acknowledged']).exclude(rule='')
+    duplicates = (
+        open_alerts.order_by()
+        .values('equipment_id', 'rule', 'type')
+        .annotate(count=Count('id'), keep_id=Max('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        open_alerts.filter(
+            equipment_id=duplicate['equipment_id'], rule=duplicate['rule'], type=duplicate['type'],
+        ).exclude(id=duplicate['keep_id']).update(status='resolved', resolved_at=timezone.now())
+    Alert.objects.exclude(rule='').filter(last_seen_at__isnull=True).update(last_seen_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0002_alert_rule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Dernière occurrence'),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='occurrences',
+            field=models.PositiveIntegerField(default=1, help_text="Nombre de mesures en dépassement rattachées à l'alerte", verbose_name='Occurrences'),
+        ),
+        migrations.RunPython(resolve_duplicate_open_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['active', 'acknowledged']), models.Q(('rule', ''), _negated=True)), fields=('equipment', 'rule', 'type'), name='unique_open_alert_rule'),
+        ),
+    ]
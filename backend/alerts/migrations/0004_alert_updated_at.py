@@ -0,0 +1,26 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:42
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def initialize_updated_at(apps, schema_editor):
+    """Dernière modification connue plutôt que la date de la migration"""
+    Alert = apps.get_model('alerts', 'Alert')
+    Alert.objects.update(updated_at=Coalesce('resolved_at', 'last_seen_at', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0003_alert_occurrences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Mis à jour le'),
+        ),
+        migrations.RunPython(initialize_updated_at, migrations.RunPython.noop),
+    ]
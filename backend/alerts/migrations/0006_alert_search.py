@@ -0,0 +1,37 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:53
+
+import alerts.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def install_search(apps, schema_editor):
+    alerts.search.install(schema_editor.connection, backfill=True)
+
+
+def uninstall_search(apps, schema_editor):
+    alerts.search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0005_alert_keyset_index'),
+        ('equipment', '0003_alter_equipment_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertSearch',
+            fields=[
+                ('alert', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='alerts.alert')),
+                ('document', alerts.search.SearchDocumentField()),
+            ],
+            options={
+                'db_table': 'alerts_alert_search',
+                'managed': False,
+            },
+        ),
+        # Table d'index et triggers propres à la base (FTS5 / tsvector + GIN), alertes existantes indexées
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:14
+
+import alerts.search
+from django.db import migrations, models
+from django.db.models import Max, Min, OuterRef, Subquery
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+
+def backfill_company(apps, schema_editor):
+    """Recopie equipment.company par tranches d'id: une transaction courte par tranche"""
+    Alert = apps.get_model('alerts', 'Alert')
+    Equipment = apps.get_model('equipment', 'Equipment')
+    company = Subquery(Equipment.objects.filter(pk=OuterRef('equipment_id')).values('company_id')[:1])
+    bounds = Alert.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        Alert.objects.filter(
+            id__gte=start, id__lt=start + BATCH_SIZE, company__isnull=True
+        ).update(company_id=company)
+
+
+def suspend_search(apps, schema_editor):
+    alerts.search.drop_triggers(schema_editor.connection)
+
+
+def resume_search(apps, schema_editor):
+    if alerts.search.is_installed(schema_editor.connection):
+        alerts.search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    # Tranches validées au fil de l'eau plutôt qu'une transaction sur toute la table
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('equipment', '0004_equipment_company'),
+        ('alerts', '0006_alert_search'),
+    ]
+
+    operations = [
+        # Triggers de recherche retirés le temps de la reconstruction de la table (SQLite)
+        migrations.RunPython(suspend_search, resume_search),
+        migrations.AddField(
+            model_name='alert',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='users.company', verbose_name='Entreprise'),
+        ),
+        migrations.RunPython(backfill_company, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='alert',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='users.company', verbose_name='Entreprise'),
+        ),
+        # Index par entreprise créés avant la suppression des anciens
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['company', 'created_at', 'id'], name='alert_company_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['company', 'status', 'created_at'], name='alert_company_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='alert_company_updated_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='alert',
+            name='alert_created_id_idx',
+        ),
+        migrations.AlterField(
+            model_name='alert',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Mis à jour le'),
+        ),
+        migrations.RunPython(resume_search, suspend_search),
+    ]
@@ -1,5 +1,16 @@
 from django.db import models
-from equipment.models import Equipment
+from django.db.models import Q
+from equipment.models import Equipment, company_of_equipment, fill_company
+from users.models import Company
+from .search import SearchDocumentField
+
+
+class AlertQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        fill_company(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
 
 class Alert(models.Model):
     TYPE_CHOICES = [
@@ -14,17 +25,71 @@ class Alert(models.Model):
         ('resolved', 'Résolue'),
     ]
     
+    OPEN_STATUSES = ('active', 'acknowledged')
+    
     title = models.CharField(max_length=200, verbose_name="Titre")
     message = models.TextField(verbose_name="Message")
     equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name="alerts", verbose_name="Équipement")
+    # Dénormalisé depuis equipment.company (index composites par entreprise)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="alerts", db_index=False,
+                                editable=False, verbose_name="Entreprise")
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='warning', verbose_name="Type")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active', verbose_name="Statut")
+    rule = models.CharField(max_length=50, blank=True, default='', verbose_name="Règle",
+                            help_text="Règle de seuil à l'origine de l'alerte (vide pour une alerte manuelle)")
+    occurrences = models.PositiveIntegerField(default=1, verbose_name="Occurrences",
+                                              help_text="Nombre de mesures en dépassement rattachées à l'alerte")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+    last_seen_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernière occurrence")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
     resolved_at = models.DateTimeField(null=True, blank=True, verbose_name="Résolu le")
     
+    objects = AlertQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Alerte"
         verbose_name_plural = "Alertes"
+        constraints = [
+            # Une seule alerte ouverte par (équipement, règle, sévérité); la résolution libère la clé
+            models.UniqueConstraint(
+                fields=['equipment', 'rule', 'type'],
+                condition=Q(status__in=['active', 'acknowledged']) & ~Q(rule=''),
+                name='unique_open_alert_rule',
+            ),
+        ]
+        indexes = [
+            # Liste et pagination keyset (created_at, id) d'une entreprise
+            models.Index(fields=['company', 'created_at', 'id'], name='alert_company_created_idx'),
+            # Alertes ouvertes / par statut d'une entreprise (tableau de bord, statistiques)
+            models.Index(fields=['company', 'status', 'created_at'], name='alert_company_status_idx'),
+            # Synchronisation incrémentale et flux temps réel (updated_at, id)
+            models.Index(fields=['company', 'updated_at', 'id'], name='alert_company_updated_idx'),
+        ]
     
     def __str__(self):
         return self.title
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_equipment_id = instance.__dict__.get('equipment_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self.company_id is None or self.equipment_id != getattr(self, '_loaded_equipment_id', None):
+            self.company_id = company_of_equipment(self)
+        super().save(*args, **kwargs)
+        self._loaded_equipment_id = self.equipment_id
+
+
+class AlertSearch(models.Model):
+    """Index plein texte d'une alerte, maintenu par triggers (voir alerts.search); jointure seulement"""
+    alert = models.OneToOneField(
+        Alert, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search'
+    )
+    document = SearchDocumentField()
+
+    class Meta:
+        managed = False
+        db_table = 'alerts_alert_search'
@@ -0,0 +1,249 @@
+"""
+Index plein texte des alertes (titre, nom de l'équipement, message).
+
+SQLite: table virtuelle FTS5 ``alerts_alert_search`` (rowid = id de l'alerte,
+accents ignorés, index de préfixes). PostgreSQL: table ``alerts_alert_search``
+(rowid, document tsvector pondéré) avec index GIN. Dans les deux cas l'index
+est maintenu par des triggers sur ``alerts_alert`` et ``equipment_equipment``:
+save, bulk_create, update() et suppressions en cascade le tiennent à jour sans
+code applicatif. La recherche passe par ``Alert.objects.filter(search__document__match=...)``
+et le score par ``SearchRank`` (plus grand = plus pertinent).
+"""
+import re
+
+from django.db import NotSupportedError, models
+from django.db.models import Func, Lookup
+
+TERM = re.compile(r'\w+')
+# Poids du titre, du nom de l'équipement et du message
+WEIGHTS = (10.0, 5.0, 1.0)
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS alerts_alert_search USING fts5(
+        title, equipment_name, message,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alerts_alert_search_insert AFTER INSERT ON alerts_alert BEGIN
+        INSERT INTO alerts_alert_search (rowid, title, equipment_name, message)
+        VALUES (new.id, new.title, (SELECT name FROM equipment_equipment WHERE id = new.equipment_id), new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alerts_alert_search_update
+    AFTER UPDATE OF title, message, equipment_id ON alerts_alert
+    WHEN old.title IS NOT new.title OR old.message IS NOT new.message OR old.equipment_id IS NOT new.equipment_id
+    BEGIN
+        DELETE FROM alerts_alert_search WHERE rowid = old.id;
+        INSERT INTO alerts_alert_search (rowid, title, equipment_name, message)
+        VALUES (new.id, new.title, (SELECT name FROM equipment_equipment WHERE id = new.equipment_id), new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alerts_alert_search_delete AFTER DELETE ON alerts_alert BEGIN
+        DELETE FROM alerts_alert_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alerts_alert_search_equipment AFTER UPDATE OF name ON equipment_equipment
+    WHEN old.name IS NOT new.name
+    BEGIN
+        UPDATE alerts_alert_search SET equipment_name = new.name
+        WHERE rowid IN (SELECT id FROM alerts_alert WHERE equipment_id = new.id);
+    END
+    """,
+]
+
+SQLITE_BACKFILL = """
+    INSERT INTO alerts_alert_search (rowid, title, equipment_name, message)
+    SELECT a.id, a.title, e.name, a.message
+    FROM alerts_alert a JOIN equipment_equipment e ON e.id = a.equipment_id
+"""
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS alerts_alert_search_insert',
+    'DROP TRIGGER IF EXISTS alerts_alert_search_update',
+    'DROP TRIGGER IF EXISTS alerts_alert_search_delete',
+    'DROP TRIGGER IF EXISTS alerts_alert_search_equipment',
+    'DROP TABLE IF EXISTS alerts_alert_search',
+]
+
+POSTGRESQL_INSTALL = [
+    """
+    CREATE TABLE IF NOT EXISTS alerts_alert_search (
+        rowid bigint PRIMARY KEY,
+        document tsvector NOT NULL
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS alerts_alert_search_document_idx ON alerts_alert_search USING GIN (document)',
+    """
+    CREATE OR REPLACE FUNCTION alerts_alert_search_document(title text, equipment_name text, message text)
+    RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(equipment_name, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(message, '')), 'D')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION alerts_alert_search_index() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM alerts_alert_search WHERE rowid = OLD.id;
+            RETURN OLD;
+        END IF;
+        INSERT INTO alerts_alert_search (rowid, document)
+        SELECT NEW.id, alerts_alert_search_document(NEW.title, e.name, NEW.message)
+        FROM equipment_equipment e WHERE e.id = NEW.equipment_id
+        ON CONFLICT (rowid) DO UPDATE SET document = EXCLUDED.document;
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION alerts_alert_search_equipment() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE alerts_alert_search s
+        SET document = alerts_alert_search_document(a.title, NEW.name, a.message)
+        FROM alerts_alert a WHERE a.id = s.rowid AND a.equipment_id = NEW.id;
+        RETURN NEW;
+    END
+    $$
+    """,
+    'DROP TRIGGER IF EXISTS alerts_alert_search_write ON alerts_alert',
+    """
+    CREATE TRIGGER alerts_alert_search_write
+    AFTER INSERT OR DELETE ON alerts_alert
+    FOR EACH ROW EXECUTE FUNCTION alerts_alert_search_index()
+    """,
+    'DROP TRIGGER IF EXISTS alerts_alert_search_update ON alerts_alert',
+    """
+    CREATE TRIGGER alerts_alert_search_update
+    AFTER UPDATE OF title, message, equipment_id ON alerts_alert
+    FOR EACH ROW WHEN (
+        OLD.title IS DISTINCT FROM NEW.title OR OLD.message IS DISTINCT FROM NEW.message
+        OR OLD.equipment_id IS DISTINCT FROM NEW.equipment_id
+    ) EXECUTE FUNCTION alerts_alert_search_index()
+    """,
+    'DROP TRIGGER IF EXISTS alerts_alert_search_equipment ON equipment_equipment',
+    """
+    CREATE TRIGGER alerts_alert_search_equipment
+    AFTER UPDATE OF name ON equipment_equipment
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION alerts_alert_search_equipment()
+    """,
+]
+
+POSTGRESQL_BACKFILL = """
+    INSERT INTO alerts_alert_search (rowid, document)
+    SELECT a.id, alerts_alert_search_document(a.title, e.name, a.message)
+    FROM alerts_alert a JOIN equipment_equipment e ON e.id = a.equipment_id
+    ON CONFLICT (rowid) DO NOTHING
+"""
+
+POSTGRESQL_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS alerts_alert_search_write ON alerts_alert',
+    'DROP TRIGGER IF EXISTS alerts_alert_search_update ON alerts_alert',
+    'DROP TRIGGER IF EXISTS alerts_alert_search_equipment ON equipment_equipment',
+    'DROP FUNCTION IF EXISTS alerts_alert_search_index()',
+    'DROP FUNCTION IF EXISTS alerts_alert_search_equipment()',
+    'DROP TABLE IF EXISTS alerts_alert_search',
+    'DROP FUNCTION IF EXISTS alerts_alert_search_document(text, text, text)',
+]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_INSTALL, SQLITE_BACKFILL, SQLITE_UNINSTALL),
+    'postgresql': (POSTGRESQL_INSTALL, POSTGRESQL_BACKFILL, POSTGRESQL_UNINSTALL),
+}
+
+
+def supports_search(connection):
+    return connection.vendor in STATEMENTS
+
+
+def install(connection, backfill=False):
+    """Crée l'index et ses triggers (idempotent); ``backfill`` indexe les alertes existantes"""
+    if not supports_search(connection):
+        return
+    statements, backfill_sql, _ = STATEMENTS[connection.vendor]
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+        if backfill:
+            cursor.execute(backfill_sql)
+
+
+def uninstall(connection):
+    if not supports_search(connection):
+        return
+    with connection.cursor() as cursor:
+        for statement in STATEMENTS[connection.vendor][2]:
+            cursor.execute(statement)
+
+
+def drop_triggers(connection):
+    """
+    Retire les seuls triggers, l'index restant en place: SQLite refuse de
+    reconstruire alerts_alert ou equipment_equipment tant qu'ils y font référence.
+    ``install`` les rétablit.
+    """
+    if not supports_search(connection):
+        return
+    with connection.cursor() as cursor:
+        for statement in STATEMENTS[connection.vendor][2]:
+            if statement.startswith('DROP TRIGGER'):
+                cursor.execute(statement)
+
+
+def is_installed(connection):
+    return 'alerts_alert_search' in connection.introspection.table_names()
+
+
+def search_terms(query):
+    """Mots de la recherche, chacun utilisé comme préfixe"""
+    return TERM.findall(query.lower())
+
+
+class SearchDocumentField(models.Field):
+    """Document indexé (colonnes FTS5 sur SQLite, tsvector sur PostgreSQL); ne se lit pas"""
+
+    def db_type(self, connection):
+        return 'tsvector' if connection.vendor == 'postgresql' else None
+
+
+@SearchDocumentField.register_lookup
+class Match(Lookup):
+    """Tous les mots de la recherche, en préfixe"""
+    lookup_name = 'match'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        terms = search_terms(self.rhs)
+        if not terms:
+            return '1 = 0', []
+        if connection.vendor == 'sqlite':
+            # La table FTS5 elle-même est l'opérande de MATCH
+            return f'{connection.ops.quote_name(self.lhs.alias)} MATCH %s', [' '.join(f'"{term}"*' for term in terms)]
+        if connection.vendor == 'postgresql':
+            lhs, params = compiler.compile(self.lhs)
+            return f"{lhs} @@ to_tsquery('simple', %s)", [*params, ' & '.join(f'{term}:*' for term in terms)]
+        raise NotSupportedError('Recherche plein texte non disponible sur cette base')
+
+
+class SearchRank(Func):
+    """Pertinence d'une alerte pour la recherche (à combiner avec ``match``)"""
+    output_field = models.FloatField()
+
+    def __init__(self, document, query):
+        super().__init__(document)
+        self.query = query
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        alias = connection.ops.quote_name(self.get_source_expressions()[0].alias)
+        # bm25() est négatif, plus petit = plus pertinent
+        return f"-bm25({alias}, {', '.join(str(weight) for weight in WEIGHTS)})", []
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        document, params = compiler.compile(self.get_source_expressions()[0])
+        tsquery = ' & '.join(f'{term}:*' for term in search_terms(self.query))
+        return f"ts_rank({document}, to_tsquery('simple', %s))", [*params, tsquery]
@@ -7,5 +7,5 @@ class AlertSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Alert
-        fields = ['id', 'title', 'message', 'equipment', 'equipment_name', 'site_name', 'type', 'status', 'created_at', 'resolved_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'title', 'message', 'equipment', 'equipment_name', 'site_name', 'type', 'status', 'rule', 'occurrences', 'created_at', 'last_seen_at', 'resolved_at']
+        read_only_fields = ['id', 'rule', 'occurrences', 'created_at', 'last_seen_at']
@@ -1,3 +1,232 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from equipment.models import Equipment
+from metrics.models import NetworkMetric
+from metrics.thresholds import open_alert_cache
+from sites.models import Site
+from sync.models import Tombstone
+from users.models import Company
+from .apps import install_search
+from .models import Alert
+from .search import drop_triggers
+
+User = get_user_model()
+
+
+class BulkOperationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        open_alert_cache.invalidate()
+        self.company = Company.objects.create(name='ACME')
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('acme', password='-', company=self.company))
+        site = Site.objects.create(name='Site', address='-', company=self.company)
+        self.equipment = Equipment.objects.create(name='Switch', type='switch', site=site)
+        NetworkMetric.objects.bulk_create([NetworkMetric(equipment=self.equipment, is_online=True)])
+
+    def alert(self, **fields):
+        # Statut de l'équipement recalculé au commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return Alert.objects.create(
+                title='CPU', message='-', equipment=self.equipment, rule='cpu', **fields,
+            )
+
+    def post(self, name, **data):
+        response = self.client.post(f'/api/alerts/{name}/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def status(self):
+        self.equipment.refresh_from_db()
+        return self.equipment.status
+
+    def test_reopen_waits_for_other_severity(self):
+        error = self.alert(type='error')
+        warning = self.alert(type='warning', status='resolved')
+        key = (self.equipment.pk, 'cpu')
+
+        # L'erreur est encore ouverte sur la même règle: l'avertissement reste résolu
+        data = self.post('bulk_reopen', alert_ids=[warning.pk])
+        self.assertEqual((data['updated'], data['skipped']), (0, 1))
+
+        open_alert_cache.update({key: (error.pk, 'error')})
+        self.post('bulk_resolve', alert_ids=[error.pk])
+        self.assertEqual(self.status(), 'online')
+        self.assertEqual(open_alert_cache.get_many([key]), {key: None})
+
+        # La plus récente de la règle se rouvre une fois l'erreur résolue, l'ancienne non
+        data = self.post('bulk_reopen', filter={'rule': 'cpu'})
+        self.assertEqual((data['updated'], data['by_status']), (1, {'resolved': 1}))
+        self.assertEqual(Alert.objects.get(status='active').pk, warning.pk)
+        self.assertEqual(self.status(), 'warning')
+
+    def test_delete_writes_tombstones(self):
+        alerts = [self.alert(type='warning'), self.alert(type='error', status='resolved')]
+        self.assertEqual(self.status(), 'warning')
+        key = (self.equipment.pk, 'cpu')
+        open_alert_cache.update({key: (alerts[0].pk, 'warning')})
+
+        data = self.post('bulk_delete', filter={'equipment': self.equipment.pk})
+        self.assertEqual(data['by_status'], {'active': 1, 'resolved': 1})
+        self.assertFalse(Alert.objects.exists())
+        self.assertEqual(
+            sorted(Tombstone.objects.filter(company=self.company, model='alert').values_list('object_id', flat=True)),
+            sorted(alert.pk for alert in alerts),
+        )
+        self.assertEqual(open_alert_cache.get_many([key]), {key: None})
+        self.assertEqual(self.status(), 'online')
+
+    def test_status_recomputed_once_per_transaction(self):
+        other = Equipment.objects.create(name='Autre', type='switch', site=self.equipment.site)
+        with mock.patch('metrics.signals.update_statuses') as update_statuses:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for equipment in (self.equipment, other, self.equipment):
+                        Alert.objects.create(title='Alerte', message='-', equipment=equipment)
+                    Alert.objects.filter(equipment=self.equipment).delete()
+        update_statuses.assert_called_once_with({self.equipment.pk, other.pk})
+
+    def test_export_period(self):
+        alert = self.alert(type='warning')
+        response = self.client.get('/api/alerts/export/', {'output': 'ndjson', 'from': '2024-13-01T00:00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'from: date ISO 8601 attendue'})
+        response = self.client.post('/api/alerts/bulk_delete/', {'filter': {'to': '2024-02-30T00:00'}}, format='json')
+        self.assertEqual(response.json(), {'error': 'filter.to: date ISO 8601 attendue'})
+        self.assertTrue(Alert.objects.exists())
+
+        # Date sans fuseau interprétée dans le fuseau du serveur
+        start = timezone.localtime(alert.created_at).replace(tzinfo=None)
+        for params, count in (({'from': start.isoformat()}, 1), ({'to': start.isoformat()}, 0)):
+            with self.subTest(params=params):
+                response = self.client.get('/api/alerts/export/', {'output': 'ndjson', **params})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(b''.join(response.streaming_content).splitlines()), count)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        company = Company.objects.create(name='ACME')
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('acme', password='-', company=company))
+        site = Site.objects.create(name='Site', address='-', company=company)
+        self.camera = Equipment.objects.create(name='Caméra entrepôt', type='camera', site=site)
+        server = Equipment.objects.create(name='Serveur vidéo', type='server', site=site)
+        self.alerts = {
+            'title': Alert.objects.create(title='Disque plein', message='Volume système', equipment=server),
+            'message': Alert.objects.create(title='Stockage', message='Disque à 95 %', equipment=server),
+            'camera': Alert.objects.create(title='Hors ligne', message='Aucune réponse', equipment=self.camera),
+        }
+
+    def search(self, query):
+        response = self.client.get('/api/alerts/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        names = {alert.pk: name for name, alert in self.alerts.items()}
+        return [names.get(row['id'], row['id']) for row in response.json()['results']]
+
+    def test_title_ranks_first(self):
+        self.assertEqual(self.search('disque'), ['title', 'message'])
+
+    def test_prefixes_without_accents(self):
+        self.assertEqual(self.search('camera entre'), ['camera'])
+        self.assertEqual(self.search('serv disq'), ['title', 'message'])
+        # Tous les mots sont requis
+        self.assertEqual(self.search('disque caméra'), [])
+
+    def test_equipment_rename(self):
+        self.camera.name = 'Portail nord'
+        self.camera.save()
+        self.assertEqual(self.search('portail'), ['camera'])
+        self.assertEqual(self.search('entrepôt'), [])
+
+    def test_triggers_reinstalled_after_migrate(self):
+        # Une migration qui reconstruit alerts_alert sur SQLite retire ses triggers
+        drop_triggers(connection)
+        install_search(using=connection.alias)
+        alert = Alert.objects.create(title='Ventilateur', message='-', equipment=self.camera)
+        self.alerts['fan'] = alert
+        self.assertEqual(self.search('ventil'), ['fan'])
+
+    def test_like_fallback(self):
+        with mock.patch('alerts.filters.supports_search', return_value=False):
+            # Sous-chaîne hors début de mot, introuvable par l'index de préfixes
+            self.assertEqual(sorted(self.search('isque')), ['message', 'title'])
+        cache.clear()
+        self.assertEqual(self.search('isque'), [])
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        company = Company.objects.create(name='ACME')
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('acme', password='-', company=company))
+        site = Site.objects.create(name='Site', address='-', company=company)
+        equipment = Equipment.objects.create(name='Switch', type='switch', site=site)
+        Alert.objects.bulk_create([Alert(title=f'Alerte {i}', message='-', equipment=equipment) for i in range(7)])
+        # Trois alertes par horodatage: l'id départage
+        start = timezone.now() - timedelta(hours=1)
+        for alert in Alert.objects.all():
+            Alert.objects.filter(pk=alert.pk).update(created_at=start + timedelta(minutes=alert.pk // 3))
+        self.expected = list(Alert.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_walk_forward_and_back(self):
+        pages, data = [], self.get('/api/alerts/', page_size=3)
+        self.assertIsNone(data['previous'])
+        while True:
+            pages.append([row['id'] for row in data['results']])
+            if not data['next']:
+                break
+            data = self.get(data['next'])
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.expected)
+
+        # Retour en arrière depuis la dernière page, par les liens previous
+        back = []
+        while data['previous']:
+            data = self.get(data['previous'])
+            back.append([row['id'] for row in data['results']])
+            self.assertIsNotNone(data['next'])
+        self.assertEqual(back, pages[-2::-1])
+        self.assertIsNone(data['previous'])
+
+    def test_deep_page_without_offset(self):
+        data = self.get('/api/alerts/', page_size=3)
+        with CaptureQueriesContext(connection) as queries:
+            self.get(data['next'])
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+
+    def test_malformed_cursor(self):
+        for cursor in ('!!!', 'eyJ2IjoxfQ', 'bm9uLWpzb24'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/alerts/', {'cursor': cursor}).status_code, 404)
+
+    def test_count(self):
+        self.assertNotIn('count', self.get('/api/alerts/'))
+        for mode in ('exact', 'estimate'):
+            with self.subTest(mode=mode):
+                data = self.get('/api/alerts/', count=mode)
+                self.assertEqual((data['count'], data['count_estimated']), (7, False))
 
-# Create your tests here.
+    def test_page_number_fallback(self):
+        # ?page=, tri sur un champ nullable et tri par pertinence: pagination par numéro de page
+        for params in ({'page': 1}, {'ordering': 'resolved_at'}, {'search': 'alerte'}):
+            with self.subTest(params=params):
+                data = self.get('/api/alerts/', **params)
+                self.assertEqual(data['count'], 7)
+                self.assertNotIn('cursor=', data['next'] or '')
@@ -1,17 +1,33 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Count
 from django.utils import timezone
+from vigileos.cache import CachedResponseMixin
+from metrics.rollups import parse_datetime_param
+from sync.mixins import DeltaSyncMixin
+from vigileos.export import EXPORT_FORMATS, export_response
+from vigileos.pagination import KeysetPagination
+from .bulk import delete, select_alerts, transition
+from .filters import AlertOrderingFilter, AlertSearchFilter
 from .models import Alert
 from .serializers import AlertSerializer
 
-class AlertViewSet(viewsets.ModelViewSet):
+ALERT_EXPORT_COLUMNS = [
+    ('id', 'id'), ('equipment', 'equipment_id'), ('equipment_name', 'equipment__name'),
+    ('site_name', 'equipment__site__name'), ('title', 'title'), ('message', 'message'),
+    ('type', 'type'), ('status', 'status'), ('rule', 'rule'), ('occurrences', 'occurrences'),
+    ('created_at', 'created_at'), ('last_seen_at', 'last_seen_at'), ('resolved_at', 'resolved_at'),
+]
+
+class AlertViewSet(DeltaSyncMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    sync_model_name = 'alert'
     serializer_class = AlertSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, AlertSearchFilter, AlertOrderingFilter]
     filterset_fields = ['type', 'status', 'equipment', 'equipment__site']
     search_fields = ['title', 'message', 'equipment__name']
     ordering_fields = ['created_at', 'resolved_at']
@@ -19,7 +35,7 @@ class AlertViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         # Filtrer les alertes par l'entreprise de l'utilisateur
-        queryset = Alert.objects.filter(equipment__site__company=self.request.user.company)
+        queryset = Alert.objects.filter(company_id=self.request.user.company_id)
         
         # Filtres supplémentaires
         status_filter = self.request.query_params.get('status', None)
@@ -70,23 +86,24 @@ class AlertViewSet(viewsets.ModelViewSet):
         """Statistiques des alertes"""
         queryset = self.get_queryset()
         
-        # Statistiques générales
+        # Un seul agrégat (index (company, status, created_at))
+        counts = queryset.order_by().aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status='active')),
+            acknowledged=Count('id', filter=Q(status='acknowledged')),
+            resolved=Count('id', filter=Q(status='resolved')),
+            recent=Count('id', filter=Q(created_at__gte=timezone.now() - timezone.timedelta(hours=24))),
+            **{f'type_{code}': Count('id', filter=Q(type=code)) for code, _ in Alert.TYPE_CHOICES},
+        )
         stats = {
-            'total': queryset.count(),
-            'active': queryset.filter(status='active').count(),
-            'acknowledged': queryset.filter(status='acknowledged').count(),
-            'resolved': queryset.filter(status='resolved').count(),
-            'by_type': {},
-            'recent': queryset.filter(
-                created_at__gte=timezone.now() - timezone.timedelta(hours=24)
-            ).count()
+            'total': counts['total'],
+            'active': counts['active'],
+            'acknowledged': counts['acknowledged'],
+            'resolved': counts['resolved'],
+            'by_type': {code: counts[f'type_{code}'] for code, _ in Alert.TYPE_CHOICES},
+            'recent': counts['recent'],
         }
         
-        # Statistiques par type
-        for alert_type in Alert.TYPE_CHOICES:
-            type_code = alert_type[0]
-            stats['by_type'][type_code] = queryset.filter(type=type_code).count()
-        
         return Response(stats)
     
     @action(detail=False, methods=['get'])
@@ -100,22 +117,62 @@ class AlertViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(critical_alerts, many=True)
         return Response(serializer.data)
     
-    @action(detail=False, methods=['post'])
-    def bulk_acknowledge(self, request):
-        """Acquitter plusieurs alertes en masse"""
-        alert_ids = request.data.get('alert_ids', [])
-        if not alert_ids:
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Export en flux des alertes (?output=csv|ndjson&gzip=1&from=&to=)"""
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
             return Response(
-                {'error': 'Aucun ID d\'alerte fourni'}, 
+                {'error': f"output: valeurs possibles {', '.join(EXPORT_FORMATS)}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        alerts = self.get_queryset().filter(
-            id__in=alert_ids,
-            status='active'
-        )
+        queryset = self.filter_queryset(self.get_queryset())
+        for param, lookup in (('from', 'created_at__gte'), ('to', 'created_at__lt')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    parsed = parse_datetime_param(value, param)
+                except ValueError as exc:
+                    return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**{lookup: parsed})
         
-        updated_count = alerts.update(status='acknowledged')
-        return Response({
-            'status': f'{updated_count} alertes acquittées'
-        })
+        return export_response(
+            queryset.order_by('created_at', 'id'), ALERT_EXPORT_COLUMNS, output,
+            gzip=request.query_params.get('gzip') in ('1', 'true'), filename='alerts'
+        )
+    
+    def _bulk_transition(self, request, action, label):
+        company_id = request.user.company_id
+        try:
+            alerts = select_alerts(Alert.objects.filter(company_id=company_id), request.data)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        result = transition(alerts, action, company_id)
+        return Response({'status': f"{result['updated']} alertes {label}", **result})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_acknowledge(self, request):
+        """Acquitter plusieurs alertes en masse (alert_ids et/ou filter)"""
+        return self._bulk_transition(request, 'acknowledge', 'acquittées')
+    
+    @action(detail=False, methods=['post'])
+    def bulk_resolve(self, request):
+        """Résoudre plusieurs alertes ouvertes ou acquittées en masse (alert_ids et/ou filter)"""
+        return self._bulk_transition(request, 'resolve', 'résolues')
+    
+    @action(detail=False, methods=['post'])
+    def bulk_reopen(self, request):
+        """Rouvrir plusieurs alertes résolues en masse (alert_ids et/ou filter)"""
+        return self._bulk_transition(request, 'reopen', 'rouvertes')
+    
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        """Supprimer plusieurs alertes en masse (alert_ids et/ou filter)"""
+        company_id = request.user.company_id
+        try:
+            alerts = select_alerts(Alert.objects.filter(company_id=company_id), request.data)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        result = delete(alerts, company_id)
+        return Response({'status': f"{result['deleted']} alertes supprimées", **result})
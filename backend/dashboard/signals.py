@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from sites.models import Site
+from vigileos.cache import bump_generation
+
+# Toute écriture invalide les lectures en cache de l'entreprise (API et tableau de bord)
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def site_changed(sender, instance, **kwargs):
+    bump_generation([instance.company_id])
+
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_delete, sender=Equipment)
+def equipment_changed(sender, instance, **kwargs):
+    bump_generation([instance.company_id])
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def alert_changed(sender, instance, **kwargs):
+    bump_generation([instance.company_id])
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from sites.models import Site
+from users.models import Company
+
+User = get_user_model()
+
+
+class OverviewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name='ACME')
+        self.user = User.objects.create_user('acme', password='acme', company=self.company)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.sites = [
+            Site.objects.create(name=f'Site {i}', address='-', company=self.company) for i in range(3)
+        ]
+        self.equipment = []
+        for i, site in enumerate(self.sites * 4):
+            self.equipment.append(Equipment.objects.create(
+                name=f'Équipement {i}', type='camera' if i % 2 else 'switch', site=site,
+                status='offline' if i % 3 == 0 else 'online',
+            ))
+        for i, item in enumerate(self.equipment[:6]):
+            Alert.objects.create(
+                title='Alerte', message='-', equipment=item,
+                type='error' if i % 2 else 'warning', status='resolved' if i == 0 else 'active',
+            )
+
+        # Données d'une autre entreprise, absentes de la vue d'ensemble
+        other = Company.objects.create(name='Autre')
+        other_site = Site.objects.create(name='Autre site', address='-', company=other)
+        other_equipment = Equipment.objects.create(name='Autre', type='switch', site=other_site)
+        Alert.objects.create(title='Autre', message='-', equipment=other_equipment)
+
+    def test_counts(self):
+        data = self.client.get('/api/dashboard/overview/').json()
+        self.assertEqual(data['sites']['total'], 3)
+        self.assertEqual(data['equipment']['total'], 12)
+        self.assertEqual(data['equipment']['by_status']['offline'], 4)
+        self.assertEqual(data['equipment']['by_type'], {
+            code: 6 if code in ('camera', 'switch') else 0 for code, _ in Equipment.TYPE_CHOICES
+        })
+        self.assertEqual(data['alerts']['total'], 6)
+        self.assertEqual(data['alerts']['open'], 5)
+        self.assertEqual(data['alerts']['by_status'], {'active': 5, 'acknowledged': 0, 'resolved': 1})
+        self.assertEqual(data['alerts']['open_by_type'], {'error': 3, 'warning': 2, 'info': 0})
+        self.assertEqual([site['equipment']['total'] for site in data['by_site']], [4, 4, 4])
+        self.assertEqual(sum(site['alerts']['open'] for site in data['by_site']), 5)
+
+    def test_query_count(self):
+        # Nombre de requêtes constant, quel que soit le nombre de sites / équipements / alertes
+        with self.assertNumQueries(3):
+            self.client.get('/api/dashboard/overview/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/dashboard/overview/')
+
+        Site.objects.create(name='Site 3', address='-', company=self.company)
+        with self.assertNumQueries(3):
+            data = self.client.get('/api/dashboard/overview/').json()
+        self.assertEqual(data['sites']['total'], 4)
+
+    def test_invalidated_on_bulk_acknowledge(self):
+        self.client.get('/api/dashboard/overview/')
+        alert_ids = list(Alert.objects.filter(company=self.company).values_list('id', flat=True))
+        self.client.post('/api/alerts/bulk_acknowledge/', {'alert_ids': alert_ids}, format='json')
+        data = self.client.get('/api/dashboard/overview/').json()
+        self.assertEqual(data['alerts']['by_status']['acknowledged'], 5)
+
+    def test_invalidated_on_bulk_resolve_and_delete(self):
+        self.client.get('/api/dashboard/overview/')
+        # Site 0: une alerte active, une déjà résolue
+        response = self.client.post('/api/alerts/bulk_resolve/', {'filter': {'site': self.sites[0].pk}}, format='json')
+        self.assertEqual(response.json()['by_status'], {'active': 1, 'acknowledged': 0})
+        self.assertEqual(response.json()['skipped'], 1)
+        data = self.client.get('/api/dashboard/overview/').json()
+        self.assertEqual(data['alerts']['by_status']['resolved'], 2)
+
+        response = self.client.post('/api/alerts/bulk_delete/', {'filter': {'status': 'resolved'}}, format='json')
+        self.assertEqual(response.json()['deleted'], 2)
+        data = self.client.get('/api/dashboard/overview/').json()
+        self.assertEqual(data['alerts']['by_status']['resolved'], 0)
+        self.assertEqual(data['alerts']['by_status']['active'], 4)
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import OverviewView
+
+urlpatterns = [
+    path('overview/', OverviewView.as_view(), name='dashboard_overview'),
+]
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from sites.models import Site
+from vigileos.cache import RESPONSE_CACHE_TIMEOUT, generation
+
+
+def _counts(choices, field, prefix=''):
+    """Un Count(filter=Q) par valeur de ``choices``"""
+    return {f'{prefix}{code}': Count('id', filter=Q(**{field: code})) for code, _ in choices}
+
+
+def compute_overview(company_id):
+    """Vue d'ensemble sites / équipements / alertes d'une entreprise, en trois requêtes"""
+    sites = list(Site.objects.filter(company_id=company_id).order_by('name').values('id', 'name', 'status'))
+
+    equipment_rows = {
+        row.pop('site_id'): row
+        for row in Equipment.objects.filter(company_id=company_id)
+        .order_by()
+        .values('site_id')
+        .annotate(
+            total=Count('id'),
+            **_counts(Equipment.STATUS_CHOICES, 'status'),
+            **_counts(Equipment.TYPE_CHOICES, 'type', 'type_'),
+        )
+    }
+
+    open_alerts = Q(status__in=Alert.OPEN_STATUSES)
+    alert_rows = {
+        row.pop('equipment__site_id'): row
+        for row in Alert.objects.filter(company_id=company_id)
+        .order_by()
+        .values('equipment__site_id')
+        .annotate(
+            total=Count('id'),
+            open=Count('id', filter=open_alerts),
+            recent=Count('id', filter=Q(created_at__gte=timezone.now() - timedelta(hours=24))),
+            **_counts(Alert.STATUS_CHOICES, 'status'),
+            **_counts(Alert.TYPE_CHOICES, 'type', 'type_'),
+            **{
+                f'open_{code}': Count('id', filter=open_alerts & Q(type=code))
+                for code, _ in Alert.TYPE_CHOICES
+            },
+        )
+    }
+
+    def total(rows, key):
+        return sum(row[key] for row in rows.values())
+
+    overview = {
+        'sites': {
+            'total': len(sites),
+            'by_status': {
+                code: sum(1 for site in sites if site['status'] == code) for code, _ in Site.STATUS_CHOICES
+            },
+        },
+        'equipment': {
+            'total': total(equipment_rows, 'total'),
+            'by_status': {code: total(equipment_rows, code) for code, _ in Equipment.STATUS_CHOICES},
+            'by_type': {code: total(equipment_rows, f'type_{code}') for code, _ in Equipment.TYPE_CHOICES},
+        },
+        'alerts': {
+            'total': total(alert_rows, 'total'),
+            'open': total(alert_rows, 'open'),
+            'recent': total(alert_rows, 'recent'),
+            'by_status': {code: total(alert_rows, code) for code, _ in Alert.STATUS_CHOICES},
+            'by_type': {code: total(alert_rows, f'type_{code}') for code, _ in Alert.TYPE_CHOICES},
+            'open_by_type': {code: total(alert_rows, f'open_{code}') for code, _ in Alert.TYPE_CHOICES},
+        },
+        'by_site': [],
+        'generated_at': timezone.now(),
+    }
+    for site in sites:
+        equipment = equipment_rows.get(site['id'], {})
+        alerts = alert_rows.get(site['id'], {})
+        overview['by_site'].append({
+            **site,
+            'equipment': {
+                'total': equipment.get('total', 0),
+                'by_status': {code: equipment.get(code, 0) for code, _ in Equipment.STATUS_CHOICES},
+            },
+            'alerts': {
+                'open': alerts.get('open', 0),
+                'open_by_type': {code: alerts.get(f'open_{code}', 0) for code, _ in Alert.TYPE_CHOICES},
+            },
+        })
+    return overview
+
+
+class OverviewView(APIView):
+    """Compteurs du tableau de bord en un appel, mis en cache par entreprise"""
+
+    def get(self, request):
+        company_id = request.user.company_id
+        key = f'dashboard:overview:{company_id}:{generation(company_id)}'
+        overview = cache.get(key)
+        if overview is None:
+            overview = compute_overview(company_id)
+            cache.set(key, overview, RESPONSE_CACHE_TIMEOUT)
+        return Response(overview)
@@ -4,5 +4,5 @@ from .models import Equipment
 @admin.register(Equipment)
 class EquipmentAdmin(admin.ModelAdmin):
     list_display = ('name', 'type', 'site', 'status', 'ip_address')
-    list_filter = ('type', 'status', 'site__company')
+    list_filter = ('type', 'status', 'company')
     search_fields = ('name', 'ip_address')
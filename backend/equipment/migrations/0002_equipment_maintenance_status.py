@@ -0,0 +1,26 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:37
+
+from django.db import migrations, models
+
+
+def fix_invalid_statuses(apps, schema_editor):
+    """Valeurs écrites par l'ancienne action activate, hors STATUS_CHOICES"""
+    Equipment = apps.get_model('equipment', 'Equipment')
+    Equipment.objects.filter(status='active').update(status='online')
+    Equipment.objects.filter(status='inactive').update(status='offline')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipment',
+            name='status',
+            field=models.CharField(choices=[('online', 'En ligne'), ('offline', 'Hors ligne'), ('warning', 'Attention'), ('maintenance', 'Maintenance')], default='online', max_length=20, verbose_name='Statut'),
+        ),
+        migrations.RunPython(fix_invalid_statuses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_equipment_maintenance_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Mis à jour le'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:12
+
+import alerts.search
+from django.db import migrations, models
+from django.db.models import Max, Min, OuterRef, Subquery
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+
+def backfill_company(apps, schema_editor):
+    """Recopie site.company par tranches d'id: une transaction courte par tranche"""
+    Equipment = apps.get_model('equipment', 'Equipment')
+    Site = apps.get_model('sites', 'Site')
+    company = Subquery(Site.objects.filter(pk=OuterRef('site_id')).values('company_id')[:1])
+    bounds = Equipment.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        Equipment.objects.filter(
+            id__gte=start, id__lt=start + BATCH_SIZE, company__isnull=True
+        ).update(company_id=company)
+
+
+def suspend_search(apps, schema_editor):
+    alerts.search.drop_triggers(schema_editor.connection)
+
+
+def resume_search(apps, schema_editor):
+    if alerts.search.is_installed(schema_editor.connection):
+        alerts.search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    # Tranches validées au fil de l'eau plutôt qu'une transaction sur toute la table
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('sites', '0003_alter_site_updated_at'),
+        ('equipment', '0003_alter_equipment_updated_at'),
+    ]
+
+    operations = [
+        # Triggers de recherche retirés le temps de la reconstruction de la table (SQLite)
+        migrations.RunPython(suspend_search, resume_search),
+        migrations.AddField(
+            model_name='equipment',
+            name='company',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='equipment', to='users.company', verbose_name='Entreprise'),
+        ),
+        migrations.RunPython(backfill_company, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='equipment',
+            name='company',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='equipment', to='users.company', verbose_name='Entreprise'),
+        ),
+        migrations.RunPython(resume_search, suspend_search),
+    ]
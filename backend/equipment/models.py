@@ -1,5 +1,65 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Now
 from sites.models import Site
+from users.models import Company
+
+
+def fill_company(objs):
+    """
+    Renseigne le company_id dénormalisé d'objets rattachés à un équipement
+    (Alert, NetworkMetric) avant un bulk_create, en une requête.
+    """
+    missing = {obj.equipment_id for obj in objs if obj.company_id is None}
+    if not missing:
+        return
+    companies = dict(Equipment.objects.filter(pk__in=missing).values_list('id', 'company_id'))
+    for obj in objs:
+        if obj.company_id is None:
+            obj.company_id = companies.get(obj.equipment_id)
+
+
+def company_of_equipment(obj):
+    """Entreprise de l'équipement d'un objet, sans requête si l'équipement est déjà chargé"""
+    equipment = obj._state.fields_cache.get('equipment')
+    if equipment is not None and equipment.pk == obj.equipment_id:
+        return equipment.company_id
+    return Equipment.objects.filter(pk=obj.equipment_id).values_list('company_id', flat=True).first()
+
+
+def reassign_company(equipment_ids, company_id, previous_company_id):
+    """
+    Équipements passés dans une autre entreprise: leurs alertes et mesures suivent.
+    La nouvelle entreprise les reçoit comme modifiés, l'ancienne comme supprimés
+    (synchronisation incrémentale); le cache des deux est invalidé.
+    """
+    from alerts.models import Alert
+    from metrics.models import NetworkMetric
+    from sync.models import Tombstone
+    from vigileos.cache import bump_generation
+
+    alert_ids = list(Alert.objects.filter(equipment_id__in=equipment_ids).values_list('id', flat=True))
+    Equipment.objects.filter(pk__in=equipment_ids).update(company_id=company_id, updated_at=Now())
+    Alert.objects.filter(equipment_id__in=equipment_ids).update(company_id=company_id, updated_at=Now())
+    NetworkMetric.objects.filter(equipment_id__in=equipment_ids).update(company_id=company_id)
+    Tombstone.objects.bulk_create(
+        [Tombstone(company_id=previous_company_id, model='equipment', object_id=pk) for pk in equipment_ids]
+        + [Tombstone(company_id=previous_company_id, model='alert', object_id=pk) for pk in alert_ids],
+        batch_size=10000,
+    )
+    bump_generation([company_id, previous_company_id])
+
+
+class EquipmentQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        missing = {obj.site_id for obj in objs if obj.company_id is None}
+        if missing:
+            companies = dict(Site.objects.filter(pk__in=missing).values_list('id', 'company_id'))
+            for obj in objs:
+                if obj.company_id is None:
+                    obj.company_id = companies.get(obj.site_id)
+        return super().bulk_create(objs, *args, **kwargs)
+
 
 class Equipment(models.Model):
     TYPE_CHOICES = [
@@ -17,16 +77,22 @@ class Equipment(models.Model):
         ('online', 'En ligne'),
         ('offline', 'Hors ligne'),
         ('warning', 'Attention'),
+        ('maintenance', 'Maintenance'),
     ]
     
     name = models.CharField(max_length=100, verbose_name="Nom")
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, verbose_name="Type")
     site = models.ForeignKey(Site, on_delete=models.CASCADE, related_name="equipment", verbose_name="Site")
+    # Dénormalisé depuis site.company: filtre d'entreprise sans jointure
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="equipment",
+                                editable=False, verbose_name="Entreprise")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='online', verbose_name="Statut")
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name="Adresse IP")
     last_maintenance = models.DateField(null=True, blank=True, verbose_name="Dernière maintenance")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
-    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Mis à jour le")
+    
+    objects = EquipmentQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Équipement"
@@ -34,3 +100,26 @@ class Equipment(models.Model):
     
     def __str__(self):
         return self.name
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs en base, pour détecter un déplacement vers un site d'une autre entreprise
+        instance._loaded_site_id = instance.__dict__.get('site_id')
+        instance._loaded_company_id = instance.__dict__.get('company_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self.company_id is None or self.site_id != getattr(self, '_loaded_site_id', None):
+            site = self._state.fields_cache.get('site')
+            if site is not None and site.pk == self.site_id:
+                self.company_id = site.company_id
+            else:
+                self.company_id = Site.objects.filter(pk=self.site_id).values_list('company_id', flat=True).first()
+        loaded_company_id = getattr(self, '_loaded_company_id', None)
+        moved = not self._state.adding and loaded_company_id is not None and loaded_company_id != self.company_id
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if moved:
+                reassign_company([self.pk], self.company_id, loaded_company_id)
+        self._loaded_site_id, self._loaded_company_id = self.site_id, self.company_id
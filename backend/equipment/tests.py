@@ -1,3 +1,56 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from alerts.models import Alert
+from sites.models import Site
+from sync.mixins import encode_cursor
+from users.models import Company
+from .models import Equipment
+
+User = get_user_model()
+
+
+class CompanyReassignmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clients = {}
+        for name in ('ACME', 'Autre'):
+            company = Company.objects.create(name=name)
+            client = APIClient()
+            client.force_authenticate(user=User.objects.create_user(name.lower(), password='-', company=company))
+            self.clients[name] = (company, client)
+        self.site = Site.objects.create(name='Site', address='-', company=self.clients['ACME'][0])
+        self.equipment = Equipment.objects.create(name='Switch', type='switch', site=self.site)
+        self.alert = Alert.objects.create(title='Alerte', message='-', equipment=self.equipment)
+
+        # Dernière synchronisation des deux entreprises après la création
+        past = timezone.now() - timedelta(hours=1)
+        for model in (Site, Equipment, Alert):
+            model.objects.update(updated_at=past)
+        self.cursor = encode_cursor(past + timedelta(minutes=30))
+
+    def sync(self, name, url):
+        return self.clients[name][1].get(url, {'updated_since': self.cursor}).json()
+
+    def test_site_move_syncs_both_companies(self):
+        old_client = self.clients['ACME'][1]
+        self.assertEqual(len(old_client.get('/api/equipment/').json()['results']), 1)
+
+        self.site.company = self.clients['Autre'][0]
+        self.site.save()
+
+        for url, pk in (('/api/sites/', self.site.pk), ('/api/equipment/', self.equipment.pk),
+                        ('/api/alerts/', self.alert.pk)):
+            with self.subTest(url=url):
+                self.assertEqual([row['id'] for row in self.sync('Autre', url)['results']], [pk])
+                old = self.sync('ACME', url)
+                self.assertEqual((old['results'], old['deleted']), ([], [pk]))
 
-# Create your tests here.
+        # Réponses en cache de l'ancienne entreprise invalidées
+        self.assertEqual(old_client.get('/api/equipment/').json()['results'], [])
+        self.assertEqual(Alert.objects.get().company_id, self.clients['Autre'][0].pk)
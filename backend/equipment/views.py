@@ -3,11 +3,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import Count, Q
+from vigileos.cache import CachedResponseMixin
+from sync.mixins import DeltaSyncMixin
 from .models import Equipment
 from .serializers import EquipmentSerializer
 
-class EquipmentViewSet(viewsets.ModelViewSet):
+class EquipmentViewSet(DeltaSyncMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    sync_model_name = 'equipment'
     serializer_class = EquipmentSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
@@ -18,7 +21,7 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         # Filtrer les équipements par l'entreprise de l'utilisateur
-        queryset = Equipment.objects.filter(site__company=self.request.user.company)
+        queryset = Equipment.objects.filter(company_id=self.request.user.company_id)
         
         # Recherche textuelle
         search = self.request.query_params.get('search', None)
@@ -29,7 +32,7 @@ class EquipmentViewSet(viewsets.ModelViewSet):
                 Q(site__name__icontains=search)
             )
         
-        return queryset.select_related('site')
+        return queryset.select_related('site').order_by('-created_at', '-id')
     
     @action(detail=True, methods=['get'])
     def alerts(self, request, pk=None):
@@ -53,34 +56,38 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def maintenance(self, request, pk=None):
         """Marquer un équipement en maintenance"""
+        from metrics.status import update_site_statuses
         equipment = self.get_object()
         equipment.status = 'maintenance'
         equipment.save()
+        update_site_statuses([equipment.site_id])
         return Response({'status': 'Équipement mis en maintenance'})
     
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
-        """Activer un équipement"""
+        """Activer un équipement (fin de maintenance)"""
+        from metrics.status import update_site_statuses, update_statuses
         equipment = self.get_object()
-        equipment.status = 'active'
+        equipment.status = 'online'
         equipment.save()
+        # Statut réel d'après la dernière mesure et les alertes ouvertes
+        update_statuses([equipment.id])
+        update_site_statuses([equipment.site_id])
         return Response({'status': 'Équipement activé'})
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Statistiques des équipements"""
-        queryset = self.get_queryset()
-        stats = {
-            'total': queryset.count(),
-            'active': queryset.filter(status='active').count(),
-            'inactive': queryset.filter(status='inactive').count(),
-            'maintenance': queryset.filter(status='maintenance').count(),
-            'by_type': {}
-        }
+        counts = self.get_queryset().aggregate(
+            total=Count('id'),
+            **{code: Count('id', filter=Q(status=code)) for code, _ in Equipment.STATUS_CHOICES},
+            **{f'type_{code}': Count('id', filter=Q(type=code)) for code, _ in Equipment.TYPE_CHOICES},
+        )
+        stats = {'total': counts['total']}
+        for code, _ in Equipment.STATUS_CHOICES:
+            stats[code] = counts[code]
         
         # Statistiques par type
-        for equipment_type in Equipment.TYPE_CHOICES:
-            type_code = equipment_type[0]
-            stats['by_type'][type_code] = queryset.filter(type=type_code).count()
+        stats['by_type'] = {code: counts[f'type_{code}'] for code, _ in Equipment.TYPE_CHOICES}
         
         return Response(stats)
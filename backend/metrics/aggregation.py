@@ -0,0 +1,54 @@
+from django.db.models import Avg, Case, Count, ExpressionWrapper, F, FloatField, Max, Q, Sum, Value, When
+from django.db.models.functions import Cast
+
+
+def usage_percent(used_field, total_field, default=0.0):
+    """Expression SQL équivalente à NetworkMetric.memory_usage_percent / disk_usage_percent"""
+    return Case(
+        When(
+            **{f'{total_field}__gt': 0, f'{used_field}__gt': 0},
+            then=ExpressionWrapper(
+                Cast(used_field, FloatField()) * 100.0 / F(total_field),
+                output_field=FloatField()
+            )
+        ),
+        default=Value(default),
+        output_field=FloatField()
+    )
+
+
+def summarize_by_equipment(queryset):
+    """
+    Agrège un queryset de NetworkMetric par équipement en une seule requête.
+
+    Renvoie des dictionnaires compatibles avec MetricsSummarySerializer. Les
+    moyennes mémoire/disque sont divisées par le nombre total de mesures, comme
+    le faisait l'ancien calcul en Python.
+    """
+    total = Count('id')
+    return (
+        queryset
+        .order_by()
+        .values('equipment_id')
+        .annotate(
+            equipment_name=F('equipment__name'),
+            site_name=F('equipment__site__name'),
+            latest_timestamp=Max('timestamp'),
+            avg_ping=Avg('ping_response_time'),
+            avg_cpu=Avg('cpu_usage'),
+            avg_memory_usage=ExpressionWrapper(
+                Sum(usage_percent('memory_used', 'memory_total')) / total,
+                output_field=FloatField()
+            ),
+            avg_disk_usage=ExpressionWrapper(
+                Sum(usage_percent('disk_used', 'disk_total')) / total,
+                output_field=FloatField()
+            ),
+            uptime_percentage=ExpressionWrapper(
+                Cast(Count('id', filter=Q(is_online=True)), FloatField()) * 100.0 / total,
+                output_field=FloatField()
+            ),
+            total_measurements=total,
+        )
+        .order_by('equipment_id')
+    )
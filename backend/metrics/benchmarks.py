@@ -0,0 +1,568 @@
+"""
+Outils de benchmark des endpoints.
+
+Les scénarios s'exécutent sur une base de test jetable (voir la commande
+``benchmark``) peuplée par ``seed_fleet``, ou pour ceux de ``READ_ONLY`` sur
+la base courante peuplée par ``seed_scale``, et mesurent la latence et le
+nombre de requêtes SQL via le client de test DRF.
+"""
+import gzip
+import json
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import Company
+from sites.models import Site
+from equipment.models import Equipment
+from .models import NetworkMetric, ThresholdProfile
+
+User = get_user_model()
+
+
+def seed_fleet(equipment_count, samples_per_equipment, sites=10, interval=30, batch_size=5000):
+    """Crée une entreprise, ses sites, ses équipements et leurs mesures (une toutes les ``interval`` s)"""
+    company = Company.objects.create(name='Benchmark')
+    user = User.objects.create_user('benchmark', password='benchmark', company=company)
+    site_objs = Site.objects.bulk_create(
+        Site(name=f'Site {i}', address='-', company=company) for i in range(sites)
+    )
+    equipment = Equipment.objects.bulk_create(
+        Equipment(
+            name=f'Équipement {i}',
+            type='switch',
+            site=site_objs[i % len(site_objs)],
+            ip_address=f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+        )
+        for i in range(equipment_count)
+    )
+
+    rng = random.Random(42)
+    now = timezone.now()
+    batch = []
+    for item in equipment:
+        for sample in range(samples_per_equipment):
+            batch.append(NetworkMetric(
+                equipment=item,
+                timestamp=now - timedelta(seconds=interval * sample),
+                ping_response_time=rng.uniform(1, 200),
+                packet_loss=rng.uniform(0, 5),
+                cpu_usage=rng.uniform(0, 100),
+                memory_total=8 * 1024 ** 3,
+                memory_used=rng.randint(1, 8 * 1024 ** 3),
+                disk_total=512 * 1024 ** 3,
+                disk_used=rng.randint(1, 512 * 1024 ** 3),
+                is_online=rng.random() > 0.05,
+            ))
+            if len(batch) >= batch_size:
+                NetworkMetric.objects.bulk_create(batch)
+                batch = []
+    if batch:
+        NetworkMetric.objects.bulk_create(batch)
+
+    return {'company': company, 'user': user, 'equipment': equipment}
+
+
+def measure(func, repeat, warmup=0):
+    """Exécute ``func`` ``repeat`` fois (après ``warmup`` appels non mesurés) et renvoie latences (ms) et requêtes SQL"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        # Le journal des requêtes est borné: le vider évite un décompte faussé
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = len(ctx.captured_queries)
+    timings.sort()
+    return {
+        'queries': queries,
+        'min_ms': round(timings[0], 2),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[math.ceil(0.95 * len(timings)) - 1], 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+
+def existing_fleet(company=None):
+    """Entreprise déjà peuplée (``seed_scale``): la plus équipée par défaut, avec l'un de ses utilisateurs"""
+    from django.db.models import Count
+
+    companies = Company.objects.annotate(size=Count('equipment')).order_by('-size', 'pk')
+    company = companies.filter(pk=company).first() if company else companies.first()
+    user = company and company.users.filter(is_active=True).order_by('pk').first()
+    if user is None:
+        return None
+    return {'company': company, 'user': user, 'equipment': list(Equipment.objects.filter(company=company).order_by('pk'))}
+
+
+def api_client(fleet):
+    client = APIClient()
+    client.force_authenticate(user=fleet['user'])
+    return client
+
+
+def bench_summary(fleet, repeat):
+    client = api_client(fleet)
+
+    def call():
+        response = client.get('/api/metrics/summary/', {'hours': 24})
+        assert response.status_code == 200, response.status_code
+
+    return measure(call, repeat)
+
+
+def bench_latest(fleet, repeat):
+    client = api_client(fleet)
+
+    def call():
+        response = client.get('/api/metrics/latest/')
+        assert response.status_code == 200, response.status_code
+
+    return measure(call, repeat)
+
+
+def _ingest_rows(fleet, count):
+    rng = random.Random(7)
+    equipment = fleet['equipment']
+    start = timezone.now() - timedelta(days=30)
+    return [
+        {
+            'equipment': equipment[i % len(equipment)].id,
+            'timestamp': (start + timedelta(seconds=i // len(equipment))).isoformat(),
+            'ping_response_time': round(rng.uniform(1, 200), 2),
+            'cpu_usage': round(rng.uniform(0, 100), 2),
+            'memory_total': 8 * 1024 ** 3,
+            'memory_used': rng.randint(1, 8 * 1024 ** 3),
+            'is_online': True,
+        }
+        for i in range(count)
+    ]
+
+
+def bench_ingest(fleet, repeat, rows=5000):
+    """Compare bulk_create (JSON + serializer) et ingest (NDJSON gzip) à volume égal"""
+    client = api_client(fleet)
+    payload = _ingest_rows(fleet, rows)
+    body = gzip.compress('\n'.join(json.dumps(row) for row in payload).encode())
+
+    def legacy():
+        response = client.post('/api/metrics/bulk_create/', payload, format='json')
+        assert response.status_code == 201, response.status_code
+
+    def streaming():
+        response = client.generic(
+            'POST', '/api/metrics/ingest/', body,
+            content_type='application/x-ndjson', HTTP_CONTENT_ENCODING='gzip'
+        )
+        assert response.status_code == 201, response.status_code
+
+    results = {}
+    for name, func in (('bulk_create', legacy), ('ingest', streaming)):
+        result = measure(func, repeat)
+        result['rows_per_s'] = round(rows / (result['p50_ms'] / 1000))
+        results[name] = result
+    return results
+
+
+def bench_series(fleet, repeat):
+    """Compare la série compacte (500 points) à la pagination de /metrics/ sur 24h"""
+    from .rollups import RESOLUTIONS, rollup
+
+    for resolution in RESOLUTIONS:
+        while rollup(resolution):
+            pass
+
+    client = api_client(fleet)
+    equipment_id = fleet['equipment'][0].id
+    since = (timezone.now() - timedelta(hours=24)).isoformat()
+    payload = {}
+
+    def series():
+        response = client.get('/api/metrics/series/', {
+            'equipment': equipment_id, 'fields': 'ping_response_time,cpu_usage', 'points': 500,
+        })
+        assert response.status_code == 200, response.status_code
+        payload['series'] = len(response.content)
+
+    def paging():
+        size, page = 0, 1
+        while True:
+            response = client.get('/api/metrics/', {'equipment': equipment_id, 'page': page})
+            assert response.status_code == 200, response.status_code
+            size += len(response.content)
+            data = response.json()
+            if not data['next'] or data['results'][-1]['timestamp'] < since:
+                break
+            page += 1
+        payload['paging'] = size
+
+    results = {}
+    for name, func in (('series', series), ('paging', paging)):
+        results[name] = measure(func, repeat)
+        results[name]['bytes'] = payload[name]
+    return results
+
+
+def bench_pagination(fleet, repeat, depths=(1, 100, 1000)):
+    """Latence de /metrics/ à la page N: numéro de page (COUNT + OFFSET) contre curseur keyset"""
+    from vigileos.pagination import KeysetPagination
+
+    client = api_client(fleet)
+    ordered = NetworkMetric.objects.filter(
+        company=fleet['company']
+    ).order_by('-timestamp', '-id')
+    paginator = KeysetPagination()
+    paginator.field = NetworkMetric._meta.get_field('timestamp')
+
+    results = {}
+    for depth in depths:
+        # Curseur de la page ``depth``: dernière ligne de la page précédente
+        previous_row = ordered[(depth - 1) * 20 - 1:(depth - 1) * 20].first() if depth > 1 else None
+        if depth > 1 and previous_row is None:
+            # Pas assez de mesures pour cette profondeur
+            continue
+        cursor = paginator.encode_cursor(previous_row, previous=False) if previous_row else None
+
+        def page_number():
+            response = client.get('/api/metrics/', {'page': depth})
+            assert response.status_code == 200, response.status_code
+
+        def keyset():
+            response = client.get('/api/metrics/', {'cursor': cursor} if cursor else {})
+            assert response.status_code == 200, response.status_code
+
+        results[f'page_{depth}'] = {'page_number': measure(page_number, repeat), 'keyset': measure(keyset, repeat)}
+    return results
+
+
+def bench_stats(fleet, repeat):
+    """Actions ``stats`` et vue d'ensemble du tableau de bord, hors cache de réponses"""
+    from vigileos.cache import bump_generation
+
+    client = api_client(fleet)
+    company_id = fleet['company'].id
+    urls = {
+        'alerts': '/api/alerts/stats/',
+        'equipment': '/api/equipment/stats/',
+        'company': f'/api/auth/companies/{company_id}/stats/',
+        'overview': '/api/dashboard/overview/',
+    }
+    results = {}
+    for name, url in urls.items():
+        def call():
+            bump_generation([company_id])
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+
+        results[name] = measure(call, repeat, warmup=1)
+    return results
+
+
+def bench_lists(fleet, repeat):
+    """Première page des listes et recherches, hors cache de réponses"""
+    from vigileos.cache import bump_generation
+
+    client = api_client(fleet)
+    company_id = fleet['company'].id
+    requests = {
+        'sites': ('/api/sites/', {}),
+        'equipment': ('/api/equipment/', {}),
+        'alerts': ('/api/alerts/', {}),
+        'alerts_active': ('/api/alerts/', {'status': 'active'}),
+        'alerts_search': ('/api/alerts/', {'search': 'ping'}),
+        'equipment_search': ('/api/equipment/', {'search': 'routeur'}),
+        'metrics': ('/api/metrics/', {}),
+        'thresholds': ('/api/thresholds/', {}),
+    }
+    results = {}
+    for name, (url, params) in requests.items():
+        def call():
+            bump_generation([company_id])
+            response = client.get(url, params)
+            assert response.status_code == 200, response.status_code
+
+        results[name] = measure(call, repeat, warmup=1)
+    return results
+
+
+def compare(baseline, results, tolerance, min_delta_ms, path=''):
+    """
+    Régressions de ``results`` par rapport à ``baseline``: latence (p50/p95)
+    au-delà de la tolérance relative et d'un écart absolu minimal, ou requêtes
+    SQL supplémentaires. Les mesures absentes de l'une des deux sont ignorées.
+    """
+    regressions = []
+    for key, current in results.items():
+        reference = baseline.get(key)
+        name = f'{path}.{key}' if path else key
+        if isinstance(current, dict) and isinstance(reference, dict):
+            regressions.extend(compare(reference, current, tolerance, min_delta_ms, name))
+        elif not isinstance(reference, (int, float)) or not isinstance(current, (int, float)):
+            continue
+        elif key == 'queries' and current > reference:
+            regressions.append(f'{name}: {reference} -> {current} requêtes')
+        elif key in ('p50_ms', 'p95_ms') and current > reference * (1 + tolerance) and current - reference > min_delta_ms:
+            regressions.append(f'{name}: {reference} -> {current} ms (+{(current / reference - 1) * 100:.0f}%)')
+    return regressions
+
+
+def bench_export(fleet, repeat):
+    """Export CSV de 24h de mesures: débit (lignes/s) et pic mémoire Python pendant le flux"""
+    client = api_client(fleet)
+    since = timezone.now() - timedelta(hours=24)
+    rows = NetworkMetric.objects.filter(timestamp__gte=since).count()
+    payload = {}
+
+    def export():
+        tracemalloc.start()
+        response = client.get('/api/metrics/export/', {'output': 'csv', 'from': since.isoformat()})
+        assert response.status_code == 200, response.status_code
+        size = 0
+        for chunk in response.streaming_content:
+            size += len(chunk)
+        payload['peak'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        payload['bytes'] = size
+
+    result = measure(export, repeat)
+    result['rows'] = rows
+    result['rows_per_s'] = round(rows / (result['p50_ms'] / 1000))
+    result['bytes'] = payload['bytes']
+    result['peak_kib'] = round(payload['peak'] / 1024)
+    return result
+
+
+def bench_thresholds(fleet, repeat, samples=10000):
+    """
+    Coût d'évaluation des seuils (profil d'entreprise, sans ligne par équipement) pour
+    un lot de 10 000 mesures, cache de seuils froid puis chaud, et mise à jour en masse
+    des surcharges de tout le parc
+    """
+    from .thresholds import evaluate, threshold_cache
+
+    equipment = fleet['equipment']
+    ThresholdProfile.objects.get_or_create(company=fleet['company'], site=None, equipment_type='')
+    rng = random.Random(11)
+    start = timezone.now()
+    batch = [
+        NetworkMetric(
+            equipment_id=equipment[i % len(equipment)].id,
+            timestamp=start + timedelta(seconds=i // len(equipment)),
+            ping_response_time=rng.uniform(1, 600),
+            packet_loss=rng.uniform(0, 25),
+            cpu_usage=rng.uniform(0, 100),
+            memory_total=8 * 1024 ** 3,
+            memory_used=rng.randint(1, 8 * 1024 ** 3),
+        )
+        for i in range(samples)
+    ]
+
+    def cold():
+        threshold_cache.invalidate()
+        evaluate(batch)
+
+    client = api_client(fleet)
+    payload = {'equipment_ids': [item.id for item in equipment], 'thresholds': {'cpu_warning_threshold': 85}}
+
+    def bulk_update():
+        response = client.post('/api/thresholds/bulk_update/', payload, format='json')
+        assert response.status_code == 200, response.status_code
+
+    return {
+        'cold_cache': measure(cold, repeat),
+        'warm_cache': measure(lambda: evaluate(batch), repeat),
+        'bulk_update': measure(bulk_update, repeat),
+    }
+
+
+def bench_cache(fleet, repeat, alerts=500):
+    """Latence des listes sites / équipements / alertes sans cache (génération incrémentée) et avec"""
+    from alerts.models import Alert
+    from vigileos.cache import bump_generation, cache_stats
+
+    equipment = fleet['equipment']
+    Alert.objects.bulk_create(
+        Alert(title=f'Alerte {i}', message='-', equipment=equipment[i % len(equipment)]) for i in range(alerts)
+    )
+    client = api_client(fleet)
+    company_id = fleet['company'].id
+    urls = ['/api/sites/', '/api/equipment/', '/api/alerts/']
+
+    def call():
+        for url in urls:
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+
+    def uncached():
+        bump_generation([company_id])
+        call()
+
+    cache_stats.reset()
+    results = {'uncached': measure(uncached, repeat)}
+    call()
+    results['cached'] = measure(call, repeat)
+    results['hit_rate'] = {endpoint: values['hit_rate'] for endpoint, values in cache_stats.snapshot().items()}
+    return results
+
+
+def bench_realtime(fleet, repeat, connections=1000):
+    """
+    Flux SSE ouverts dans un seul processus: temps d'ouverture, mémoire Python
+    par connexion et délai de diffusion d'une alerte à toutes les connexions.
+    """
+    import asyncio
+
+    from asgiref.sync import sync_to_async
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from alerts.models import Alert
+    from realtime.stream import PATH
+    from vigileos.asgi import application
+
+    token = str(AccessToken.for_user(fleet['user']))
+    equipment = fleet['equipment'][0]
+
+    async def run():
+        disconnect = asyncio.Event()
+        ready = asyncio.Semaphore(0)
+        received = {'count': 0}
+        delivered = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            body = message.get('body', b'')
+            if body.startswith(b'retry:'):
+                ready.release()
+            elif body.startswith(b'event: alerts'):
+                received['count'] += 1
+                if received['count'] == connections:
+                    delivered.set()
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': PATH,
+            'query_string': f'token={token}&topics=alerts'.encode(), 'headers': [],
+        }
+        tracemalloc.start()
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(application(scope, receive, send)) for _ in range(connections)]
+        for _ in range(connections):
+            await ready.acquire()
+        connect_s = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        timings = []
+        for i in range(repeat):
+            received['count'] = 0
+            delivered.clear()
+            start = time.perf_counter()
+            await sync_to_async(Alert.objects.create)(title=f'Temps réel {i}', message='-', equipment=equipment)
+            await asyncio.wait_for(delivered.wait(), 30)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        timings.sort()
+        return {
+            'connections': connections,
+            'connect_s': round(connect_s, 2),
+            'kib_per_connection': round(memory / connections / 1024, 1),
+            'fanout_p50_ms': round(statistics.median(timings), 2),
+            'fanout_max_ms': round(timings[-1], 2),
+        }
+
+    return asyncio.run(run())
+
+
+def bench_search(fleet, repeat, alerts=1_000_000, batch_size=10000):
+    """
+    Recherche d'alertes sur un historique volumineux: index plein texte
+    (/api/alerts/?search=) contre l'ancien LIKE '%terme%' sur titre, message et
+    nom d'équipement; débit d'insertion avec maintenance de l'index par triggers.
+    """
+    from django.db.models import Q
+
+    from alerts.models import Alert
+    from vigileos.cache import bump_generation
+
+    rng = random.Random(5)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 9))) for _ in range(5000)]
+    titles = ['Ping élevé', 'Perte de paquets', 'CPU critique', 'Mémoire saturée', 'Disque plein', 'Équipement hors ligne']
+    equipment = fleet['equipment']
+    start = time.perf_counter()
+    for offset in range(0, alerts, batch_size):
+        Alert.objects.bulk_create(
+            Alert(
+                title=rng.choice(titles),
+                message=' '.join(rng.choice(words) for _ in range(12)),
+                equipment=equipment[i % len(equipment)],
+                status='resolved',
+            )
+            for i in range(offset, min(offset + batch_size, alerts))
+        )
+    insert_s = time.perf_counter() - start
+
+    client = api_client(fleet)
+    company_alerts = Alert.objects.filter(company=fleet['company'])
+    # Terme fréquent (1/6 des alertes), terme rare, préfixe de nom d'équipement
+    queries = {'frequent': 'critique', 'rare': words[1234], 'prefix': 'équip 12'}
+
+    results = {'alerts': alerts, 'insert_rows_per_s': round(alerts / insert_s)}
+    for name, query in queries.items():
+        def indexed():
+            # Hors cache de réponses
+            bump_generation([fleet['company'].id])
+            response = client.get('/api/alerts/', {'search': query})
+            assert response.status_code == 200, response.status_code
+
+        def like():
+            matches = company_alerts
+            for term in query.split():
+                matches = matches.filter(
+                    Q(title__icontains=term) | Q(message__icontains=term) | Q(equipment__name__icontains=term)
+                )
+            matches.count()
+            list(matches.select_related('equipment__site').order_by('-created_at')[:20])
+
+        results[name] = {
+            'query': query,
+            'matches': Alert.objects.filter(search__document__match=query).count(),
+            'indexed': measure(indexed, repeat),
+            'like': measure(like, repeat),
+        }
+    return results
+
+
+SCENARIOS = {
+    'summary': bench_summary,
+    'latest': bench_latest,
+    'stats': bench_stats,
+    'lists': bench_lists,
+    'ingest': bench_ingest,
+    'series': bench_series,
+    'pagination': bench_pagination,
+    'export': bench_export,
+    'thresholds': bench_thresholds,
+    'cache': bench_cache,
+    'realtime': bench_realtime,
+    'search': bench_search,
+}
+
+# Scénarios sans écriture, utilisables sur une base peuplée par seed_scale (benchmark --existing)
+READ_ONLY = {'summary', 'latest', 'stats', 'lists', 'pagination', 'export'}
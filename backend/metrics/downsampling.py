@@ -0,0 +1,41 @@
+def lttb_indices(xs, ys, threshold):
+    """
+    Indices retenus par Largest-Triangle-Three-Buckets pour réduire la série
+    (xs, ys) à ``threshold`` points en conservant sa forme visuelle.
+
+    Les valeurs ``None`` de ``ys`` sont remplacées par la moyenne de l'intervalle
+    suivant pour le calcul des aires; premier et dernier points sont toujours gardés.
+    """
+    length = len(xs)
+    if threshold >= length or threshold < 3:
+        return list(range(length))
+
+    every = (length - 2) / (threshold - 2)
+    selected = [0]
+    previous = 0
+    for i in range(threshold - 2):
+        # Point moyen de l'intervalle suivant
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, length)
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        values = [y for y in ys[next_start:next_end] if y is not None]
+        avg_y = sum(values) / len(values) if values else 0.0
+
+        previous_x = xs[previous]
+        previous_y = ys[previous] if ys[previous] is not None else avg_y
+
+        # Point de l'intervalle courant formant le plus grand triangle
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            y = ys[j] if ys[j] is not None else avg_y
+            area = abs(
+                (previous_x - avg_x) * (y - previous_y)
+                - (previous_x - xs[j]) * (avg_y - previous_y)
+            )
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        previous = best
+
+    selected.append(length - 1)
+    return selected
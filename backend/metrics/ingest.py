@@ -0,0 +1,296 @@
+"""
+Ingestion en flux des mesures (NDJSON ou CSV, éventuellement compressés gzip).
+
+Le corps de la requête est lu ligne par ligne, validé par paquets, et chaque
+paquet est inséré en upsert sur (equipment, timestamp): un renvoi après une
+coupure réseau ne crée pas de doublon. L'appartenance des équipements à
+l'entreprise de l'appelant est résolue une seule fois par identifiant.
+"""
+import csv
+import gzip
+import io
+import json
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from equipment.models import Equipment
+from .models import NetworkMetric, MetricValues, MAX_CLOCK_SKEW
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+CSV_CONTENT_TYPES = ('text/csv', 'application/csv')
+
+FLOAT_FIELDS = ('ping_response_time', 'packet_loss', 'cpu_usage')
+INTEGER_FIELDS = ('bandwidth_up', 'bandwidth_down', 'memory_total', 'memory_used', 'disk_total', 'disk_used')
+CONNECTION_QUALITIES = {
+    choice for choice, _ in MetricValues._meta.get_field('connection_quality').choices
+}
+# Taille maximale du corps une fois décompressé (METRICS_INGEST_MAX_BYTES)
+MAX_BODY_BYTES = 256 * 1024 * 1024
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', 'off'}
+
+
+class RowError(ValueError):
+    pass
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class _RequestStream(io.RawIOBase):
+    """Adapte le flux d'une HttpRequest (read seul) à l'interface io"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _LimitedStream(io.RawIOBase):
+    """Lève BodyTooLarge au-delà de ``limit`` octets lus (protège contre les bombes gzip)"""
+
+    def __init__(self, stream, limit):
+        self._stream = stream
+        self._limit = self._remaining = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        # Un octet de plus que le reste autorisé suffit à détecter le dépassement
+        data = self._stream.read(min(len(buffer), self._remaining + 1))
+        if len(data) > self._remaining:
+            raise BodyTooLarge(f'Corps de requête décompressé au-delà de {self._limit} octets')
+        self._remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def max_body_bytes():
+    return getattr(settings, 'METRICS_INGEST_MAX_BYTES', MAX_BODY_BYTES)
+
+
+def open_body(stream, content_encoding=None, max_bytes=None):
+    """
+    Renvoie un flux texte, décompressé si nécessaire, lu par blocs. Avec ``max_bytes``,
+    la lecture lève BodyTooLarge au-delà de cette taille décompressée.
+    """
+    stream = io.BufferedReader(_RequestStream(stream), buffer_size=64 * 1024)
+    if content_encoding and content_encoding.lower() == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    if max_bytes is not None:
+        stream = io.BufferedReader(_LimitedStream(stream, max_bytes), buffer_size=64 * 1024)
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def iter_ndjson(text):
+    for line_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, f'JSON invalide: {exc}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Objet JSON attendu'
+            continue
+        yield line_number, row, None
+
+
+def iter_csv(text):
+    reader = csv.DictReader(text)
+    for row in reader:
+        # La ligne 1 est l'en-tête
+        yield reader.line_num, {key: value for key, value in row.items() if key}, None
+
+
+def _empty(value):
+    return value is None or value == ''
+
+
+def _number(row, field, cast):
+    value = row.get(field)
+    if _empty(value):
+        return None
+    if isinstance(value, bool):
+        raise RowError(f'{field}: nombre attendu')
+    if cast is int and isinstance(value, float) and not value.is_integer():
+        # int() tronquerait 3.5 en 3
+        raise RowError(f'{field}: entier attendu')
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{field}: nombre attendu')
+    if not math.isfinite(value):
+        raise RowError(f'{field}: nombre fini attendu')
+    return value
+
+
+def _timestamp(row, now):
+    """Horodatage ISO 8601 ou epoch (secondes); l'heure de réception par défaut"""
+    value = row.get('timestamp')
+    if _empty(value):
+        return now
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            parsed = datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise RowError('timestamp: epoch invalide')
+    else:
+        try:
+            parsed = parse_datetime(str(value).strip())
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise RowError('timestamp: date ISO 8601 ou epoch attendu')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+    if parsed > now + MAX_CLOCK_SKEW:
+        raise RowError('timestamp: date dans le futur')
+    return parsed
+
+
+def clean_row(row, now=None):
+    """Convertit une ligne brute en kwargs de NetworkMetric, ou lève RowError"""
+    equipment_id = _number(row, 'equipment', int)
+    if equipment_id is None:
+        raise RowError('equipment: champ obligatoire')
+
+    values = {
+        'equipment_id': equipment_id,
+        'timestamp': _timestamp(row, now or timezone.now()),
+    }
+    for field in FLOAT_FIELDS:
+        values[field] = _number(row, field, float)
+    for field in INTEGER_FIELDS:
+        values[field] = _number(row, field, int)
+
+    is_online = row.get('is_online')
+    if _empty(is_online):
+        values['is_online'] = True
+    elif isinstance(is_online, bool):
+        values['is_online'] = is_online
+    elif str(is_online).strip().lower() in TRUE_VALUES:
+        values['is_online'] = True
+    elif str(is_online).strip().lower() in FALSE_VALUES:
+        values['is_online'] = False
+    else:
+        raise RowError('is_online: booléen attendu')
+
+    quality = row.get('connection_quality')
+    if _empty(quality):
+        values['connection_quality'] = 'good'
+    elif quality in CONNECTION_QUALITIES:
+        values['connection_quality'] = quality
+    else:
+        raise RowError(f'connection_quality: valeur invalide « {quality} »')
+
+    return values
+
+
+class MetricIngestor:
+    """
+    Valide et insère des lignes de mesures pour une entreprise donnée.
+
+    En mode ``backfill`` (reprise d'historique), chaque paquet est validé dans
+    sa propre transaction courte, suivie d'une pause optionnelle, pour ne pas
+    bloquer l'ingestion temps réel.
+    """
+
+    def __init__(self, company, chunk_size=5000, batch_size=1000, max_errors=100,
+                 backfill=False, pause=0):
+        self.company = company
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.backfill = backfill
+        self.pause = pause
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+        self._owned = {}
+
+    def reject(self, line_number, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'error': message})
+
+    def resolve_equipment(self, equipment_ids):
+        """Vérifie en une requête l'appartenance des équipements pas encore vus"""
+        unknown = set(equipment_ids) - self._owned.keys()
+        if unknown:
+            owned = set(
+                Equipment.objects.filter(company=self.company, id__in=unknown)
+                .values_list('id', flat=True)
+            )
+            for equipment_id in unknown:
+                self._owned[equipment_id] = equipment_id in owned
+
+    def ingest_chunk(self, rows):
+        now = timezone.now()
+        cleaned = []
+        for line_number, row, error in rows:
+            if error:
+                self.reject(line_number, error)
+                continue
+            try:
+                cleaned.append((line_number, clean_row(row, now)))
+            except RowError as exc:
+                self.reject(line_number, str(exc))
+
+        self.resolve_equipment(values['equipment_id'] for _, values in cleaned)
+
+        metrics = []
+        for line_number, values in cleaned:
+            if not self._owned[values['equipment_id']]:
+                self.reject(line_number, f"equipment: équipement {values['equipment_id']} introuvable")
+                continue
+            metrics.append(NetworkMetric(**values))
+
+        if metrics:
+            NetworkMetric.objects.upsert(metrics, batch_size=self.batch_size, backfill=self.backfill)
+            self.accepted += len(metrics)
+
+    def chunks(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def ingest(self, rows):
+        if self.backfill:
+            for chunk in self.chunks(rows):
+                with transaction.atomic():
+                    self.ingest_chunk(chunk)
+                if self.pause:
+                    time.sleep(self.pause)
+        else:
+            with transaction.atomic():
+                for chunk in self.chunks(rows):
+                    self.ingest_chunk(chunk)
+        return self.result()
+
+    def result(self):
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+        }
@@ -0,0 +1,369 @@
+"""
+Générateur de charge contre une API en cours d'exécution.
+
+Des collecteurs simulés envoient des paquets de mesures NDJSON sur
+``/api/metrics/ingest/`` à intervalle fixe, pendant que des tableaux de bord
+simulés interrogent en boucle l'instantané, les statistiques d'alertes et les
+listes. Chaque client virtuel garde sa propre connexion HTTP/1.1 persistante
+(asyncio pur, sans dépendance): le serveur voit autant de connexions
+simultanées que de clients. Latences, débit et erreurs sont relevés par
+endpoint pour dimensionner les workers avant un déploiement.
+
+Les jetons JWT sont obtenus par ``/api/auth/login/`` puis renouvelés à
+mi-durée de vie (``SIMPLE_JWT``); connexion et renouvellements ne sont pas
+comptés dans les mesures.
+"""
+import asyncio
+import json
+import math
+import random
+import ssl
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urlsplit
+
+from rest_framework_simplejwt.settings import api_settings
+
+INGEST_PATH = '/api/metrics/ingest/'
+# Requêtes d'un cycle de rafraîchissement du tableau de bord
+DASHBOARD_PATHS = (
+    '/api/metrics/latest/',
+    '/api/alerts/stats/',
+    '/api/alerts/?status=active',
+    '/api/equipment/',
+    '/api/sites/',
+    '/api/metrics/',
+)
+MEMORY_TOTAL = 8 * 1024 ** 3
+
+
+class HttpError(Exception):
+    pass
+
+
+class ConnectionClosed(HttpError):
+    """Le serveur a fermé la connexion avant de répondre"""
+
+
+class HttpConnection:
+    """Connexion HTTP/1.1 persistante (keep-alive), rouverte si le serveur la ferme"""
+
+    def __init__(self, host, port, use_ssl=False):
+        self.host = host
+        self.port = port
+        self.ssl = ssl.create_default_context() if use_ssl else None
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b'', headers=None):
+        """(statut, corps) de la réponse; une connexion réutilisée périmée est rouverte une fois"""
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        head += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        payload = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+        while True:
+            reused = self.writer is not None
+            if not reused:
+                await self.open()
+            try:
+                self.writer.write(payload)
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionClosed, ConnectionResetError, BrokenPipeError):
+                self.close()
+                # Keep-alive expiré côté serveur entre deux requêtes: nouvel essai
+                if not reused:
+                    raise
+            except BaseException:
+                # Réponse partielle ou délai dépassé: la connexion est inutilisable
+                self.close()
+                raise
+
+    async def _read_response(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionClosed('connexion fermée par le serveur')
+        parts = line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/'):
+            raise HttpError(f'ligne de statut invalide: {line[:80]!r}')
+        version, status = parts[0], int(parts[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == b'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if not size:
+                    # Fin du corps et en-têtes de fin éventuels
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                body += await self.reader.readexactly(size)
+                await self.reader.readexactly(2)
+            body = bytes(body)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        elif status in (204, 304) or status < 200:
+            body = b''
+        else:
+            body = await self.reader.read()
+            keep_alive = False
+        if not keep_alive:
+            self.close()
+        return status, body
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = Counter()
+        self.rows = 0
+
+    def snapshot(self, elapsed):
+        timings = sorted(self.latencies)
+        requests = len(timings)
+        errors = sum(self.errors.values())
+
+        def percentile(fraction):
+            return round(timings[math.ceil(fraction * requests) - 1], 2) if timings else None
+
+        snapshot = {
+            'requests': requests,
+            'rps': round(requests / elapsed, 2) if elapsed else 0,
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else 0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': round(timings[-1], 2) if timings else None,
+        }
+        if self.errors:
+            snapshot['error_kinds'] = dict(self.errors.most_common())
+        if self.rows:
+            snapshot['rows_per_s'] = round(self.rows / elapsed, 1) if elapsed else 0
+        return snapshot
+
+
+class Session:
+    """Jetons JWT d'un utilisateur et équipements de son entreprise"""
+
+    def __init__(self, username):
+        self.username = username
+        self.access = self.refresh = None
+        self.equipment = []
+
+    @property
+    def headers(self):
+        return {'Authorization': f'Bearer {self.access}'}
+
+
+class LoadTest:
+    def __init__(self, url, usernames, password, collectors=10, dashboards=50, duration=60,
+                 batch_size=100, collector_interval=10.0, poll_interval=5.0, timeout=30.0, seed=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f'URL invalide: {url}')
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.usernames = usernames
+        self.password = password
+        self.collectors = collectors
+        self.dashboards = dashboards
+        self.duration = duration
+        self.batch_size = batch_size
+        self.collector_interval = collector_interval
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.stats = defaultdict(EndpointStats)
+
+    def connection(self):
+        return HttpConnection(self.host, self.port, self.ssl)
+
+    async def call_json(self, conn, method, path, data=None, headers=None):
+        """Requête de préparation (non mesurée): corps JSON décodé, erreur si statut >= 400"""
+        body = json.dumps(data).encode() if data is not None else b''
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json', **(headers or {})}
+        status, content = await asyncio.wait_for(
+            conn.request(method, self.prefix + path, body, headers), self.timeout
+        )
+        if status >= 400:
+            raise HttpError(f'{method} {path}: HTTP {status} {content[:200].decode(errors="replace")}')
+        return json.loads(content) if content else None
+
+    async def login(self, conn, session):
+        tokens = await self.call_json(conn, 'POST', '/api/auth/login/', {
+            'username': session.username, 'password': self.password,
+        })
+        session.access, session.refresh = tokens['access'], tokens['refresh']
+
+    async def load_equipment(self, conn, session):
+        # L'instantané couvre tout équipement ayant déjà remonté une mesure
+        latest = await self.call_json(conn, 'GET', '/api/metrics/latest/', headers=session.headers)
+        ids = [row['equipment'] for row in latest]
+        path = '/api/equipment/'
+        while not ids and path:
+            page = await self.call_json(conn, 'GET', path, headers=session.headers)
+            ids += [row['id'] for row in page['results']]
+            path = page['next'] and urlsplit(page['next'])._replace(scheme='', netloc='').geturl()
+            if path and self.prefix:
+                path = path[len(self.prefix):]
+        session.equipment = ids
+
+    async def keep_fresh(self, session):
+        """Renouvelle le jeton d'accès à mi-durée de vie"""
+        conn = self.connection()
+        delay = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds() / 2
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                tokens = await self.call_json(conn, 'POST', '/api/auth/refresh/', {'refresh': session.refresh})
+                session.access = tokens['access']
+                session.refresh = tokens.get('refresh', session.refresh)
+        finally:
+            conn.close()
+
+    async def timed(self, conn, label, method, path, body=b'', headers=None):
+        """Requête mesurée; renvoie le corps si la réponse est un succès, None sinon"""
+        stats = self.stats[label]
+        start = time.perf_counter()
+        try:
+            status, content = await asyncio.wait_for(
+                conn.request(method, self.prefix + path, body, headers), self.timeout
+            )
+        except asyncio.TimeoutError:
+            stats.latencies.append((time.perf_counter() - start) * 1000)
+            stats.errors['timeout'] += 1
+            return None
+        except (OSError, HttpError, asyncio.IncompleteReadError) as exc:
+            stats.latencies.append((time.perf_counter() - start) * 1000)
+            stats.errors[type(exc).__name__] += 1
+            return None
+        stats.latencies.append((time.perf_counter() - start) * 1000)
+        if status >= 400:
+            stats.errors[str(status)] += 1
+            return None
+        return content
+
+    def batch(self, equipment, offset):
+        """Une mesure par équipement (au plus ``batch_size``), toutes à l'instant courant"""
+        count = min(self.batch_size, len(equipment))
+        now = datetime.now(dt_timezone.utc).isoformat()
+        rng = self.rng
+        lines = []
+        for i in range(count):
+            lines.append(json.dumps({
+                'equipment': equipment[(offset + i) % len(equipment)],
+                'timestamp': now,
+                'ping_response_time': round(rng.uniform(1, 200), 2),
+                'packet_loss': round(rng.uniform(0, 5), 2),
+                'cpu_usage': round(rng.uniform(0, 100), 1),
+                'memory_used': rng.randint(1, MEMORY_TOTAL),
+                'memory_total': MEMORY_TOTAL,
+                'is_online': rng.random() > 0.02,
+            }))
+        return ('\n'.join(lines) + '\n').encode(), count
+
+    async def collector(self, session, equipment, deadline):
+        conn = self.connection()
+        label = f'POST {INGEST_PATH}'
+        loop = asyncio.get_running_loop()
+        offset = 0
+        # Départs étalés: pas de rafale synchronisée de tous les collecteurs
+        next_at = loop.time() + self.rng.uniform(0, self.collector_interval)
+        try:
+            while True:
+                await asyncio.sleep(max(0, next_at - loop.time()))
+                if loop.time() >= deadline:
+                    break
+                body, count = self.batch(equipment, offset)
+                offset += count
+                headers = {**session.headers, 'Content-Type': 'application/x-ndjson'}
+                content = await self.timed(conn, label, 'POST', INGEST_PATH, body, headers)
+                if content is not None:
+                    self.stats[label].rows += json.loads(content).get('accepted', 0)
+                # Cadence fixe: un envoi en retard n'est pas rattrapé par une rafale
+                next_at = max(next_at + self.collector_interval, loop.time())
+        finally:
+            conn.close()
+
+    async def dashboard(self, session, deadline):
+        conn = self.connection()
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(self.rng.uniform(0, self.poll_interval))
+        try:
+            while loop.time() < deadline:
+                for path in DASHBOARD_PATHS:
+                    await self.timed(conn, f'GET {path}', 'GET', path, headers=session.headers)
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            conn.close()
+
+    async def prepare(self):
+        sessions = [Session(username) for username in self.usernames]
+        conn = self.connection()
+        try:
+            for session in sessions:
+                await self.login(conn, session)
+                await self.load_equipment(conn, session)
+                if self.collectors and not session.equipment:
+                    raise HttpError(f'{session.username}: aucun équipement pour les collecteurs')
+        finally:
+            conn.close()
+        return sessions
+
+    async def run(self):
+        sessions = await self.prepare()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.duration
+
+        clients = []
+        for i in range(self.collectors):
+            # Collecteurs d'une même entreprise: parts disjointes de son parc
+            session = sessions[i % len(sessions)]
+            share = i // len(sessions)
+            peers = len(range(i % len(sessions), self.collectors, len(sessions)))
+            equipment = session.equipment[share::peers] or session.equipment
+            clients.append(self.collector(session, equipment, deadline))
+        for i in range(self.dashboards):
+            clients.append(self.dashboard(sessions[i % len(sessions)], deadline))
+
+        refreshers = [asyncio.create_task(self.keep_fresh(session)) for session in sessions]
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*clients)
+        finally:
+            for task in refreshers:
+                task.cancel()
+            await asyncio.gather(*refreshers, return_exceptions=True)
+        return self.report(time.perf_counter() - start, sessions)
+
+    def report(self, elapsed, sessions):
+        total = EndpointStats()
+        for stats in self.stats.values():
+            total.latencies += stats.latencies
+            total.errors.update(stats.errors)
+        return {
+            'duration_s': round(elapsed, 1),
+            'collectors': self.collectors,
+            'dashboards': self.dashboards,
+            'users': {session.username: len(session.equipment) for session in sessions},
+            'endpoints': {label: stats.snapshot(elapsed) for label, stats in sorted(self.stats.items())},
+            'total': total.snapshot(elapsed),
+        }
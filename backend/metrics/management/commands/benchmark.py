@@ -0,0 +1,97 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from metrics.benchmarks import READ_ONLY, SCENARIOS, compare, existing_fleet, seed_fleet
+
+
+class Command(BaseCommand):
+    help = "Mesure latence et nombre de requêtes SQL des endpoints sur une base de test jetable (ou la base courante avec --existing)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help=f"Scénarios à exécuter parmi {', '.join(sorted(SCENARIOS))} (tous par défaut)")
+        parser.add_argument('--equipment', type=int, default=200, help="Nombre d'équipements générés")
+        parser.add_argument('--samples', type=int, default=2880, help='Mesures par équipement (2880 = 24h à 30s)')
+        parser.add_argument('--repeat', type=int, default=5, help='Nombre de répétitions par scénario')
+        parser.add_argument('--existing', action='store_true',
+                            help=f"Base courante (peuplée par seed_scale) au lieu d'une base jetable; "
+                                 f"scénarios sans écriture seulement: {', '.join(sorted(READ_ONLY))}")
+        parser.add_argument('--company', type=int, help="Avec --existing: entreprise mesurée (la plus équipée par défaut)")
+        parser.add_argument('--save-baseline', metavar='FICHIER', help="Enregistre les résultats comme référence JSON")
+        parser.add_argument('--baseline', metavar='FICHIER', help="Compare à une référence JSON et échoue en cas de régression")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Hausse relative de p50/p95 tolérée par rapport à la référence (0.25 = +25%%)")
+        parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                            help="Écart absolu en dessous duquel une hausse de latence est ignorée (bruit)")
+
+    def handle(self, *args, **options):
+        existing = options['existing']
+        available = READ_ONLY if existing else set(SCENARIOS)
+        scenarios = options['scenarios'] or sorted(available)
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Scénarios inconnus: {', '.join(sorted(unknown))}")
+        if set(scenarios) - available:
+            raise CommandError(
+                f"Scénarios avec écriture, impossibles avec --existing: {', '.join(sorted(set(scenarios) - available))}"
+            )
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Référence illisible: {exc}")
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        if not existing:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if existing:
+                fleet = existing_fleet(options['company'])
+                if fleet is None:
+                    raise CommandError("Aucune entreprise avec un utilisateur actif (lancer seed_scale)")
+                self.stdout.write(f"Entreprise {fleet['company']}: {len(fleet['equipment'])} équipements")
+            else:
+                start = time.perf_counter()
+                fleet = seed_fleet(options['equipment'], options['samples'])
+                self.stdout.write(
+                    f"Jeu de données: {options['equipment']} équipements x {options['samples']} mesures "
+                    f"({time.perf_counter() - start:.1f}s)"
+                )
+
+            results = {}
+            for name in scenarios:
+                results[name] = SCENARIOS[name](fleet, options['repeat'])
+                self.stdout.write(f"{name}: {json.dumps(results[name])}")
+        finally:
+            if not existing:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['save_baseline']:
+            report = {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'existing': existing,
+                'repeat': options['repeat'],
+                'results': results,
+            }
+            if not existing:
+                report.update(equipment=options['equipment'], samples=options['samples'])
+            with open(options['save_baseline'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Référence enregistrée dans {options['save_baseline']}")
+
+        if baseline is not None:
+            regressions = compare(
+                baseline.get('results', {}), results, options['tolerance'], options['min_delta_ms']
+            )
+            if regressions:
+                raise CommandError('Régressions par rapport à la référence:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Aucune régression par rapport à la référence'))
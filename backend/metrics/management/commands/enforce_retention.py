@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from metrics.retention import purge, retention_targets, rollup_safe_cutoff
+from metrics.rollups import FOLLOWING
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime par lots les mesures, cumuls et traces de suppression au-delà de leur rétention "
+        "(METRICS_RETENTION_DAYS, SYNC_TOMBSTONE_RETENTION_DAYS)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Lignes supprimées par transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Pause en secondes entre deux lots')
+        parser.add_argument('--interval', type=float, default=0, help='Relance toutes les N secondes (0 = une seule passe)')
+        parser.add_argument(
+            '--ignore-rollups', action='store_true',
+            help='Purger aussi les mesures et cumuls pas encore intégrés à la résolution suivante'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.enforce(options)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def enforce(self, options):
+        for resolution, model, field, cutoff in retention_targets():
+            if resolution in FOLLOWING and not options['ignore_rollups']:
+                safe = rollup_safe_cutoff(resolution, cutoff)
+                if safe < cutoff:
+                    self.stdout.write(self.style.WARNING(
+                        f'{resolution}: intervalles pas encore cumulés depuis le {safe:%Y-%m-%d %H:%M}, '
+                        'lancer rollup_metrics ou utiliser --ignore-rollups'
+                    ))
+                    cutoff = safe
+
+            def progress(total, rate, resolution=resolution):
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{resolution}: {total} lignes supprimées ({rate:.0f} lignes/s)')
+
+            start = time.perf_counter()
+            total = purge(
+                model, field, cutoff,
+                chunk_size=options['chunk_size'],
+                pause=options['pause'], progress=progress,
+            )
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{resolution}: {total} lignes antérieures au {cutoff:%Y-%m-%d %H:%M} supprimées '
+                f'en {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} lignes/s)'
+            )
@@ -0,0 +1,56 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from metrics.ingest import MetricIngestor, iter_csv, iter_ndjson, open_body
+from users.models import Company
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe un historique de mesures (NDJSON ou CSV, .gz accepté) par petites "
+        "transactions, sans bloquer l'ingestion temps réel"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier à importer ('-' pour l'entrée standard)")
+        parser.add_argument('--company', type=int, required=True, help="ID de l'entreprise propriétaire des équipements")
+        parser.add_argument('--format', choices=['ndjson', 'csv'], help='Format du fichier (déduit de l\'extension par défaut)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Lignes par transaction')
+        parser.add_argument('--pause', type=float, default=0.05, help='Pause en secondes entre deux transactions')
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f"Entreprise {options['company']} introuvable")
+
+        path = options['path']
+        name = path[:-3] if path.endswith('.gz') else path
+        file_format = options['format'] or ('csv' if name.endswith('.csv') else 'ndjson')
+        iter_rows = iter_csv if file_format == 'csv' else iter_ndjson
+
+        ingestor = MetricIngestor(
+            company,
+            chunk_size=options['chunk_size'],
+            batch_size=options['chunk_size'],
+            backfill=True,
+            pause=options['pause'],
+        )
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        start = time.perf_counter()
+        try:
+            body = open_body(stream, 'gzip' if path.endswith('.gz') else None)
+            result = ingestor.ingest(iter_rows(body))
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        elapsed = time.perf_counter() - start
+
+        for error in result['errors']:
+            self.stderr.write(f"ligne {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['accepted']} mesures importées, {result['rejected']} rejetées "
+            f"en {elapsed:.1f}s ({result['accepted'] / max(elapsed, 1e-9):.0f} lignes/s)"
+        ))
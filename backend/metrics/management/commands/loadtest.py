@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from metrics.loadtest import HttpError, LoadTest
+
+
+class Command(BaseCommand):
+    help = (
+        "Charge une API en cours d'exécution avec des collecteurs (ingestion NDJSON) et des tableaux "
+        "de bord (instantané, statistiques, listes) simultanés; rapporte débit, latences et erreurs par endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Adresse du serveur')
+        parser.add_argument('--user', dest='users', action='append', metavar='UTILISATEUR',
+                            help="Compte utilisé (répétable: clients répartis entre les entreprises); scale-1 par défaut")
+        parser.add_argument('--password', default='scale')
+        parser.add_argument('--collectors', type=int, default=10, help='Collecteurs simulés')
+        parser.add_argument('--dashboards', type=int, default=50, help='Tableaux de bord simulés')
+        parser.add_argument('--duration', type=float, default=60, help='Durée de la charge en secondes')
+        parser.add_argument('--batch-size', type=int, default=100, help='Mesures par envoi de collecteur')
+        parser.add_argument('--collector-interval', type=float, default=10, help='Secondes entre deux envois')
+        parser.add_argument('--poll-interval', type=float, default=5,
+                            help='Pause en secondes entre deux rafraîchissements de tableau de bord')
+        parser.add_argument('--timeout', type=float, default=30, help='Délai maximal par requête')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--json', metavar='FICHIER', help='Enregistre le rapport JSON')
+        parser.add_argument('--max-error-rate', type=float,
+                            help="Échoue si le taux d'erreur global dépasse ce seuil (0.01 = 1%%)")
+
+    def handle(self, *args, **options):
+        if options['collectors'] < 0 or options['dashboards'] < 0 or not (options['collectors'] or options['dashboards']):
+            raise CommandError('Il faut au moins un collecteur ou un tableau de bord')
+        if options['duration'] <= 0 or options['batch_size'] < 1:
+            raise CommandError('Durée et taille de paquet doivent être positives')
+        try:
+            loadtest = LoadTest(
+                options['url'], options['users'] or ['scale-1'], options['password'],
+                collectors=options['collectors'], dashboards=options['dashboards'],
+                duration=options['duration'], batch_size=options['batch_size'],
+                collector_interval=options['collector_interval'], poll_interval=options['poll_interval'],
+                timeout=options['timeout'], seed=options['seed'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            f"{options['collectors']} collecteurs, {options['dashboards']} tableaux de bord "
+            f"pendant {options['duration']:g}s sur {options['url']}"
+        )
+        try:
+            report = asyncio.run(loadtest.run())
+        except (OSError, HttpError, asyncio.TimeoutError) as exc:
+            raise CommandError(f'Préparation impossible: {exc}')
+
+        self.write_report(report)
+        if options['json']:
+            with open(options['json'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Rapport enregistré dans {options['json']}")
+
+        error_rate = report['total']['error_rate']
+        if options['max_error_rate'] is not None and error_rate > options['max_error_rate']:
+            raise CommandError(f"Taux d'erreur {error_rate:.2%} au-delà de {options['max_error_rate']:.2%}")
+
+    def write_report(self, report):
+        self.stdout.write(f"Durée mesurée: {report['duration_s']}s; équipements par compte: {report['users']}")
+        header = f"{'endpoint':<36} {'req':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'erreurs':>8}"
+        self.stdout.write(header)
+        rows = list(report['endpoints'].items()) + [('total', report['total'])]
+        for label, stats in rows:
+            latencies = [
+                '-' if stats[key] is None else f'{stats[key]:.1f}'
+                for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+            ]
+            line = (
+                f"{label:<36} {stats['requests']:>7} {stats['rps']:>8.2f} "
+                + ' '.join(f'{value:>8}' for value in latencies)
+                + f" {stats['error_rate']:>8.2%}"
+            )
+            style = self.style.ERROR if stats['errors'] else (lambda text: text)
+            self.stdout.write(style(line))
+            if 'rows_per_s' in stats:
+                self.stdout.write(f"{'':<36} {stats['rows_per_s']} mesures acceptées/s")
+            if 'error_kinds' in stats:
+                self.stdout.write(f"{'':<36} {stats['error_kinds']}")
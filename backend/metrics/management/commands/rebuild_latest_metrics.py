@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from equipment.models import Equipment
+from metrics.models import NetworkMetric, LatestMetric
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'instantané LatestMetric à partir de l'historique NetworkMetric"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Équipements traités par transaction")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        latest_id = Subquery(
+            NetworkMetric.objects.filter(equipment=OuterRef('pk'))
+            .order_by('-timestamp', '-id')
+            .values('id')[:1]
+        )
+
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            # Pagination par clé primaire: chaque lot est une requête indexée sur (equipment, timestamp)
+            ids = list(
+                Equipment.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .annotate(latest_id=latest_id)
+                .values_list('pk', 'latest_id')[:batch_size]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1][0]
+
+            metrics = NetworkMetric.objects.filter(
+                id__in=[metric_id for _, metric_id in ids if metric_id is not None]
+            )
+            with transaction.atomic():
+                snapshots = LatestMetric.objects.upsert(
+                    [LatestMetric.from_metric(metric) for metric in metrics]
+                )
+            rebuilt += len(snapshots)
+
+        removed, _ = LatestMetric.objects.filter(
+            ~Exists(NetworkMetric.objects.filter(equipment=OuterRef('equipment')))
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{rebuilt} instantanés reconstruits, {removed} supprimés'
+        ))
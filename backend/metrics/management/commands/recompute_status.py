@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from equipment.models import Equipment
+from metrics.status import update_site_statuses, update_statuses
+from sites.models import Site
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le statut de tous les équipements (dernière mesure, alertes ouvertes) "
+        "puis celui des sites, par lots"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Limiter à une entreprise")
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Équipements par lot')
+        parser.add_argument(
+            '--stale-after', type=int, default=10,
+            help="Minutes sans mesure au-delà desquelles un équipement est hors ligne (0 pour ignorer)"
+        )
+
+    def handle(self, *args, **options):
+        equipment = Equipment.objects.order_by('id')
+        sites = Site.objects.order_by('id')
+        if options['company']:
+            equipment = equipment.filter(company=options['company'])
+            sites = sites.filter(company=options['company'])
+        stale_before = (
+            timezone.now() - timedelta(minutes=options['stale_after']) if options['stale_after'] else None
+        )
+
+        changed, sites_changed, last_id = 0, 0, 0
+        while True:
+            ids = list(equipment.filter(id__gt=last_id).values_list('id', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            equipment_changed, site_changed = update_statuses(ids, stale_before=stale_before)
+            changed += equipment_changed
+            sites_changed += site_changed
+            last_id = ids[-1]
+
+        # Tous les sites, y compris ceux dont aucun équipement n'a changé
+        site_ids = list(sites.values_list('id', flat=True))
+        sites_changed += sum(
+            update_site_statuses(site_ids[start:start + options['chunk_size']])
+            for start in range(0, len(site_ids), options['chunk_size'])
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{changed} équipements et {sites_changed} sites mis à jour"
+        ))
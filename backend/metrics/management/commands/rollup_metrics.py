@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from metrics.rollups import RESOLUTIONS, rollup
+
+
+class Command(BaseCommand):
+    help = "Recalcule les intervalles 1m/1h/1d modifiés depuis la dernière passe (incrémental)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resolution', action='append', choices=list(RESOLUTIONS), help='Résolution(s) à traiter (toutes par défaut)')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Intervalles recalculés par transaction')
+        parser.add_argument('--interval', type=float, default=0, help='Relance toutes les N secondes (0 = une seule passe)')
+
+    def handle(self, *args, **options):
+        resolutions = options['resolution'] or list(RESOLUTIONS)
+        while True:
+            for resolution in resolutions:
+                total = 0
+                start = time.perf_counter()
+                while True:
+                    processed = rollup(resolution, batch_size=options['batch_size'])
+                    total += processed
+                    if processed == 0:
+                        break
+                if total or options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'{resolution}: {total} intervalles recalculés en {time.perf_counter() - start:.2f}s'
+                    )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,57 @@
+import asyncio
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from metrics.prober import DEFAULT_PORTS, Prober
+
+
+class Command(BaseCommand):
+    help = (
+        "Sonde en continu les équipements (connexion TCP ou ICMP) à l'intervalle de leur site "
+        "et enregistre les mesures par lots"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=['tcp', 'icmp'], default='tcp', help='Méthode de sonde')
+        parser.add_argument('--ports', default=','.join(map(str, DEFAULT_PORTS)), help='Ports TCP essayés, séparés par des virgules')
+        parser.add_argument('--attempts', type=int, default=3, help='Tentatives par sonde (mesure de la perte de paquets)')
+        parser.add_argument('--timeout', type=float, default=1.0, help='Délai maximal par tentative, en secondes')
+        parser.add_argument('--concurrency', type=int, default=500, help='Sondes simultanées au maximum')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Mesures par écriture en base')
+        parser.add_argument('--flush-interval', type=float, default=5.0, help='Secondes maximum avant écriture du tampon')
+        parser.add_argument('--refresh', type=int, default=300, help='Secondes entre deux relectures de la liste des équipements')
+        parser.add_argument('--company', type=int, help="Ne sonder que les équipements de cette entreprise")
+        parser.add_argument('--once', action='store_true', help='Une seule passe sur tous les équipements puis arrêt')
+
+    def handle(self, *args, **options):
+        try:
+            ports = [int(port) for port in options['ports'].split(',') if port.strip()]
+        except ValueError:
+            raise CommandError('--ports: entiers séparés par des virgules attendus')
+        if options['method'] == 'tcp' and not ports:
+            raise CommandError('--ports: au moins un port requis')
+        if options['method'] == 'icmp' and not shutil.which('ping'):
+            raise CommandError("Commande ping introuvable: utiliser --method tcp")
+        if options['concurrency'] < 1 or options['attempts'] < 1:
+            raise CommandError('--concurrency et --attempts doivent être positifs')
+
+        prober = Prober(
+            method=options['method'],
+            ports=ports,
+            attempts=options['attempts'],
+            timeout=options['timeout'],
+            concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            flush_interval=options['flush_interval'],
+            refresh=options['refresh'],
+            company=options['company'],
+            log=self.stdout.write,
+        )
+        try:
+            asyncio.run(prober.run_once() if options['once'] else prober.run())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"{prober.probed} sondes, {prober.saved} mesures enregistrées"
+        ))
@@ -0,0 +1,231 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from metrics.models import (
+    MetricRollupDay, MetricRollupHour, NetworkMetric, ROLLUP_FIELDS, ThresholdProfile,
+)
+from sites.models import Site
+from users.models import Company
+
+User = get_user_model()
+
+ALERT_TITLES = [
+    ('Ping élevé', 'warning'), ('Perte de paquets', 'warning'), ('CPU critique', 'error'),
+    ('Mémoire saturée', 'error'), ('Disque plein', 'warning'), ('Équipement hors ligne', 'error'),
+]
+EQUIPMENT_NAMES = dict(Equipment.TYPE_CHOICES)
+MEMORY_TOTAL = 8 * 1024 ** 3
+DISK_TOTAL = 512 * 1024 ** 3
+
+
+@contextmanager
+def explicit_timestamps(model, *names):
+    """Désactive auto_now / auto_now_add le temps d'insérer un historique daté"""
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Peuple la base courante d'un parc volumineux (entreprises, sites, équipements, mesures "
+        "brutes récentes, cumuls horaires et journaliers, historique d'alertes) par insertions en masse"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=50)
+        parser.add_argument('--sites', type=int, default=5000, help='Total, répartis entre les entreprises')
+        parser.add_argument('--equipment', type=int, default=100000, help='Total, répartis entre les sites')
+        parser.add_argument('--interval', type=int, default=300, help='Secondes entre deux mesures')
+        parser.add_argument('--raw-hours', type=int, default=24, help='Mesures brutes sur les N dernières heures')
+        parser.add_argument('--hourly-days', type=int, default=7, help='Cumuls horaires sur les N derniers jours')
+        parser.add_argument('--history-days', type=int, default=30,
+                            help="Cumuls journaliers sur les N derniers jours (historique équivalent en mesures brutes)")
+        parser.add_argument('--alerts', type=int, default=5, help="Alertes par équipement, réparties sur l'historique")
+        parser.add_argument('--prefix', default='Scale', help="Préfixe des noms d'entreprises et d'utilisateurs")
+        parser.add_argument('--password', default='scale', help='Mot de passe des utilisateurs créés')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if min(options['companies'], options['sites'], options['equipment']) < 1:
+            raise CommandError('Il faut au moins une entreprise, un site et un équipement')
+        if options['sites'] < options['companies'] or options['equipment'] < options['sites']:
+            raise CommandError('Il faut au moins un site par entreprise et un équipement par site')
+        if options['interval'] < 1:
+            raise CommandError("L'intervalle doit être d'au moins une seconde")
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix.lower()}-').exists():
+            raise CommandError(f"Un parc « {prefix} » existe déjà (utiliser --prefix)")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.interval = options['interval']
+        self.now = timezone.now().astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+        companies = self.step('Entreprises et utilisateurs', self.seed_companies, options['companies'], prefix, options['password'])
+        sites = self.step('Sites', self.seed_sites, companies, options['sites'])
+        equipment = self.step('Équipements', self.seed_equipment, sites, options['equipment'])
+        raw = self.step('Mesures brutes', self.seed_raw, equipment, options['raw_hours'])
+        raw_start = self.now - timedelta(hours=options['raw_hours'])
+        hourly = self.step('Cumuls horaires', self.seed_rollups, MetricRollupHour, equipment,
+                           raw_start - timedelta(days=options['hourly_days']), raw_start, timedelta(hours=1))
+        history_end = raw_start.replace(hour=0)
+        daily = self.step('Cumuls journaliers', self.seed_rollups, MetricRollupDay, equipment,
+                          history_end - timedelta(days=options['history_days']), history_end, timedelta(days=1))
+        alerts = self.step("Historique d'alertes", self.seed_alerts, equipment, options['alerts'], options['history_days'])
+
+        per_day = 86400 // self.interval
+        equivalent = raw + len(equipment) * options['history_days'] * per_day
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(companies)} entreprises, {len(sites)} sites, {len(equipment)} équipements, {raw} mesures brutes, "
+            f"{hourly + daily} cumuls, {alerts} alertes; historique équivalent à {equivalent:,} mesures brutes. "
+            f"Utilisateurs {prefix.lower()}-1 à {prefix.lower()}-{len(companies)}"
+        ))
+
+    def step(self, label, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        count = result if isinstance(result, int) else len(result)
+        self.stdout.write(f'{label}: {count} ({time.perf_counter() - start:.1f}s)')
+        return result
+
+    def bulk(self, model, rows, **kwargs):
+        """Insère ``rows`` (itérable) par lots; renvoie le nombre de lignes"""
+        total, batch = 0, []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch, **kwargs)
+                total += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch, **kwargs)
+            total += len(batch)
+        return total
+
+    def seed_companies(self, count, prefix, password):
+        companies = Company.objects.bulk_create(
+            Company(name=f'{prefix} {i}', address='-') for i in range(1, count + 1)
+        )
+        # Un seul hachage pour tous: PBKDF2 coûte ~100 ms par appel
+        hashed = make_password(password)
+        User.objects.bulk_create(
+            User(username=f'{prefix.lower()}-{i}', password=hashed, company=company)
+            for i, company in enumerate(companies, start=1)
+        )
+        # Seuils par défaut portés par un profil d'entreprise, sans ligne par équipement
+        ThresholdProfile.objects.bulk_create(ThresholdProfile(company=company) for company in companies)
+        return companies
+
+    def seed_sites(self, companies, count):
+        return Site.objects.bulk_create(
+            (
+                Site(name=f'Site {i}', address=f'{i} rue du Réseau', company=companies[i % len(companies)])
+                for i in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def seed_equipment(self, sites, count):
+        types = list(EQUIPMENT_NAMES)
+        return Equipment.objects.bulk_create(
+            (
+                Equipment(
+                    name=f'{EQUIPMENT_NAMES[types[i % len(types)]]} {i}',
+                    type=types[i % len(types)],
+                    site=sites[i % len(sites)],
+                    ip_address=f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+                )
+                for i in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def sample(self):
+        rng = self.rng
+        return {
+            'ping_response_time': rng.uniform(1, 200),
+            'packet_loss': rng.uniform(0, 5),
+            'cpu_usage': rng.uniform(0, 100),
+            'memory_used': rng.randint(1, MEMORY_TOTAL),
+            'disk_used': rng.randint(1, DISK_TOTAL),
+            'is_online': rng.random() > 0.02,
+        }
+
+    def seed_raw(self, equipment, hours):
+        samples = hours * 3600 // self.interval
+
+        def rows():
+            for step in range(samples, 0, -1):
+                timestamp = self.now - timedelta(seconds=step * self.interval)
+                for item in equipment:
+                    yield NetworkMetric(
+                        equipment_id=item.pk, company_id=item.company_id, timestamp=timestamp,
+                        memory_total=MEMORY_TOTAL, disk_total=DISK_TOTAL, **self.sample(),
+                    )
+
+        # Reprise d'historique: instantané et statuts à jour, sans alerte ni diffusion temps réel
+        return self.bulk(NetworkMetric, rows(), backfill=True)
+
+    def rollup(self, model, equipment_id, bucket, samples):
+        """Cumul plausible de ``samples`` mesures, sans les générer"""
+        rng = self.rng
+        values = {'sample_count': samples, 'online_count': max(0, samples - rng.randint(0, max(1, samples // 50)))}
+        for field, (low, high) in zip(ROLLUP_FIELDS, [(1, 200), (0, 5), (0, 100), (0, 100), (0, 100)]):
+            minimum = rng.uniform(low, (low + high) / 2)
+            maximum = rng.uniform(minimum, high)
+            values[f'{field}_min'] = minimum
+            values[f'{field}_max'] = maximum
+            values[f'{field}_sum'] = (minimum + maximum) / 2 * samples
+            values[f'{field}_count'] = samples
+        return model(equipment_id=equipment_id, bucket=bucket, **values)
+
+    def seed_rollups(self, model, equipment, start, end, width):
+        samples = int(width.total_seconds()) // self.interval
+
+        def rows():
+            bucket = start
+            while bucket < end:
+                for item in equipment:
+                    yield self.rollup(model, item.pk, bucket, samples)
+                bucket += width
+
+        return self.bulk(model, rows())
+
+    def seed_alerts(self, equipment, per_equipment, days):
+        rng = self.rng
+        span = days * 86400
+
+        def rows():
+            for item in equipment:
+                for _ in range(per_equipment):
+                    title, kind = rng.choice(ALERT_TITLES)
+                    created_at = self.now - timedelta(seconds=rng.randint(0, span))
+                    roll = rng.random()
+                    status = 'resolved' if roll < 0.9 else 'acknowledged' if roll < 0.95 else 'active'
+                    resolved_at = created_at + timedelta(minutes=rng.randint(1, 600)) if status == 'resolved' else None
+                    yield Alert(
+                        title=title, message=f'{title} sur {item.name}', type=kind, status=status,
+                        equipment_id=item.pk, company_id=item.company_id,
+                        created_at=created_at, updated_at=resolved_at or created_at,
+                        last_seen_at=created_at, resolved_at=resolved_at,
+                    )
+
+        with explicit_timestamps(Alert, 'created_at', 'updated_at'):
+            return self.bulk(Alert, rows())
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+        ('metrics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestMetric',
+            fields=[
+                ('ping_response_time', models.FloatField(blank=True, help_text='Temps de réponse ping en ms', null=True)),
+                ('packet_loss', models.FloatField(blank=True, help_text='Perte de paquets en %', null=True)),
+                ('bandwidth_up', models.BigIntegerField(blank=True, help_text='Bande passante montante en bps', null=True)),
+                ('bandwidth_down', models.BigIntegerField(blank=True, help_text='Bande passante descendante en bps', null=True)),
+                ('cpu_usage', models.FloatField(blank=True, help_text='Utilisation CPU en %', null=True)),
+                ('memory_total', models.BigIntegerField(blank=True, help_text='Mémoire totale en bytes', null=True)),
+                ('memory_used', models.BigIntegerField(blank=True, help_text='Mémoire utilisée en bytes', null=True)),
+                ('disk_total', models.BigIntegerField(blank=True, help_text='Espace disque total en bytes', null=True)),
+                ('disk_used', models.BigIntegerField(blank=True, help_text='Espace disque utilisé en bytes', null=True)),
+                ('is_online', models.BooleanField(default=True)),
+                ('connection_quality', models.CharField(choices=[('excellent', 'Excellent'), ('good', 'Bon'), ('fair', 'Moyen'), ('poor', 'Mauvais'), ('offline', 'Hors ligne')], default='good', max_length=20)),
+                ('equipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_metric', serialize=False, to='equipment.equipment')),
+                ('timestamp', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Dernière métrique',
+                'verbose_name_plural': 'Dernières métriques',
+            },
+        ),
+    ]
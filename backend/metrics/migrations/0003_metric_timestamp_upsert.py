@@ -0,0 +1,46 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:23
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.utils.timezone
+
+
+def remove_duplicate_metrics(apps, schema_editor):
+    """Conserve une seule mesure (la plus récente insérée) par (equipment, timestamp)"""
+    NetworkMetric = apps.get_model('metrics', 'NetworkMetric')
+    duplicates = (
+        NetworkMetric.objects.order_by()
+        .values('equipment_id', 'timestamp')
+        .annotate(count=Count('id'), keep_id=Max('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        NetworkMetric.objects.filter(
+            equipment_id=duplicate['equipment_id'],
+            timestamp=duplicate['timestamp'],
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrics', '0002_latestmetric'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='networkmetric',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(remove_duplicate_metrics, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='networkmetric',
+            constraint=models.UniqueConstraint(fields=('equipment', 'timestamp'), name='unique_metric_equipment_timestamp'),
+        ),
+        # L'index unique (equipment, timestamp) remplace l'index (equipment, -timestamp)
+        migrations.RemoveIndex(
+            model_name='networkmetric',
+            name='metrics_net_equipme_0b35ee_idx',
+        ),
+    ]
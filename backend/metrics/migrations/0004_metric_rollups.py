@@ -0,0 +1,156 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+        ('metrics', '0003_metric_timestamp_upsert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('resolution', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('last_metric_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Filigrane de cumul',
+                'verbose_name_plural': 'Filigranes de cumul',
+            },
+        ),
+        migrations.CreateModel(
+            name='MetricRollupHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text="Début de l'intervalle (UTC)")),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('online_count', models.PositiveIntegerField(default=0)),
+                ('ping_response_time_min', models.FloatField(blank=True, null=True)),
+                ('ping_response_time_max', models.FloatField(blank=True, null=True)),
+                ('ping_response_time_sum', models.FloatField(blank=True, null=True)),
+                ('ping_response_time_count', models.PositiveIntegerField(default=0)),
+                ('packet_loss_min', models.FloatField(blank=True, null=True)),
+                ('packet_loss_max', models.FloatField(blank=True, null=True)),
+                ('packet_loss_sum', models.FloatField(blank=True, null=True)),
+                ('packet_loss_count', models.PositiveIntegerField(default=0)),
+                ('cpu_usage_min', models.FloatField(blank=True, null=True)),
+                ('cpu_usage_max', models.FloatField(blank=True, null=True)),
+                ('cpu_usage_sum', models.FloatField(blank=True, null=True)),
+                ('cpu_usage_count', models.PositiveIntegerField(default=0)),
+                ('memory_usage_min', models.FloatField(blank=True, null=True)),
+                ('memory_usage_max', models.FloatField(blank=True, null=True)),
+                ('memory_usage_sum', models.FloatField(blank=True, null=True)),
+                ('memory_usage_count', models.PositiveIntegerField(default=0)),
+                ('disk_usage_min', models.FloatField(blank=True, null=True)),
+                ('disk_usage_max', models.FloatField(blank=True, null=True)),
+                ('disk_usage_sum', models.FloatField(blank=True, null=True)),
+                ('disk_usage_count', models.PositiveIntegerField(default=0)),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='equipment.equipment')),
+            ],
+            options={
+                'verbose_name': 'Cumul horaire',
+                'verbose_name_plural': 'Cumuls horaires',
+                'ordering': ['bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MetricRollupDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text="Début de l'intervalle (UTC)")),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('online_count', models.PositiveIntegerField(default=0)),
+                ('ping_response_time_min', models.FloatField(blank=True, null=True)),
+                ('ping_response_time_max', models.FloatField(blank=True, null=True)),
+                ('ping_response_time_sum', models.FloatField(blank=True, null=True)),
+                ('ping_response_time_count', models.PositiveIntegerField(default=0)),
+                ('packet_loss_min', models.FloatField(blank=True, null=True)),
+                ('packet_loss_max', models.FloatField(blank=True, null=True)),
+                ('packet_loss_sum', models.FloatField(blank=True, null=True)),
+                ('packet_loss_count', models.PositiveIntegerField(default=0)),
+                ('cpu_usage_min', models.FloatField(blank=True, null=True)),
+                ('cpu_usage_max', models.FloatField(blank=True, null=True)),
+                ('cpu_usage_sum', models.FloatField(blank=True, null=True)),
+                ('cpu_usage_count', models.PositiveIntegerField(default=0)),
+                ('memory_usage_min', models.FloatField(blank=True, null=True)),
+                ('memory_usage_max', models.FloatField(blank=True, null=True)),
+                ('memory_usage_sum', models.FloatField(blank=True, null=True)),
+                ('memory_usage_count', models.PositiveIntegerField(default=0)),
+                ('disk_usage_min', models.FloatField(blank=True, null=True)),
+                ('disk_usage_max', models.FloatField(blank=True, null=True)),
+                ('disk_usage_sum', models.FloatField(blank=True, null=True)),
+                ('disk_usage_count', models.PositiveIntegerField(default=0)),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='equipment.equipment')),
+            ],
+            options={
+                'verbose_name': 'Cumul journalier',
+                'verbose_name_plural': 'Cumuls journaliers',
+                'ordering': ['bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MetricRollupMinute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text="Début de l'intervalle (UTC)")),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('online_count', models.PositiveIntegerField(default=0)),
+                ('ping_response_time_min', models.FloatField(blank=True, null=True)),
+                ('ping_response_time_max', models.FloatField(blank=True, null=True)),
+                ('ping_response_time_sum', models.FloatField(blank=True, null=True)),
+                ('ping_response_time_count', models.PositiveIntegerField(default=0)),
+                ('packet_loss_min', models.FloatField(blank=True, null=True)),
+                ('packet_loss_max', models.FloatField(blank=True, null=True)),
+                ('packet_loss_sum', models.FloatField(blank=True, null=True)),
+                ('packet_loss_count', models.PositiveIntegerField(default=0)),
+                ('cpu_usage_min', models.FloatField(blank=True, null=True)),
+                ('cpu_usage_max', models.FloatField(blank=True, null=True)),
+                ('cpu_usage_sum', models.FloatField(blank=True, null=True)),
+                ('cpu_usage_count', models.PositiveIntegerField(default=0)),
+                ('memory_usage_min', models.FloatField(blank=True, null=True)),
+                ('memory_usage_max', models.FloatField(blank=True, null=True)),
+                ('memory_usage_sum', models.FloatField(blank=True, null=True)),
+                ('memory_usage_count', models.PositiveIntegerField(default=0)),
+                ('disk_usage_min', models.FloatField(blank=True, null=True)),
+                ('disk_usage_max', models.FloatField(blank=True, null=True)),
+                ('disk_usage_sum', models.FloatField(blank=True, null=True)),
+                ('disk_usage_count', models.PositiveIntegerField(default=0)),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='equipment.equipment')),
+            ],
+            options={
+                'verbose_name': 'Cumul minute',
+                'verbose_name_plural': 'Cumuls minute',
+                'ordering': ['bucket'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['bucket'], name='metricrollupminute_bucket_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='metricrollupminute',
+            constraint=models.UniqueConstraint(fields=('equipment', 'bucket'), name='unique_metricrollupminute_equipment_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='metricrolluphour',
+            index=models.Index(fields=['bucket'], name='metricrolluphour_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='metricrolluphour',
+            constraint=models.UniqueConstraint(fields=('equipment', 'bucket'), name='unique_metricrolluphour_equipment_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='metricrollupday',
+            index=models.Index(fields=['bucket'], name='metricrollupday_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='metricrollupday',
+            constraint=models.UniqueConstraint(fields=('equipment', 'bucket'), name='unique_metricrollupday_equipment_bucket'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrics', '0004_metric_rollups'),
+    ]
+
+    operations = [
+        # Nouvel index créé avant la suppression des anciens: la période reste indexée
+        migrations.AddIndex(
+            model_name='networkmetric',
+            index=models.Index(fields=['timestamp', 'id'], name='metric_timestamp_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='networkmetric',
+            name='metrics_net_timesta_f58d52_idx',
+        ),
+        migrations.AlterField(
+            model_name='networkmetric',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:16
+
+from django.db import migrations, models
+from django.db.models import Max, Min, OuterRef, Subquery
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+
+def backfill_company(apps, schema_editor):
+    """Recopie equipment.company par tranches d'id: une transaction courte par tranche"""
+    NetworkMetric = apps.get_model('metrics', 'NetworkMetric')
+    Equipment = apps.get_model('equipment', 'Equipment')
+    company = Subquery(Equipment.objects.filter(pk=OuterRef('equipment_id')).values('company_id')[:1])
+    bounds = NetworkMetric.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        NetworkMetric.objects.filter(
+            id__gte=start, id__lt=start + BATCH_SIZE, company__isnull=True
+        ).update(company_id=company)
+
+
+class Migration(migrations.Migration):
+    # Tranches validées au fil de l'eau plutôt qu'une transaction sur toute la table
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('equipment', '0004_equipment_company'),
+        ('metrics', '0005_metric_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkmetric',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.company'),
+        ),
+        migrations.RunPython(backfill_company, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='networkmetric',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.company'),
+        ),
+        migrations.AddIndex(
+            model_name='networkmetric',
+            index=models.Index(fields=['company', 'timestamp', 'id'], name='metric_company_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 4.2.10 on 2026-10-18 11:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Anciennes valeurs par défaut des champs de AlertThreshold
+LEGACY_DEFAULTS = {
+    'ping_warning_threshold': 100.0,
+    'ping_critical_threshold': 500.0,
+    'packet_loss_warning': 5.0,
+    'packet_loss_critical': 20.0,
+    'cpu_warning_threshold': 80.0,
+    'cpu_critical_threshold': 95.0,
+    'memory_warning_threshold': 80.0,
+    'memory_critical_threshold': 95.0,
+    'disk_warning_threshold': 80.0,
+    'disk_critical_threshold': 95.0,
+}
+
+
+def inherit_default_thresholds(apps, schema_editor):
+    """
+    Les valeurs par défaut des surcharges existantes deviennent héritées d'un profil
+    d'entreprise (créé vide si besoin, ce qui garde ces équipements surveillés);
+    les surcharges qui ne fixent plus rien sont supprimées.
+    """
+    AlertThreshold = apps.get_model('metrics', 'AlertThreshold')
+    ThresholdProfile = apps.get_model('metrics', 'ThresholdProfile')
+    for field, value in LEGACY_DEFAULTS.items():
+        AlertThreshold.objects.filter(**{field: value}).update(**{field: None})
+
+    companies = set(AlertThreshold.objects.values_list('equipment__company_id', flat=True).distinct())
+    covered = set(ThresholdProfile.objects.filter(site__isnull=True, equipment_type='').values_list('company_id', flat=True))
+    ThresholdProfile.objects.bulk_create([ThresholdProfile(company_id=company_id) for company_id in companies - covered])
+    AlertThreshold.objects.filter(**dict.fromkeys(LEGACY_DEFAULTS, None)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('sites', '0003_alter_site_updated_at'),
+        ('equipment', '0004_equipment_company'),
+        ('metrics', '0006_metric_company'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='cpu_critical_threshold',
+            field=models.FloatField(blank=True, help_text='Seuil critique CPU en %', null=True),
+        ),
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='cpu_warning_threshold',
+            field=models.FloatField(blank=True, help_text="Seuil d'avertissement CPU en %", null=True),
+        ),
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='disk_critical_threshold',
+            field=models.FloatField(blank=True, help_text='Seuil critique disque en %', null=True),
+        ),
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='disk_warning_threshold',
+            field=models.FloatField(blank=True, help_text="Seuil d'avertissement disque en %", null=True),
+        ),
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='memory_critical_threshold',
+            field=models.FloatField(blank=True, help_text='Seuil critique mémoire en %', null=True),
+        ),
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='memory_warning_threshold',
+            field=models.FloatField(blank=True, help_text="Seuil d'avertissement mémoire en %", null=True),
+        ),
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='packet_loss_critical',
+            field=models.FloatField(blank=True, help_text='Seuil critique perte paquets en %', null=True),
+        ),
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='packet_loss_warning',
+            field=models.FloatField(blank=True, help_text="Seuil d'avertissement perte paquets en %", null=True),
+        ),
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='ping_critical_threshold',
+            field=models.FloatField(blank=True, help_text='Seuil critique ping en ms', null=True),
+        ),
+        migrations.AlterField(
+            model_name='alertthreshold',
+            name='ping_warning_threshold',
+            field=models.FloatField(blank=True, help_text="Seuil d'avertissement ping en ms", null=True),
+        ),
+        migrations.CreateModel(
+            name='ThresholdProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ping_warning_threshold', models.FloatField(blank=True, help_text="Seuil d'avertissement ping en ms", null=True)),
+                ('ping_critical_threshold', models.FloatField(blank=True, help_text='Seuil critique ping en ms', null=True)),
+                ('packet_loss_warning', models.FloatField(blank=True, help_text="Seuil d'avertissement perte paquets en %", null=True)),
+                ('packet_loss_critical', models.FloatField(blank=True, help_text='Seuil critique perte paquets en %', null=True)),
+                ('cpu_warning_threshold', models.FloatField(blank=True, help_text="Seuil d'avertissement CPU en %", null=True)),
+                ('cpu_critical_threshold', models.FloatField(blank=True, help_text='Seuil critique CPU en %', null=True)),
+                ('memory_warning_threshold', models.FloatField(blank=True, help_text="Seuil d'avertissement mémoire en %", null=True)),
+                ('memory_critical_threshold', models.FloatField(blank=True, help_text='Seuil critique mémoire en %', null=True)),
+                ('disk_warning_threshold', models.FloatField(blank=True, help_text="Seuil d'avertissement disque en %", null=True)),
+                ('disk_critical_threshold', models.FloatField(blank=True, help_text='Seuil critique disque en %', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('equipment_type', models.CharField(blank=True, choices=[('camera', 'Caméra'), ('video-recorder', 'Enregistreur vidéo'), ('switch', 'Switch'), ('server', 'Serveur'), ('access_point', "Point d'accès WiFi"), ('router', 'Routeur'), ('pc', 'PC'), ('other', 'Autre')], default='', max_length=20)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='threshold_profiles', to='users.company')),
+                ('site', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='threshold_profiles', to='sites.site')),
+            ],
+            options={
+                'verbose_name': 'Profil de seuils',
+                'verbose_name_plural': 'Profils de seuils',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='thresholdprofile',
+            constraint=models.CheckConstraint(check=models.Q(('site__isnull', True), ('equipment_type', ''), _connector='OR'), name='threshold_profile_single_scope'),
+        ),
+        migrations.AddConstraint(
+            model_name='thresholdprofile',
+            constraint=models.UniqueConstraint(condition=models.Q(('equipment_type', ''), ('site__isnull', True)), fields=('company',), name='threshold_profile_company_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='thresholdprofile',
+            constraint=models.UniqueConstraint(condition=models.Q(('site__isnull', False)), fields=('site',), name='threshold_profile_site_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='thresholdprofile',
+            constraint=models.UniqueConstraint(condition=models.Q(('equipment_type', ''), _negated=True), fields=('company', 'equipment_type'), name='threshold_profile_type_uniq'),
+        ),
+        migrations.RunPython(inherit_default_thresholds, migrations.RunPython.noop),
+    ]
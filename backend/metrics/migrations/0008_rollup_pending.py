@@ -0,0 +1,62 @@
+# Generated by Django 4.2.10 on 2026-10-18 00:31
+
+from datetime import timezone as dt_timezone
+
+from django.db import migrations, models
+from django.db.models.functions import Trunc
+import django.db.models.deletion
+
+
+def mark_unrolled_metrics(apps, schema_editor):
+    """Met en attente les intervalles des mesures au-delà des anciens filigranes"""
+    NetworkMetric = apps.get_model('metrics', 'NetworkMetric')
+    RollupWatermark = apps.get_model('metrics', 'RollupWatermark')
+    RollupPending = apps.get_model('metrics', 'RollupPending')
+    watermarks = dict(RollupWatermark.objects.values_list('resolution', 'last_metric_id'))
+    for resolution, kind in (('1m', 'minute'), ('1h', 'hour'), ('1d', 'day')):
+        keys = (
+            NetworkMetric.objects.filter(id__gt=watermarks.get(resolution, 0))
+            .order_by()
+            .annotate(period=Trunc('timestamp', kind, tzinfo=dt_timezone.utc))
+            .values_list('equipment_id', 'period')
+            .distinct()
+        )
+        batch = []
+        for equipment_id, bucket in keys.iterator(chunk_size=10000):
+            batch.append(RollupPending(resolution=resolution, equipment_id=equipment_id, bucket=bucket))
+            if len(batch) >= 10000:
+                RollupPending.objects.bulk_create(batch)
+                batch = []
+        RollupPending.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0004_equipment_company'),
+        ('metrics', '0007_threshold_profiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupPending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(max_length=10)),
+                ('bucket', models.DateTimeField(help_text="Début de l'intervalle (UTC)")),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='equipment.equipment')),
+            ],
+            options={
+                'verbose_name': 'Cumul en attente',
+                'verbose_name_plural': 'Cumuls en attente',
+            },
+        ),
+        migrations.RunPython(mark_unrolled_metrics, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='RollupWatermark',
+        ),
+        migrations.AddIndex(
+            model_name='rolluppending',
+            index=models.Index(fields=['resolution', 'bucket'], name='rollup_pending_bucket_idx'),
+        ),
+    ]
@@ -1,11 +1,23 @@
-from django.db import models
-from equipment.models import Equipment
+from datetime import timedelta
 
-class NetworkMetric(models.Model):
-    """Métriques réseau time-series pour les équipements"""
-    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name="metrics")
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
-    
+from django.db import models, transaction
+from django.utils import timezone
+from equipment.models import Equipment, fill_company
+from sites.models import Site
+from users.models import Company
+
+# Champs de mesure partagés par NetworkMetric et LatestMetric
+MEASUREMENT_FIELDS = [
+    'ping_response_time', 'packet_loss', 'bandwidth_up', 'bandwidth_down',
+    'cpu_usage', 'memory_total', 'memory_used', 'disk_total', 'disk_used',
+    'is_online', 'connection_quality',
+]
+
+# Avance d'horloge tolérée pour les horodatages fournis par les sondes
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+class MetricValues(models.Model):
+    """Valeurs mesurées sur un équipement à un instant donné"""
     # Métriques réseau
     ping_response_time = models.FloatField(null=True, blank=True, help_text="Temps de réponse ping en ms")
     packet_loss = models.FloatField(null=True, blank=True, help_text="Perte de paquets en %")
@@ -34,17 +46,7 @@ class NetworkMetric(models.Model):
     )
     
     class Meta:
-        verbose_name = "Métrique réseau"
-        verbose_name_plural = "Métriques réseau"
-        ordering = ['-timestamp']
-        indexes = [
-            models.Index(fields=['equipment', '-timestamp']),
-            models.Index(fields=['timestamp']),
-            models.Index(fields=['is_online']),
-        ]
-    
-    def __str__(self):
-        return f"{self.equipment.name} - {self.timestamp}"
+        abstract = True
 
     @property
     def memory_usage_percent(self):
@@ -60,27 +62,308 @@ class NetworkMetric(models.Model):
             return (self.disk_used / self.disk_total) * 100
         return None
 
-class AlertThreshold(models.Model):
-    """Seuils d'alerte pour les métriques"""
-    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name="thresholds")
+class NetworkMetricQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, backfill=False, **kwargs):
+        """Insertion en masse suivie de la notification metrics_ingested, dans la même transaction"""
+        from .signals import metrics_ingested
+
+        objs = list(objs)
+        fill_company(objs)
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if objs:
+                metrics_ingested.send(sender=self.model, metrics=objs, backfill=backfill)
+        return objs
+
+    def upsert(self, objs, batch_size=None, backfill=False):
+        """
+        Insertion idempotente sur (equipment, timestamp) via ON CONFLICT DO UPDATE.
+
+        Une même clé ne peut apparaître qu'une fois par instruction: la dernière
+        occurrence du lot l'emporte. Les objets renvoyés (et transmis à
+        metrics_ingested) n'ont pas d'identifiant: Django 4.2 ne le lit pas en retour
+        d'un ON CONFLICT DO UPDATE.
+        """
+        unique = {}
+        for obj in objs:
+            unique[(obj.equipment_id, obj.timestamp)] = obj
+        return self.bulk_create(
+            list(unique.values()),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['equipment', 'timestamp'],
+            update_fields=MEASUREMENT_FIELDS,
+            backfill=backfill,
+        )
+
+class NetworkMetric(MetricValues):
+    """Métriques réseau time-series pour les équipements"""
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name="metrics")
+    # Dénormalisé depuis equipment.company, renseigné par bulk_create
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="+", db_index=False, editable=False)
+    timestamp = models.DateTimeField(default=timezone.now)
+    
+    objects = NetworkMetricQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = "Métrique réseau"
+        verbose_name_plural = "Métriques réseau"
+        ordering = ['-timestamp']
+        constraints = [
+            # Une mesure par équipement et par instant: clé des upserts d'ingestion.
+            # L'index unique sert aussi les lectures par (equipment, timestamp).
+            models.UniqueConstraint(fields=['equipment', 'timestamp'], name='unique_metric_equipment_timestamp'),
+        ]
+        indexes = [
+            # Pagination keyset (timestamp, id); sert aussi les filtres par période et la rétention
+            models.Index(fields=['timestamp', 'id'], name='metric_timestamp_id_idx'),
+            # Liste, pagination keyset et périodes d'une entreprise
+            models.Index(fields=['company', 'timestamp', 'id'], name='metric_company_timestamp_idx'),
+            models.Index(fields=['is_online']),
+        ]
+    
+    def __str__(self):
+        return f"{self.equipment.name} - {self.timestamp}"
+    
+    def save(self, *args, **kwargs):
+        if self.company_id is None:
+            fill_company([self])
+        # post_save (metrics_ingested) dans la même transaction que l'écriture
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+class LatestMetricManager(models.Manager):
+    def record(self, metrics):
+        """Met à jour l'instantané avec la mesure la plus récente de chaque équipement"""
+        newest = {}
+        for metric in metrics:
+            current = newest.get(metric.equipment_id)
+            if current is None or metric.timestamp >= current.timestamp:
+                newest[metric.equipment_id] = metric
+        if not newest:
+            return 0
+
+        with transaction.atomic(using=self.db):
+            # Verrouiller les lignes existantes pour ne jamais écraser une mesure plus récente
+            known = dict(
+                self.select_for_update()
+                .filter(equipment_id__in=newest)
+                .values_list('equipment_id', 'timestamp')
+            )
+            snapshots = [
+                self.model.from_metric(metric)
+                for equipment_id, metric in newest.items()
+                if equipment_id not in known or known[equipment_id] <= metric.timestamp
+            ]
+            self.upsert(snapshots)
+        return len(snapshots)
+
+    def upsert(self, snapshots):
+        return self.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['equipment'],
+            update_fields=['timestamp', *MEASUREMENT_FIELDS],
+        )
+
+class LatestMetric(MetricValues):
+    """Dernière mesure connue de chaque équipement (dénormalisée depuis NetworkMetric)"""
+    equipment = models.OneToOneField(
+        Equipment, on_delete=models.CASCADE, primary_key=True, related_name="latest_metric"
+    )
+    timestamp = models.DateTimeField()
+    
+    objects = LatestMetricManager()
+    
+    class Meta:
+        verbose_name = "Dernière métrique"
+        verbose_name_plural = "Dernières métriques"
     
+    def __str__(self):
+        return f"{self.equipment.name} - {self.timestamp}"
+
+    @classmethod
+    def from_metric(cls, metric):
+        return cls(
+            equipment_id=metric.equipment_id,
+            timestamp=metric.timestamp,
+            **{field: getattr(metric, field) for field in MEASUREMENT_FIELDS}
+        )
+
+# Grandeurs agrégées dans les tables de cumul (memory/disk en pourcentage d'utilisation)
+ROLLUP_FIELDS = ['ping_response_time', 'packet_loss', 'cpu_usage', 'memory_usage', 'disk_usage']
+
+class MetricRollup(models.Model):
+    """Cumul min/max/somme/nombre des mesures d'un équipement sur un intervalle de temps"""
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name="+")
+    bucket = models.DateTimeField(help_text="Début de l'intervalle (UTC)")
+    sample_count = models.PositiveIntegerField(default=0)
+    online_count = models.PositiveIntegerField(default=0)
+    
+    ping_response_time_min = models.FloatField(null=True, blank=True)
+    ping_response_time_max = models.FloatField(null=True, blank=True)
+    ping_response_time_sum = models.FloatField(null=True, blank=True)
+    ping_response_time_count = models.PositiveIntegerField(default=0)
+    packet_loss_min = models.FloatField(null=True, blank=True)
+    packet_loss_max = models.FloatField(null=True, blank=True)
+    packet_loss_sum = models.FloatField(null=True, blank=True)
+    packet_loss_count = models.PositiveIntegerField(default=0)
+    cpu_usage_min = models.FloatField(null=True, blank=True)
+    cpu_usage_max = models.FloatField(null=True, blank=True)
+    cpu_usage_sum = models.FloatField(null=True, blank=True)
+    cpu_usage_count = models.PositiveIntegerField(default=0)
+    memory_usage_min = models.FloatField(null=True, blank=True)
+    memory_usage_max = models.FloatField(null=True, blank=True)
+    memory_usage_sum = models.FloatField(null=True, blank=True)
+    memory_usage_count = models.PositiveIntegerField(default=0)
+    disk_usage_min = models.FloatField(null=True, blank=True)
+    disk_usage_max = models.FloatField(null=True, blank=True)
+    disk_usage_sum = models.FloatField(null=True, blank=True)
+    disk_usage_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+        ordering = ['bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['equipment', 'bucket'], name='unique_%(class)s_equipment_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='%(class)s_bucket_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.equipment_id} - {self.bucket}"
+
+    def average(self, field):
+        count = getattr(self, f'{field}_count')
+        return getattr(self, f'{field}_sum') / count if count else None
+
+    @property
+    def uptime_percentage(self):
+        return self.online_count * 100 / self.sample_count if self.sample_count else None
+
+class MetricRollupMinute(MetricRollup):
+    class Meta(MetricRollup.Meta):
+        verbose_name = "Cumul minute"
+        verbose_name_plural = "Cumuls minute"
+
+class MetricRollupHour(MetricRollup):
+    class Meta(MetricRollup.Meta):
+        verbose_name = "Cumul horaire"
+        verbose_name_plural = "Cumuls horaires"
+
+class MetricRollupDay(MetricRollup):
+    class Meta(MetricRollup.Meta):
+        verbose_name = "Cumul journalier"
+        verbose_name_plural = "Cumuls journaliers"
+
+class RollupPending(models.Model):
+    """
+    Intervalle d'un équipement à recalculer dans les cumuls d'une résolution.
+
+    Écrit dans la transaction de la mesure (ou du cumul plus fin) qui le modifie:
+    une transaction validée tardivement ou un upsert qui corrige une mesure
+    existante laisse toujours un intervalle en attente.
+    """
+    resolution = models.CharField(max_length=10)
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name="+")
+    bucket = models.DateTimeField(help_text="Début de l'intervalle (UTC)")
+    
+    class Meta:
+        verbose_name = "Cumul en attente"
+        verbose_name_plural = "Cumuls en attente"
+        indexes = [
+            # Intervalles les plus anciens d'abord; borne des purges de rétention
+            models.Index(fields=['resolution', 'bucket'], name='rollup_pending_bucket_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.resolution} - {self.equipment_id} - {self.bucket}"
+
+# Seuils appliqués quand aucun niveau de la hiérarchie ne fixe la valeur
+THRESHOLD_DEFAULTS = {
+    'ping_warning_threshold': 100.0,
+    'ping_critical_threshold': 500.0,
+    'packet_loss_warning': 5.0,
+    'packet_loss_critical': 20.0,
+    'cpu_warning_threshold': 80.0,
+    'cpu_critical_threshold': 95.0,
+    'memory_warning_threshold': 80.0,
+    'memory_critical_threshold': 95.0,
+    'disk_warning_threshold': 80.0,
+    'disk_critical_threshold': 95.0,
+}
+
+
+class ThresholdValues(models.Model):
+    """Seuils d'alerte; une valeur nulle est héritée du niveau supérieur"""
     # Seuils réseau
-    ping_warning_threshold = models.FloatField(default=100.0, help_text="Seuil d'avertissement ping en ms")
-    ping_critical_threshold = models.FloatField(default=500.0, help_text="Seuil critique ping en ms")
-    packet_loss_warning = models.FloatField(default=5.0, help_text="Seuil d'avertissement perte paquets en %")
-    packet_loss_critical = models.FloatField(default=20.0, help_text="Seuil critique perte paquets en %")
+    ping_warning_threshold = models.FloatField(null=True, blank=True, help_text="Seuil d'avertissement ping en ms")
+    ping_critical_threshold = models.FloatField(null=True, blank=True, help_text="Seuil critique ping en ms")
+    packet_loss_warning = models.FloatField(null=True, blank=True, help_text="Seuil d'avertissement perte paquets en %")
+    packet_loss_critical = models.FloatField(null=True, blank=True, help_text="Seuil critique perte paquets en %")
     
     # Seuils système
-    cpu_warning_threshold = models.FloatField(default=80.0, help_text="Seuil d'avertissement CPU en %")
-    cpu_critical_threshold = models.FloatField(default=95.0, help_text="Seuil critique CPU en %")
-    memory_warning_threshold = models.FloatField(default=80.0, help_text="Seuil d'avertissement mémoire en %")
-    memory_critical_threshold = models.FloatField(default=95.0, help_text="Seuil critique mémoire en %")
-    disk_warning_threshold = models.FloatField(default=80.0, help_text="Seuil d'avertissement disque en %")
-    disk_critical_threshold = models.FloatField(default=95.0, help_text="Seuil critique disque en %")
+    cpu_warning_threshold = models.FloatField(null=True, blank=True, help_text="Seuil d'avertissement CPU en %")
+    cpu_critical_threshold = models.FloatField(null=True, blank=True, help_text="Seuil critique CPU en %")
+    memory_warning_threshold = models.FloatField(null=True, blank=True, help_text="Seuil d'avertissement mémoire en %")
+    memory_critical_threshold = models.FloatField(null=True, blank=True, help_text="Seuil critique mémoire en %")
+    disk_warning_threshold = models.FloatField(null=True, blank=True, help_text="Seuil d'avertissement disque en %")
+    disk_critical_threshold = models.FloatField(null=True, blank=True, help_text="Seuil critique disque en %")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        abstract = True
+
+
+class ThresholdProfile(ThresholdValues):
+    """
+    Seuils communs à une entreprise, à un site ou à un type d'équipement de
+    l'entreprise. Ordre de priorité: surcharge par équipement (AlertThreshold),
+    site, type, entreprise, puis THRESHOLD_DEFAULTS.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="threshold_profiles")
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, null=True, blank=True, related_name="threshold_profiles")
+    equipment_type = models.CharField(max_length=20, choices=Equipment.TYPE_CHOICES, blank=True, default='')
+    
+    class Meta:
+        verbose_name = "Profil de seuils"
+        verbose_name_plural = "Profils de seuils"
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(site__isnull=True) | models.Q(equipment_type=''),
+                name='threshold_profile_single_scope',
+            ),
+            models.UniqueConstraint(
+                fields=['company'], condition=models.Q(site__isnull=True, equipment_type=''),
+                name='threshold_profile_company_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['site'], condition=models.Q(site__isnull=False),
+                name='threshold_profile_site_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['company', 'equipment_type'], condition=~models.Q(equipment_type=''),
+                name='threshold_profile_type_uniq',
+            ),
+        ]
+    
+    @property
+    def scope(self):
+        if self.site_id is not None:
+            return 'site'
+        return 'type' if self.equipment_type else 'company'
+    
+    def __str__(self):
+        return f"Profil de seuils - {self.scope}"
+
+
+class AlertThreshold(ThresholdValues):
+    """Surcharge des seuils d'alerte pour un équipement"""
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name="thresholds")
+    
     class Meta:
         verbose_name = "Seuil d'alerte"
         verbose_name_plural = "Seuils d'alerte"
@@ -0,0 +1,286 @@
+"""
+Sonde active des équipements (connexion TCP ou ICMP) sur asyncio.
+
+Chaque équipement ayant une adresse IP est sondé à l'intervalle de son site
+(``Site.probe_interval``), sous une limite de sondes simultanées. Les résultats
+sont mis en tampon et écrits par lots via ``NetworkMetric.objects.upsert``, ce
+qui déclenche les traitements d'ingestion habituels (dernière mesure, seuils).
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import re
+from contextlib import suppress
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.utils import timezone
+
+from equipment.models import Equipment
+from .models import NetworkMetric
+
+DEFAULT_PORTS = (80, 443, 22)
+# Intervalle minimal entre deux sondes d'un équipement, en secondes
+MIN_INTERVAL = 1
+
+PING_LOSS = re.compile(r'([\d.]+)% packet loss')
+PING_RTT = re.compile(r'= [\d.]+/([\d.]+)/')
+
+
+@dataclass
+class Target:
+    equipment_id: int
+    host: str
+    interval: int
+    # Dernier port ayant répondu, essayé en premier à la sonde suivante
+    port: int = None
+    # Distingue les entrées du tas d'une cible remplacée (adresse modifiée, retrait puis retour)
+    generation: int = 0
+
+
+@dataclass
+class ProbeResult:
+    latencies: list = field(default_factory=list)
+    attempts: int = 0
+
+    @property
+    def packet_loss(self):
+        return 100.0 * (self.attempts - len(self.latencies)) / self.attempts if self.attempts else 100.0
+
+    @property
+    def latency(self):
+        return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+
+def connection_quality(latency, packet_loss):
+    if latency is None:
+        return 'offline'
+    if latency < 20 and packet_loss == 0:
+        return 'excellent'
+    if latency < 100 and packet_loss < 1:
+        return 'good'
+    if latency < 300 and packet_loss < 5:
+        return 'fair'
+    return 'poor'
+
+
+async def tcp_connect(host, port, timeout):
+    """
+    Durée (ms) d'établissement d'une connexion TCP, ou None sans réponse.
+    Un refus (RST) prouve aussi que l'hôte répond et compte comme une réponse.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except ConnectionRefusedError:
+        return (loop.time() - start) * 1000
+    except (OSError, asyncio.TimeoutError):
+        return None
+    elapsed = (loop.time() - start) * 1000
+    writer.close()
+    with suppress(OSError):
+        await writer.wait_closed()
+    return elapsed
+
+
+async def tcp_probe(target, ports, attempts, timeout):
+    """
+    ``attempts`` connexions TCP successives. La première tentative essaie le
+    dernier port connu puis les autres; sans réponse, l'hôte est considéré
+    injoignable sans autres essais.
+    """
+    result = ProbeResult(attempts=attempts)
+    for attempt in range(attempts):
+        if attempt == 0:
+            candidates = list(dict.fromkeys(port for port in (target.port, *ports) if port))
+        elif target.port is None:
+            break
+        else:
+            candidates = [target.port]
+        for port in candidates:
+            latency = await tcp_connect(target.host, port, timeout)
+            if latency is not None:
+                target.port = port
+                result.latencies.append(latency)
+                break
+        else:
+            if attempt == 0:
+                target.port = None
+    return result
+
+
+async def icmp_probe(target, attempts, timeout):
+    """``attempts`` échos ICMP via la commande système ping (pas de socket brute: aucun privilège requis)"""
+    process = await asyncio.create_subprocess_exec(
+        'ping', '-n', '-q', '-c', str(attempts), '-W', str(max(1, round(timeout))), target.host,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(), attempts * (timeout + 1) + 1)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return ProbeResult(attempts=attempts)
+    output = output.decode(errors='replace')
+    loss = PING_LOSS.search(output)
+    rtt = PING_RTT.search(output)
+    received = round(attempts * (1 - float(loss.group(1)) / 100)) if loss else 0
+    return ProbeResult(latencies=[float(rtt.group(1))] * received if rtt else [], attempts=attempts)
+
+
+def load_targets(company=None):
+    """Équipements sondables: (id, adresse IP, intervalle du site)"""
+    queryset = Equipment.objects.filter(ip_address__isnull=False)
+    if company is not None:
+        queryset = queryset.filter(company=company)
+    close_old_connections()
+    return {
+        equipment_id: (host, max(interval or MIN_INTERVAL, MIN_INTERVAL))
+        for equipment_id, host, interval in queryset.values_list('id', 'ip_address', 'site__probe_interval')
+    }
+
+
+def save_metrics(metrics):
+    close_old_connections()
+    NetworkMetric.objects.upsert(metrics)
+
+
+class Prober:
+    """Ordonnanceur de sondes: un tas des prochaines échéances, une sémaphore, un tampon d'écriture"""
+
+    def __init__(self, method='tcp', ports=DEFAULT_PORTS, attempts=3, timeout=1.0, concurrency=500,
+                 batch_size=1000, flush_interval=5.0, refresh=300, company=None, log=print):
+        self.method = method
+        self.ports = tuple(ports)
+        self.attempts = attempts
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.refresh = refresh
+        self.company = company
+        self.log = log
+        self.targets = {}
+        # Tas des échéances: (instant, équipement, génération de la cible)
+        self.queue = []
+        self.generations = itertools.count(1)
+        self.buffer = []
+        self.probed = 0
+        self.saved = 0
+
+    async def load(self):
+        rows = await sync_to_async(load_targets)(self.company)
+        added = []
+        for equipment_id, (host, interval) in rows.items():
+            target = self.targets.get(equipment_id)
+            if target is None or target.host != host:
+                self.targets[equipment_id] = Target(equipment_id, host, interval, generation=next(self.generations))
+                added.append(equipment_id)
+            else:
+                target.interval = interval
+        for equipment_id in self.targets.keys() - rows.keys():
+            del self.targets[equipment_id]
+        return added
+
+    async def probe(self, target):
+        if self.method == 'icmp':
+            result = await icmp_probe(target, self.attempts, self.timeout)
+        else:
+            result = await tcp_probe(target, self.ports, self.attempts, self.timeout)
+        latency = result.latency
+        self.buffer.append(NetworkMetric(
+            equipment_id=target.equipment_id,
+            timestamp=timezone.now(),
+            ping_response_time=round(latency, 3) if latency is not None else None,
+            packet_loss=result.packet_loss,
+            is_online=latency is not None,
+            connection_quality=connection_quality(latency, result.packet_loss),
+        ))
+        self.probed += 1
+        if len(self.buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        metrics, self.buffer = self.buffer, []
+        await sync_to_async(save_metrics)(metrics)
+        self.saved += len(metrics)
+
+    async def run_once(self):
+        """Une seule passe sur tous les équipements, puis écriture du tampon"""
+        await self.load()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(target):
+            async with semaphore:
+                await self.probe(target)
+
+        await asyncio.gather(*(bounded(target) for target in list(self.targets.values())))
+        await self.flush()
+
+    def schedule(self, equipment_ids, now):
+        """Premières échéances étalées sur l'intervalle pour lisser la charge"""
+        for equipment_id in equipment_ids:
+            target = self.targets[equipment_id]
+            heapq.heappush(self.queue, (now + random.uniform(0, target.interval), equipment_id, target.generation))
+
+    def pop_due(self, now):
+        """
+        Cible de l'échéance la plus proche si elle est atteinte, replanifiée à
+        l'intervalle suivant; None sinon. Les entrées périmées sont écartées.
+        """
+        while self.queue and self.queue[0][0] <= now:
+            due, equipment_id, generation = heapq.heappop(self.queue)
+            target = self.targets.get(equipment_id)
+            if target is None or target.generation != generation:
+                continue  # équipement supprimé, sans IP ou remplacé depuis
+            heapq.heappush(self.queue, (max(due + target.interval, now), equipment_id, generation))
+            return target
+        return None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        running = set()
+
+        async def bounded(target):
+            try:
+                await self.probe(target)
+            finally:
+                semaphore.release()
+
+        self.schedule(await self.load(), loop.time())
+        refresh_at = loop.time() + self.refresh
+        flush_at = loop.time() + self.flush_interval
+        report_at = loop.time() + 60
+        try:
+            while True:
+                now = loop.time()
+                if now >= refresh_at:
+                    self.schedule(await self.load(), now)
+                    refresh_at = now + self.refresh
+                if now >= flush_at:
+                    await self.flush()
+                    flush_at = now + self.flush_interval
+                if now >= report_at:
+                    self.log(f"{len(self.targets)} équipements, {self.probed} sondes, {self.saved} mesures enregistrées")
+                    report_at = now + 60
+
+                target = self.pop_due(now)
+                if target is None:
+                    next_due = self.queue[0][0] if self.queue else now + 1
+                    await asyncio.sleep(max(0, min(next_due, flush_at, refresh_at) - now))
+                    continue
+                await semaphore.acquire()
+                task = loop.create_task(bounded(target))
+                running.add(task)
+                task.add_done_callback(running.discard)
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            await self.flush()
@@ -0,0 +1,64 @@
+"""
+Purge par lots des mesures brutes, des cumuls et des traces de suppression
+(synchronisation incrémentale) au-delà de leur rétention.
+
+Chaque lot sélectionne au plus ``chunk_size`` identifiants via l'index sur
+l'horodatage puis les supprime dans une transaction courte, ce qui évite les
+verrous longs et les transactions géantes.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from sync.models import Tombstone
+
+from .models import NetworkMetric
+from .rollups import RAW, RESOLUTIONS, pending_since
+
+
+def retention_targets(now=None):
+    """(résolution, modèle, champ horodatage, date limite) pour chaque rétention configurée"""
+    now = now or timezone.now()
+    targets = []
+    for resolution, days in settings.METRICS_RETENTION_DAYS.items():
+        if not days:
+            continue
+        if resolution == RAW:
+            model, field = NetworkMetric, 'timestamp'
+        else:
+            model, field = RESOLUTIONS[resolution][0], 'bucket'
+        targets.append((resolution, model, field, now - timedelta(days=days)))
+    if settings.SYNC_TOMBSTONE_RETENTION_DAYS:
+        targets.append((
+            'tombstones', Tombstone, 'deleted_at', now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        ))
+    return targets
+
+
+def rollup_safe_cutoff(resolution, cutoff):
+    """Recule ``cutoff`` au plus ancien intervalle encore à intégrer dans la résolution suivante"""
+    pending = pending_since(resolution)
+    return min(cutoff, pending) if pending is not None else cutoff
+
+
+def purge(model, field, cutoff, chunk_size=10000, pause=0, progress=None):
+    """Supprime les lignes de ``model`` antérieures à ``cutoff`` par lots; renvoie le total"""
+    expired = model.objects.filter(**{f'{field}__lt': cutoff})
+
+    total = 0
+    start = time.perf_counter()
+    while True:
+        with transaction.atomic():
+            ids = list(expired.order_by(field).values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            deleted, _ = model.objects.filter(id__in=ids).delete()
+        total += deleted
+        if progress:
+            progress(total, total / max(time.perf_counter() - start, 1e-9))
+        if pause:
+            time.sleep(pause)
+    return total
@@ -0,0 +1,371 @@
+"""
+Cumuls multi-résolution des mesures (1 minute, 1 heure, 1 jour).
+
+Chaque écriture de mesures enregistre, dans sa transaction, les intervalles
+minute qu'elle modifie (``RollupPending``). ``rollup`` recalcule ces intervalles
+depuis leur source (brut -> 1m -> 1h -> 1d) et remplace les cumuls: une mesure
+corrigée par upsert ou validée tardivement est toujours prise en compte, sans
+double comptage. Les lectures complètent les intervalles encore en attente par
+l'agrégation des mesures brutes. ``select_resolution`` choisit la résolution la
+plus grossière compatible avec une plage et un nombre de points.
+"""
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .aggregation import usage_percent
+from .models import (
+    NetworkMetric, MetricRollupMinute, MetricRollupHour, MetricRollupDay,
+    RollupPending, ROLLUP_FIELDS,
+)
+
+# Du plus fin au plus grossier: nom -> (modèle, troncature SQL, largeur d'intervalle)
+RESOLUTIONS = {
+    '1m': (MetricRollupMinute, 'minute', timedelta(minutes=1)),
+    '1h': (MetricRollupHour, 'hour', timedelta(hours=1)),
+    '1d': (MetricRollupDay, 'day', timedelta(days=1)),
+}
+
+RAW = 'raw'
+
+# Chaque résolution est recalculée depuis la précédente
+SOURCES = dict(zip(RESOLUTIONS, [RAW, *RESOLUTIONS]))
+FOLLOWING = {source: resolution for resolution, source in SOURCES.items()}
+
+ROLLUP_COLUMNS = ['sample_count', 'online_count'] + [
+    f'{field}_{part}' for field in ROLLUP_FIELDS for part in ('min', 'max', 'sum', 'count')
+]
+
+DEFAULT_RANGE = timedelta(hours=24)
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+# Intervalles (équipement, début) par requête d'agrégation
+KEYS_PER_QUERY = 1000
+
+ROLLUP_SOURCES = {
+    'ping_response_time': F('ping_response_time'),
+    'packet_loss': F('packet_loss'),
+    'cpu_usage': F('cpu_usage'),
+    'memory_usage': usage_percent('memory_used', 'memory_total', default=None),
+    'disk_usage': usage_percent('disk_used', 'disk_total', default=None),
+}
+
+TRUNCATE = {
+    'minute': {'second': 0, 'microsecond': 0},
+    'hour': {'minute': 0, 'second': 0, 'microsecond': 0},
+    'day': {'hour': 0, 'minute': 0, 'second': 0, 'microsecond': 0},
+}
+
+
+def truncate(value, kind):
+    """Début (UTC) de l'intervalle ``kind`` contenant ``value``, comme Trunc en SQL"""
+    return value.astimezone(dt_timezone.utc).replace(**TRUNCATE[kind])
+
+
+def retention_cutoff(resolution, now=None):
+    """Date avant laquelle ``resolution`` est purgée (METRICS_RETENTION_DAYS), ou None"""
+    days = settings.METRICS_RETENTION_DAYS.get(resolution)
+    if not days:
+        return None
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def aggregate_raw(queryset, kind):
+    """Agrège des NetworkMetric par (équipement, intervalle tronqué à ``kind``) en SQL"""
+    aggregates = {
+        'sample_count': Count('id'),
+        'online_count': Count('id', filter=Q(is_online=True)),
+    }
+    for field in ROLLUP_FIELDS:
+        source = ROLLUP_SOURCES[field]
+        aggregates[f'{field}_min'] = Min(source)
+        aggregates[f'{field}_max'] = Max(source)
+        aggregates[f'{field}_sum'] = Sum(source)
+        aggregates[f'{field}_count'] = Count(source)
+    return (
+        queryset
+        .order_by()
+        .annotate(bucket=Trunc('timestamp', kind, tzinfo=dt_timezone.utc))
+        .values('equipment_id', 'bucket')
+        .annotate(**aggregates)
+    )
+
+
+def aggregate_rollups(queryset, kind):
+    """Regroupe des cumuls plus fins par (équipement, intervalle tronqué à ``kind``) en SQL"""
+    aggregates = {'sample_count': Sum('sample_count'), 'online_count': Sum('online_count')}
+    for field in ROLLUP_FIELDS:
+        aggregates[f'{field}_min'] = Min(f'{field}_min')
+        aggregates[f'{field}_max'] = Max(f'{field}_max')
+        aggregates[f'{field}_sum'] = Sum(f'{field}_sum')
+        aggregates[f'{field}_count'] = Sum(f'{field}_count')
+    rows = (
+        queryset
+        .order_by()
+        .annotate(period=Trunc('bucket', kind, tzinfo=dt_timezone.utc))
+        .values('equipment_id', 'period')
+        .annotate(**aggregates)
+    )
+    for row in rows:
+        row['bucket'] = row.pop('period')
+        yield row
+
+
+def aggregate_keys(source, resolution, keys):
+    """
+    Agrège depuis ``source`` (RAW ou une résolution plus fine) les intervalles
+    ``keys`` ((équipement, début)) de ``resolution``; un dictionnaire par intervalle
+    contenant au moins une mesure.
+    """
+    _, kind, width = RESOLUTIONS[resolution]
+    by_bucket = defaultdict(set)
+    for equipment_id, bucket in keys:
+        by_bucket[bucket].add(equipment_id)
+    field = 'timestamp' if source == RAW else 'bucket'
+
+    buckets = sorted(by_bucket)
+    condition, size = Q(), 0
+    for index, bucket in enumerate(buckets):
+        condition |= Q(
+            equipment_id__in=by_bucket[bucket],
+            **{f'{field}__gte': bucket, f'{field}__lt': bucket + width}
+        )
+        size += len(by_bucket[bucket])
+        if size >= KEYS_PER_QUERY or index == len(buckets) - 1:
+            if source == RAW:
+                yield from aggregate_raw(NetworkMetric.objects.filter(condition), kind)
+            else:
+                yield from aggregate_rollups(RESOLUTIONS[source][0].objects.filter(condition), kind)
+            condition, size = Q(), 0
+
+
+def mark_pending(resolution, keys):
+    """
+    Enregistre les intervalles de ``resolution`` touchés par ``keys`` ((équipement,
+    horodatage)). À appeler dans la transaction de l'écriture.
+    """
+    kind = RESOLUTIONS[resolution][1]
+    pending = {(equipment_id, truncate(timestamp, kind)) for equipment_id, timestamp in keys}
+    RollupPending.objects.bulk_create(
+        [RollupPending(resolution=resolution, equipment_id=equipment_id, bucket=bucket)
+         for equipment_id, bucket in pending],
+        batch_size=1000,
+    )
+
+
+def rollup(resolution, batch_size=10000):
+    """
+    Recalcule au plus ``batch_size`` intervalles en attente de ``resolution``
+    depuis leur source, puis met en attente les intervalles correspondants de la
+    résolution suivante. Renvoie le nombre d'intervalles traités (0 quand à jour).
+    """
+    model = RESOLUTIONS[resolution][0]
+    source = SOURCES[resolution]
+    with transaction.atomic():
+        # Deux exécutions concurrentes se répartissent les intervalles (SKIP LOCKED);
+        # un intervalle recalculé deux fois donne le même cumul
+        claimed = list(
+            RollupPending.objects.select_for_update(skip_locked=True)
+            .filter(resolution=resolution)
+            .order_by('bucket')
+            .values_list('id', 'equipment_id', 'bucket')[:batch_size]
+        )
+        if not claimed:
+            return 0
+        RollupPending.objects.filter(id__in=[pk for pk, _, _ in claimed]).delete()
+
+        keys = {(equipment_id, bucket) for _, equipment_id, bucket in claimed}
+        rows = {(row['equipment_id'], row['bucket']): row for row in aggregate_keys(source, resolution, keys)}
+        # Source déjà purgée: le cumul existant est plus complet que ce qu'il en reste
+        cutoff = retention_cutoff(source)
+        current = {key for key in keys if cutoff is None or key[1] >= cutoff}
+
+        model.objects.bulk_create(
+            [model(**rows[key]) for key in current if key in rows],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['equipment', 'bucket'],
+            update_fields=ROLLUP_COLUMNS,
+        )
+        model.objects.bulk_create(
+            [model(**rows[key]) for key in keys - current if key in rows],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        # Plus aucune mesure dans l'intervalle
+        empty = defaultdict(set)
+        for equipment_id, bucket in current - rows.keys():
+            empty[bucket].add(equipment_id)
+        for bucket, equipment_ids in empty.items():
+            model.objects.filter(bucket=bucket, equipment_id__in=equipment_ids).delete()
+
+        if resolution in FOLLOWING:
+            mark_pending(FOLLOWING[resolution], keys)
+    return len(keys)
+
+
+def pending_since(resolution):
+    """Début du plus ancien intervalle de ``resolution`` (ou RAW) pas encore intégré à la résolution suivante"""
+    if resolution not in FOLLOWING:
+        return None
+    return (
+        RollupPending.objects.filter(resolution=FOLLOWING[resolution])
+        .order_by('bucket').values_list('bucket', flat=True).first()
+    )
+
+
+def parse_datetime_param(value, name):
+    """Date ISO 8601 d'un paramètre, rendue consciente du fuseau; ValueError si invalide"""
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f'{name}: date ISO 8601 attendue')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def parse_period(params, default=DEFAULT_RANGE):
+    """Lit from/to dans les paramètres de requête (les dernières 24h par défaut)"""
+    end = parse_datetime_param(params['to'], 'to') if params.get('to') else timezone.now()
+    start = parse_datetime_param(params['from'], 'from') if params.get('from') else end - default
+    if start >= end:
+        raise ValueError('from doit précéder to')
+    return start, end
+
+
+def parse_range(params):
+    """Lit from/to/points dans les paramètres de requête (24h et 500 points par défaut)"""
+    start, end = parse_period(params)
+    try:
+        points = int(params.get('points', DEFAULT_POINTS))
+    except ValueError:
+        raise ValueError('points: entier attendu')
+    if not 1 <= points <= MAX_POINTS:
+        raise ValueError(f'points: valeur entre 1 et {MAX_POINTS} attendue')
+    return start, end, points
+
+
+def select_resolution(start, end, points):
+    """
+    Résolution la plus grossière dont l'intervalle ne dépasse pas (end - start) / points,
+    ou ``RAW`` si même la minute est trop grossière.
+    """
+    step = (end - start) / max(points, 1)
+    selected = RAW
+    for name, (_, _, width) in RESOLUTIONS.items():
+        if width <= step:
+            selected = name
+    return selected
+
+
+def stale_buckets(resolution, equipment_ids, start, end):
+    """
+    Intervalles de ``resolution`` dans [start, end) dont le cumul ne reflète pas
+    encore les mesures brutes (en attente à ce niveau ou à un niveau plus fin).
+    Au-delà de la rétention des mesures brutes, le cumul fait foi.
+    """
+    _, kind, width = RESOLUTIONS[resolution]
+    levels = list(RESOLUTIONS)[:list(RESOLUTIONS).index(resolution) + 1]
+    pending = (
+        RollupPending.objects
+        .filter(resolution__in=levels, equipment_id__in=equipment_ids, bucket__gte=start - width, bucket__lt=end)
+        .values_list('equipment_id', 'bucket')
+        .distinct()
+    )
+    cutoff = retention_cutoff(RAW)
+    stale = set()
+    for equipment_id, bucket in pending:
+        bucket = truncate(bucket, kind)
+        if start <= bucket < end and (cutoff is None or bucket >= cutoff):
+            stale.add((equipment_id, bucket))
+    return stale
+
+
+def _rollup_values(resolution, equipment_ids, start, end, names):
+    """
+    Lignes de cumul (dictionnaires ``equipment_id``, ``bucket`` et ``names``) triées
+    par équipement et intervalle; les intervalles en attente sont agrégés depuis
+    les mesures brutes.
+    """
+    model = RESOLUTIONS[resolution][0]
+    stale = stale_buckets(resolution, equipment_ids, start, end)
+    rows = [
+        row for row in model.objects
+        .filter(equipment_id__in=equipment_ids, bucket__gte=start, bucket__lt=end)
+        .order_by('equipment_id', 'bucket')
+        .values('equipment_id', 'bucket', *names)
+        if (row['equipment_id'], row['bucket']) not in stale
+    ]
+    if stale:
+        rows += [
+            {key: row[key] for key in ('equipment_id', 'bucket', *names)}
+            for row in aggregate_keys(RAW, resolution, stale)
+        ]
+        rows.sort(key=lambda row: (row['equipment_id'], row['bucket']))
+    return rows
+
+
+def rollup_rows(equipment_ids, start, end, resolution):
+    """Lignes de cumul (dictionnaires) pour une plage, lues dans la table de ``resolution``"""
+    if resolution == RAW:
+        raw = NetworkMetric.objects.filter(
+            equipment_id__in=equipment_ids, timestamp__gte=start, timestamp__lt=end
+        )
+        return aggregate_raw(raw, 'second').order_by('equipment_id', 'bucket')
+    return _rollup_values(resolution, equipment_ids, start, end, ROLLUP_COLUMNS)
+
+
+# Grandeurs exposées par la série compacte (/api/metrics/series/)
+SERIES_FIELDS = ROLLUP_FIELDS + ['uptime_percentage']
+
+
+def series_columns(equipment_id, start, end, resolution, fields):
+    """
+    Série en colonnes pour un équipement: (horodatages, {champ: valeurs}).
+
+    Seules les colonnes demandées sont lues; en résolution agrégée chaque valeur
+    est la moyenne de l'intervalle.
+    """
+    if resolution == RAW:
+        sources = {
+            field: ROLLUP_SOURCES[field] if field in ROLLUP_FIELDS else Case(
+                When(is_online=True, then=Value(100.0)), default=Value(0.0), output_field=FloatField()
+            )
+            for field in fields
+        }
+        rows = (
+            NetworkMetric.objects.filter(equipment_id=equipment_id, timestamp__gte=start, timestamp__lt=end)
+            .order_by('timestamp')
+            .annotate(**{f'series_{field}': source for field, source in sources.items()})
+            .values_list('timestamp', *[f'series_{field}' for field in fields])
+        )
+        timestamps, columns = [], {field: [] for field in fields}
+        for row in rows:
+            timestamps.append(row[0])
+            for field, value in zip(fields, row[1:]):
+                columns[field].append(value)
+        return timestamps, columns
+
+    names = ['sample_count', 'online_count']
+    for field in fields:
+        if field in ROLLUP_FIELDS:
+            names += [f'{field}_sum', f'{field}_count']
+    rows = _rollup_values(resolution, [equipment_id], start, end, names)
+    timestamps, columns = [], {field: [] for field in fields}
+    for row in rows:
+        timestamps.append(row['bucket'])
+        for field in fields:
+            if field in ROLLUP_FIELDS:
+                count = row[f'{field}_count']
+                columns[field].append(row[f'{field}_sum'] / count if count else None)
+            else:
+                columns[field].append(row['online_count'] * 100 / row['sample_count'] if row['sample_count'] else None)
+    return timestamps, columns
@@ -1,5 +1,7 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import NetworkMetric, AlertThreshold
+from equipment.models import Equipment
+from .models import NetworkMetric, LatestMetric, AlertThreshold, ThresholdProfile, MAX_CLOCK_SKEW, THRESHOLD_DEFAULTS
 
 class NetworkMetricSerializer(serializers.ModelSerializer):
     equipment_name = serializers.CharField(source='equipment.name', read_only=True)
@@ -18,16 +20,67 @@ class NetworkMetricSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'timestamp']
 
+class LatestMetricSerializer(serializers.ModelSerializer):
+    """Instantané de la dernière mesure d'un équipement"""
+    equipment_name = serializers.CharField(source='equipment.name', read_only=True)
+    site_name = serializers.CharField(source='equipment.site.name', read_only=True)
+    memory_usage_percent = serializers.ReadOnlyField()
+    disk_usage_percent = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = LatestMetric
+        fields = [
+            'equipment', 'equipment_name', 'site_name', 'timestamp',
+            'ping_response_time', 'packet_loss', 'bandwidth_up', 'bandwidth_down',
+            'cpu_usage', 'memory_total', 'memory_used', 'memory_usage_percent',
+            'disk_total', 'disk_used', 'disk_usage_percent',
+            'is_online', 'connection_quality'
+        ]
+        read_only_fields = fields
+
+class NetworkMetricListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        # Une seule instruction INSERT ... ON CONFLICT pour tout le lot (identifiants non renseignés)
+        return NetworkMetric.objects.upsert(
+            [NetworkMetric(**attrs) for attrs in validated_data]
+        )
+
 class NetworkMetricCreateSerializer(serializers.ModelSerializer):
     """Serializer optimisé pour la création en masse de métriques"""
     class Meta:
         model = NetworkMetric
         fields = [
-            'equipment', 'ping_response_time', 'packet_loss', 
+            'id', 'equipment', 'timestamp', 'ping_response_time', 'packet_loss', 
             'bandwidth_up', 'bandwidth_down', 'cpu_usage',
             'memory_total', 'memory_used', 'disk_total', 'disk_used',
             'is_online', 'connection_quality'
         ]
+        read_only_fields = ['id']
+        list_serializer_class = NetworkMetricListSerializer
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Limiter les équipements à ceux de l'entreprise de l'utilisateur
+        request = self.context.get('request')
+        if request is not None:
+            self.fields['equipment'].queryset = Equipment.objects.filter(
+                company_id=request.user.company_id
+            )
+    
+    def validate_timestamp(self, value):
+        if value > timezone.now() + MAX_CLOCK_SKEW:
+            raise serializers.ValidationError("L'horodatage ne peut pas être dans le futur")
+        return value
+    
+    def create(self, validated_data):
+        # Upsert sur (equipment, timestamp): un renvoi du même échantillon met à jour la mesure
+        metric = NetworkMetric.objects.upsert([NetworkMetric(**validated_data)])[0]
+        if metric.pk is None:
+            # Django 4.2 ne renvoie pas l'identifiant d'un INSERT ... ON CONFLICT: relecture par clé
+            metric.pk = NetworkMetric.objects.filter(
+                equipment_id=metric.equipment_id, timestamp=metric.timestamp
+            ).values_list('pk', flat=True).get()
+        return metric
 
 class AlertThresholdSerializer(serializers.ModelSerializer):
     equipment_name = serializers.CharField(source='equipment.name', read_only=True)
@@ -45,6 +98,51 @@ class AlertThresholdSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class ThresholdValuesSerializer(serializers.ModelSerializer):
+    """Valeurs de seuils seules (mise à jour en masse des surcharges)"""
+    
+    class Meta:
+        model = AlertThreshold
+        fields = list(THRESHOLD_DEFAULTS)
+
+class ThresholdProfileSerializer(serializers.ModelSerializer):
+    scope = serializers.CharField(read_only=True)
+    site_name = serializers.CharField(source='site.name', read_only=True, default=None)
+    
+    class Meta:
+        model = ThresholdProfile
+        fields = [
+            'id', 'scope', 'site', 'site_name', 'equipment_type',
+            'ping_warning_threshold', 'ping_critical_threshold',
+            'packet_loss_warning', 'packet_loss_critical',
+            'cpu_warning_threshold', 'cpu_critical_threshold',
+            'memory_warning_threshold', 'memory_critical_threshold',
+            'disk_warning_threshold', 'disk_critical_threshold',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate(self, data):
+        company_id = self.context['request'].user.company_id
+        site = data.get('site', getattr(self.instance, 'site', None))
+        equipment_type = data.get('equipment_type', getattr(self.instance, 'equipment_type', ''))
+        if site is not None and equipment_type:
+            raise serializers.ValidationError("Un profil s'applique à un site ou à un type d'équipement, pas aux deux")
+        if site is not None and site.company_id != company_id:
+            raise serializers.ValidationError({'site': "Site inconnu"})
+        
+        # Un seul profil par entreprise, par site et par type
+        duplicate = ThresholdProfile.objects.filter(company_id=company_id)
+        if site is not None:
+            duplicate = duplicate.filter(site=site)
+        else:
+            duplicate = duplicate.filter(site__isnull=True, equipment_type=equipment_type)
+        if self.instance is not None:
+            duplicate = duplicate.exclude(pk=self.instance.pk)
+        if duplicate.exists():
+            raise serializers.ValidationError("Un profil existe déjà pour ce niveau")
+        return data
+
 class MetricsSummarySerializer(serializers.Serializer):
     """Serializer pour les statistiques agrégées"""
     equipment_id = serializers.IntegerField()
@@ -0,0 +1,107 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from .models import NetworkMetric, LatestMetric, AlertThreshold, ThresholdProfile
+from .rollups import mark_pending
+from .status import update_statuses
+from .thresholds import evaluate, open_alert_cache, threshold_cache
+from alerts.models import Alert
+from equipment.models import Equipment
+
+# Émis après chaque ingestion de mesures (save unitaire ou bulk_create),
+# dans la transaction d'écriture. Arguments: metrics (liste de NetworkMetric) et
+# backfill (True pour une reprise d'historique). Après un upsert, les mesures n'ont
+# pas d'identifiant: les récepteurs s'appuient sur (equipment_id, timestamp).
+metrics_ingested = Signal()
+
+# Équipements dont le statut est à recalculer au prochain commit (par thread)
+_status_pending = threading.local()
+
+
+def _refresh_statuses():
+    equipment_ids = getattr(_status_pending, 'ids', None)
+    _status_pending.ids = set()
+    if equipment_ids:
+        update_statuses(equipment_ids)
+
+
+def defer_status_update(equipment_id):
+    """
+    Recalcule le statut de l'équipement au commit, une fois pour tous ceux de la
+    transaction: une suppression en cascade ne relance pas le calcul par alerte.
+    """
+    if not hasattr(_status_pending, 'ids'):
+        _status_pending.ids = set()
+    _status_pending.ids.add(equipment_id)
+    # Un rappel par appel: le premier exécuté vide l'ensemble, y compris les
+    # équipements restés d'une transaction annulée (le calcul est idempotent)
+    transaction.on_commit(_refresh_statuses)
+
+
+@receiver(post_save, sender=NetworkMetric)
+def metric_saved(sender, instance, created, **kwargs):
+    # Création ou correction: comme un upsert d'ingestion
+    metrics_ingested.send(sender=sender, metrics=[instance])
+
+
+@receiver(metrics_ingested)
+def update_latest_snapshot(sender, metrics, **kwargs):
+    LatestMetric.objects.record(metrics)
+
+
+@receiver(metrics_ingested)
+def mark_rollups_pending(sender, metrics, **kwargs):
+    # Dans la transaction de l'écriture: validée avec les mesures, jamais perdue
+    mark_pending('1m', [(metric.equipment_id, metric.timestamp) for metric in metrics])
+
+
+@receiver(metrics_ingested)
+def evaluate_thresholds(sender, metrics, backfill=False, **kwargs):
+    # Une reprise d'historique ne doit pas déclencher d'alertes
+    if not backfill:
+        evaluate(metrics)
+
+
+@receiver(metrics_ingested)
+def update_equipment_status(sender, metrics, **kwargs):
+    # Après la dernière mesure et les alertes du lot, dont dépend le statut
+    update_statuses({metric.equipment_id for metric in metrics})
+
+
+@receiver(post_save, sender=AlertThreshold)
+@receiver(post_delete, sender=AlertThreshold)
+def invalidate_thresholds(sender, instance, **kwargs):
+    equipment_id = instance.equipment_id
+    threshold_cache.invalidate(equipment_id)
+    # Nouvelle invalidation après commit: une lecture concurrente a pu remettre l'ancienne valeur en cache
+    transaction.on_commit(lambda: threshold_cache.invalidate(equipment_id))
+
+
+@receiver(post_save, sender=Equipment)
+def invalidate_equipment_thresholds(sender, instance, created, **kwargs):
+    # Changement de site ou de type: autres profils applicables
+    if not created:
+        equipment_id = instance.pk
+        threshold_cache.invalidate(equipment_id)
+        transaction.on_commit(lambda: threshold_cache.invalidate(equipment_id))
+
+
+@receiver(post_save, sender=ThresholdProfile)
+@receiver(post_delete, sender=ThresholdProfile)
+def invalidate_threshold_profiles(sender, instance, **kwargs):
+    company_id = instance.company_id
+    threshold_cache.invalidate_company(company_id)
+    transaction.on_commit(lambda: threshold_cache.invalidate_company(company_id))
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def invalidate_open_alert(sender, instance, **kwargs):
+    # Modification hors moteur (acquittement, résolution, suppression via l'API)
+    if instance.rule:
+        key = (instance.equipment_id, instance.rule)
+        open_alert_cache.invalidate([key])
+        transaction.on_commit(lambda: open_alert_cache.invalidate([key]))
+    defer_status_update(instance.equipment_id)
@@ -0,0 +1,105 @@
+"""
+Statut des équipements et des sites dérivé des mesures et des alertes ouvertes.
+
+Un équipement est ``offline`` si sa dernière mesure le dit hors ligne (ou est
+trop ancienne, lors d'un recalcul complet), ``warning`` s'il a une alerte
+ouverte, ``online`` sinon. Un équipement en ``maintenance`` ou sans mesure
+garde son statut. Seules les transitions sont écrites, par UPDATE groupés par
+nouveau statut, puis le statut des seuls sites concernés est recalculé.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from sites.models import Site
+from vigileos.cache import bump_generation
+
+
+def derive_status(is_online, timestamp, has_open_alert, stale_before=None):
+    """Statut d'un équipement, ou None quand rien ne permet de le déduire"""
+    if is_online is None:
+        return None
+    if not is_online or (stale_before is not None and timestamp < stale_before):
+        return 'offline'
+    if has_open_alert:
+        return 'warning'
+    return 'online'
+
+
+def site_status(total, offline, warning):
+    """Statut d'un site d'après ses équipements hors maintenance"""
+    if not total:
+        return None
+    if offline == total:
+        return 'offline'
+    if offline or warning:
+        return 'warning'
+    return 'online'
+
+
+def _apply(model, transitions):
+    """Un UPDATE par nouveau statut, restreint aux lignes qui changent réellement"""
+    by_status = defaultdict(list)
+    for pk, new_status in transitions.items():
+        by_status[new_status].append(pk)
+    now = timezone.now()
+    return sum(
+        model.objects.filter(pk__in=pks).exclude(status=new_status).update(status=new_status, updated_at=now)
+        for new_status, pks in by_status.items()
+    )
+
+
+def update_site_statuses(site_ids):
+    counts = (
+        Equipment.objects.filter(site_id__in=site_ids)
+        .exclude(status='maintenance')
+        .order_by()
+        .values('site_id')
+        .annotate(
+            total=Count('id'),
+            offline=Count('id', filter=Q(status='offline')),
+            warning=Count('id', filter=Q(status='warning')),
+        )
+    )
+    derived = {row['site_id']: site_status(row['total'], row['offline'], row['warning']) for row in counts}
+    current = dict(Site.objects.filter(pk__in=derived).values_list('id', 'status'))
+    transitions = {
+        site_id: new_status
+        for site_id, new_status in derived.items()
+        if new_status and current.get(site_id) != new_status
+    }
+    if not transitions:
+        return 0
+    bump_generation(set(Site.objects.filter(pk__in=transitions).values_list('company_id', flat=True)))
+    return _apply(Site, transitions)
+
+
+def update_statuses(equipment_ids, stale_before=None):
+    """
+    Recalcule le statut des équipements donnés puis celui de leurs sites si
+    au moins un équipement a changé. Renvoie (équipements modifiés, sites modifiés).
+    """
+    open_alerts = Alert.objects.filter(equipment=OuterRef('pk'), status__in=Alert.OPEN_STATUSES)
+    rows = (
+        Equipment.objects.filter(pk__in=equipment_ids)
+        .exclude(status='maintenance')
+        .annotate(has_open_alert=Exists(open_alerts))
+        .values_list(
+            'id', 'site_id', 'company_id', 'status',
+            'latest_metric__is_online', 'latest_metric__timestamp', 'has_open_alert',
+        )
+    )
+    transitions, sites, companies = {}, set(), set()
+    for equipment_id, site_id, company_id, current, is_online, timestamp, has_open_alert in rows:
+        new_status = derive_status(is_online, timestamp, has_open_alert, stale_before)
+        if new_status and new_status != current:
+            transitions[equipment_id] = new_status
+            sites.add(site_id)
+            companies.add(company_id)
+    if not transitions:
+        return 0, 0
+    bump_generation(companies)
+    return _apply(Equipment, transitions), update_site_statuses(sites)
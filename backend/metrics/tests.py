@@ -1,3 +1,715 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import socket
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from equipment.models import Equipment
+from sites.models import Site
+from alerts.models import Alert
+from users.models import Company
+from .models import (
+    AlertThreshold, LatestMetric, MetricRollupDay, MetricRollupHour, MetricRollupMinute, NetworkMetric, RollupPending,
+    ThresholdProfile, THRESHOLD_DEFAULTS,
+)
+from .benchmarks import compare
+from .downsampling import lttb_indices
+from .prober import Prober, ProbeResult, Target, load_targets, tcp_probe
+from .retention import purge, rollup_safe_cutoff
+from .rollups import RAW, RESOLUTIONS, rollup, truncate
+from .serializers import MetricsSummarySerializer
+from .thresholds import THRESHOLD_FIELDS, open_alert_cache, resolve, threshold_cache
+
+User = get_user_model()
+
+
+def rollup_all():
+    for resolution in RESOLUTIONS:
+        while rollup(resolution):
+            pass
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='ACME')
+        self.user = User.objects.create_user('acme', password='acme', company=self.company)
+        site = Site.objects.create(name='Site', address='-', company=self.company)
+        self.equipment = Equipment.objects.create(name='Switch', type='switch', site=site)
+        self.minute = truncate(timezone.now() - timedelta(minutes=10), 'minute')
+
+    def upsert(self, cpu, seconds=0, **kwargs):
+        NetworkMetric.objects.upsert([NetworkMetric(
+            equipment=self.equipment, timestamp=self.minute + timedelta(seconds=seconds), cpu_usage=cpu, **kwargs
+        )])
+
+    def test_reingested_sample_replaces_rollup(self):
+        self.upsert(10)
+        rollup_all()
+        self.assertEqual(MetricRollupMinute.objects.get().cpu_usage_max, 10.0)
+
+        # Même (équipement, horodatage): la ligne brute garde son identifiant
+        self.upsert(90)
+        self.assertEqual(rollup('1m'), 1)
+        minute = MetricRollupMinute.objects.get()
+        self.assertEqual((minute.sample_count, minute.cpu_usage_max, minute.cpu_usage_sum), (1, 90.0, 90.0))
+
+        rollup_all()
+        for model in (MetricRollupHour, MetricRollupDay):
+            rolled = model.objects.get()
+            self.assertEqual((rolled.sample_count, rolled.cpu_usage_min, rolled.cpu_usage_max), (1, 90.0, 90.0))
+        self.assertFalse(RollupPending.objects.exists())
+
+    def test_late_commit_with_lower_id(self):
+        self.upsert(10, seconds=30, id=1000)
+        rollup_all()
+        # Identifiant attribué avant celui déjà cumulé, transaction validée après la passe
+        self.upsert(30, seconds=0, id=5)
+        rollup_all()
+        for model in (MetricRollupMinute, MetricRollupHour, MetricRollupDay):
+            rolled = model.objects.get()
+            self.assertEqual((rolled.sample_count, rolled.cpu_usage_sum, rolled.cpu_usage_min), (2, 40.0, 10.0))
+
+    def test_pending_intervals_read_from_raw(self):
+        self.upsert(10)
+        rollup_all()
+        # Ni cumulée ni recalculée: servie par les mesures brutes
+        NetworkMetric.objects.upsert([NetworkMetric(
+            equipment=self.equipment, timestamp=self.minute + timedelta(minutes=5), cpu_usage=50
+        )])
+        self.upsert(30, seconds=20)
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        data = client.get('/api/metrics/series/', {'equipment': self.equipment.pk, 'fields': 'cpu_usage'}).json()
+        self.assertEqual(data['resolution'], '1m')
+        self.assertEqual(data['cpu_usage'], [20.0, 50.0])
+
+        rows = client.get('/api/metrics/rollups/', {'equipment': self.equipment.pk}).json()['results']
+        self.assertEqual([row['sample_count'] for row in rows], [2, 1])
+        self.assertEqual(rows[0]['cpu_usage'], {'min': 10.0, 'max': 30.0, 'avg': 20.0})
+
+
+class IngestionTests(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name='ACME')
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('acme', password='acme', company=company))
+        site = Site.objects.create(name='Site', address='-', company=company)
+        self.equipment = Equipment.objects.create(name='Switch', type='switch', site=site)
+
+    def test_resent_sample_returns_row_id(self):
+        payload = {'equipment': self.equipment.pk, 'timestamp': '2026-01-01T00:00:00Z', 'cpu_usage': 10}
+        first = self.client.post('/api/metrics/', payload, format='json')
+        self.assertEqual(first.status_code, 201, first.content)
+        second = self.client.post('/api/metrics/', {**payload, 'cpu_usage': 20}, format='json')
+        metric = NetworkMetric.objects.get()
+        self.assertEqual((first.json()['id'], second.json()['id']), (metric.pk, metric.pk))
+        self.assertEqual(metric.cpu_usage, 20.0)
+
+    def ingest(self, body, **extra):
+        return self.client.generic('POST', '/api/metrics/ingest/', body, content_type='application/x-ndjson', **extra)
+
+    def test_fractional_equipment_rejected(self):
+        body = f'{{"equipment": {self.equipment.pk}.5, "cpu_usage": 10}}\n{{"equipment": {self.equipment.pk}.0}}\n'
+        data = self.ingest(body.encode()).json()
+        self.assertEqual((data['accepted'], data['rejected']), (1, 1))
+        self.assertEqual(data['errors'], [{'line': 1, 'error': 'equipment: entier attendu'}])
+
+    @override_settings(METRICS_INGEST_MAX_BYTES=64 * 1024)
+    def test_decompressed_size_capped(self):
+        line = f'{{"equipment": {self.equipment.pk}, "cpu_usage": 10}}\n'.encode()
+        body = gzip.compress(line + b' ' * (128 * 1024) + b'\n' + line)
+        self.assertLess(len(body), 1024)
+        response = self.ingest(body, HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(NetworkMetric.objects.exists())
+
+        response = self.ingest(gzip.compress(line), HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 201)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name='ACME')
+        site = Site.objects.create(name='Site', address='-', company=company)
+        self.equipment = Equipment.objects.create(name='Switch', type='switch', site=site)
+        self.now = timezone.now()
+
+    def enforce(self, *args):
+        out = io.StringIO()
+        call_command('enforce_retention', *args, stdout=out)
+        return out.getvalue()
+
+    def test_purge_in_chunks_stops_at_cutoff(self):
+        NetworkMetric.objects.bulk_create([
+            NetworkMetric(equipment=self.equipment, timestamp=self.now - timedelta(hours=hours)) for hours in range(1, 12)
+        ])
+        totals = []
+        deleted = purge(
+            NetworkMetric, 'timestamp', self.now - timedelta(hours=5, minutes=30), chunk_size=2,
+            progress=lambda total, rate: totals.append(total),
+        )
+        self.assertEqual((deleted, totals), (6, [2, 4, 6]))
+        self.assertEqual(
+            sorted(NetworkMetric.objects.values_list('timestamp', flat=True)),
+            [self.now - timedelta(hours=hours) for hours in range(5, 0, -1)],
+        )
+
+    def test_pending_rollups_kept(self):
+        old = self.now - timedelta(days=20)
+        NetworkMetric.objects.upsert([NetworkMetric(equipment=self.equipment, timestamp=old, cpu_usage=10)])
+        self.assertIn('intervalles pas encore cumulés', self.enforce())
+        self.assertTrue(NetworkMetric.objects.exists())
+        self.assertEqual(rollup_safe_cutoff(RAW, self.now), truncate(old, 'minute'))
+
+        self.enforce('--ignore-rollups')
+        self.assertFalse(NetworkMetric.objects.exists())
+
+    @override_settings(METRICS_RETENTION_DAYS={'raw': 14, '1m': 1, '1h': 2, '1d': 3})
+    def test_retention_per_resolution(self):
+        ages = [timedelta(hours=hours) for hours in (12, 36, 60, 84)]
+        for model, _, _ in RESOLUTIONS.values():
+            model.objects.bulk_create([model(equipment=self.equipment, bucket=self.now - age) for age in ages])
+        self.enforce()
+        for (model, _, _), kept in zip(RESOLUTIONS.values(), (1, 2, 3)):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(
+                    list(model.objects.order_by('-bucket').values_list('bucket', flat=True)),
+                    [self.now - age for age in ages[:kept]],
+                )
+
+
+class SeriesTests(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name='ACME')
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('acme', password='acme', company=company))
+        site = Site.objects.create(name='Site', address='-', company=company)
+        self.equipment = Equipment.objects.create(name='Switch', type='switch', site=site)
+        self.end = truncate(timezone.now(), 'minute')
+        self.start = self.end - timedelta(hours=1)
+        NetworkMetric.objects.bulk_create([
+            NetworkMetric(
+                equipment=self.equipment, timestamp=self.start + timedelta(minutes=i),
+                cpu_usage=90 if i == 17 else 10, ping_response_time=None if i % 3 else float(i),
+            )
+            for i in range(60)
+        ])
+
+    def series(self, **params):
+        return self.client.get('/api/metrics/series/', {
+            'equipment': self.equipment.pk, 'from': self.start.isoformat(), 'to': self.end.isoformat(), **params,
+        })
+
+    def test_lttb(self):
+        xs = list(range(100))
+        ys = [None if x % 4 == 0 else float(x % 7) for x in xs]
+        indices = lttb_indices(xs, ys, 10)
+        self.assertEqual(len(indices), 10)
+        self.assertEqual((indices[0], indices[-1]), (0, 99))
+        self.assertEqual(indices, sorted(set(indices)))
+        # Pic isolé dans une série plate: conservé
+        flat = [1.0] * 100
+        flat[42] = 50.0
+        self.assertIn(42, lttb_indices(xs, flat, 10))
+        for threshold in (100, 150):
+            self.assertEqual(lttb_indices(xs, ys, threshold), xs)
+
+    def test_columnar_series(self):
+        response = self.series(points=10, fields='cpu_usage,ping_response_time')
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual(data['resolution'], '1m')
+        self.assertEqual(
+            set(data) - {'equipment', 'resolution', 'from', 'to'}, {'timestamps', 'cpu_usage', 'ping_response_time'}
+        )
+        self.assertEqual([len(data[key]) for key in ('timestamps', 'cpu_usage', 'ping_response_time')], [10] * 3)
+        self.assertIn(90.0, data['cpu_usage'])
+        self.assertEqual(data['timestamps'][0], int(self.start.timestamp() * 1000))
+
+        # Moins de points que demandé: série complète
+        self.assertEqual(len(self.series(points=100, fields='cpu_usage').json()['timestamps']), 60)
+
+    def test_invalid_parameters(self):
+        for params in ({'fields': 'cpu_usage,inconnu'}, {'fields': ','}, {'from': '2024-13-01T00:00'},
+                       {'to': 'hier'}, {'points': 0}):
+            with self.subTest(params=params):
+                self.assertEqual(self.series(**params).status_code, 400)
+
+    def test_other_company_equipment(self):
+        other_site = Site.objects.create(name='Autre', address='-', company=Company.objects.create(name='Autre'))
+        foreign = Equipment.objects.create(name='Autre', type='switch', site=other_site)
+        self.assertEqual(self.series(equipment=foreign.pk).status_code, 404)
+
+
+class LatestSnapshotTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='ACME')
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('acme', password='acme', company=self.company))
+        site = Site.objects.create(name='Site', address='-', company=self.company)
+        self.equipment = [
+            Equipment.objects.create(name=f'Switch {i}', type='switch', site=site) for i in range(4)
+        ]
+        self.now = timezone.now().replace(microsecond=0)
+
+    def metric(self, equipment, minutes_ago, cpu):
+        return NetworkMetric(equipment=equipment, timestamp=self.now - timedelta(minutes=minutes_ago), cpu_usage=cpu)
+
+    def snapshots(self):
+        return dict(LatestMetric.objects.values_list('equipment_id', 'cpu_usage'))
+
+    def test_backfill_never_regresses(self):
+        item = self.equipment[0]
+        NetworkMetric.objects.bulk_create([self.metric(item, 1, 20), self.metric(item, 5, 30)])
+        self.assertEqual(self.snapshots(), {item.pk: 20.0})
+        NetworkMetric.objects.upsert([self.metric(item, 10, 99)], backfill=True)
+        self.assertEqual(LatestMetric.objects.get().timestamp, self.now - timedelta(minutes=1))
+        # Correction de la même mesure: l'instantané suit
+        NetworkMetric.objects.upsert([self.metric(item, 1, 25)])
+        self.assertEqual(self.snapshots(), {item.pk: 25.0})
+
+    def test_maintained_by_every_write_path(self):
+        first, second, third, fourth = self.equipment
+        NetworkMetric.objects.bulk_create([self.metric(first, 1, 11)])
+        NetworkMetric.objects.upsert([self.metric(second, 1, 12)])
+        NetworkMetric.objects.create(equipment=third, cpu_usage=13)
+        body = f'{{"equipment": {fourth.pk}, "cpu_usage": 14}}\n'.encode()
+        response = self.client.generic('POST', '/api/metrics/ingest/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.snapshots(), {first.pk: 11.0, second.pk: 12.0, third.pk: 13.0, fourth.pk: 14.0})
+
+    def test_latest_endpoint(self):
+        other_site = Site.objects.create(name='Autre', address='-', company=Company.objects.create(name='Autre'))
+        foreign = Equipment.objects.create(name='Autre', type='switch', site=other_site)
+        NetworkMetric.objects.bulk_create([self.metric(item, 1, 10) for item in [*self.equipment, foreign]])
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/metrics/latest/')
+        self.assertEqual(
+            sorted(row['equipment'] for row in response.json()), sorted(item.pk for item in self.equipment)
+        )
+
+    def test_rebuild_from_history(self):
+        NetworkMetric.objects.bulk_create([
+            self.metric(item, minutes, cpu=i * 10 + minutes)
+            for i, item in enumerate(self.equipment[:3]) for minutes in (3, 1, 2)
+        ])
+        columns = ('equipment_id', 'timestamp', 'cpu_usage')
+        expected = list(LatestMetric.objects.order_by('equipment_id').values_list(*columns))
+        self.assertEqual([cpu for _, _, cpu in expected], [1.0, 11.0, 21.0])
+
+        # Instantané perdu, périmé ou sans historique
+        LatestMetric.objects.filter(equipment=self.equipment[0]).delete()
+        LatestMetric.objects.filter(equipment=self.equipment[1]).update(
+            cpu_usage=0, timestamp=self.now - timedelta(days=1)
+        )
+        LatestMetric.objects.create(equipment=self.equipment[3], timestamp=self.now)
+        out = io.StringIO()
+        call_command('rebuild_latest_metrics', batch_size=2, stdout=out)
+        self.assertIn('3 instantanés reconstruits, 1 supprimés', out.getvalue())
+        self.assertEqual(list(LatestMetric.objects.order_by('equipment_id').values_list(*columns)), expected)
+
+
+def legacy_summary(queryset):
+    """Ancien calcul du résumé, équipement par équipement en Python (référence des tests)"""
+    rows = []
+    for equipment_id in sorted(set(queryset.values_list('equipment_id', flat=True))):
+        metrics = list(queryset.filter(equipment_id=equipment_id).order_by('-timestamp'))
+        count = len(metrics)
+        pings = [metric.ping_response_time for metric in metrics if metric.ping_response_time is not None]
+        cpus = [metric.cpu_usage for metric in metrics if metric.cpu_usage is not None]
+        rows.append({
+            'equipment_id': equipment_id,
+            'equipment_name': metrics[0].equipment.name,
+            'site_name': metrics[0].equipment.site.name,
+            'latest_timestamp': metrics[0].timestamp,
+            'avg_ping': sum(pings) / len(pings) if pings else None,
+            'avg_cpu': sum(cpus) / len(cpus) if cpus else None,
+            'avg_memory_usage': sum(metric.memory_usage_percent or 0 for metric in metrics) / count,
+            'avg_disk_usage': sum(metric.disk_usage_percent or 0 for metric in metrics) / count,
+            'uptime_percentage': sum(metric.is_online for metric in metrics) / count * 100,
+            'total_measurements': count,
+        })
+    return rows
+
+
+class SummaryTests(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name='ACME')
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('acme', password='acme', company=company))
+        site = Site.objects.create(name='Site', address='-', company=company)
+        now = timezone.now()
+        samples = {
+            'Switch': [
+                dict(cpu_usage=10, ping_response_time=5, memory_total=1000, memory_used=250, disk_total=100, disk_used=50),
+                # Mémoire et disque inconnus ou nuls: comptent pour 0 % dans la moyenne
+                dict(cpu_usage=30, is_online=False, memory_total=None, memory_used=100, disk_total=0, disk_used=0),
+                dict(cpu_usage=None, ping_response_time=15, memory_total=1000, memory_used=None),
+            ],
+            'Caméra': [dict(is_online=False), dict(ping_response_time=2.5, disk_total=200, disk_used=150)],
+        }
+        for name, values in samples.items():
+            equipment = Equipment.objects.create(name=name, type='switch', site=site)
+            NetworkMetric.objects.bulk_create([
+                NetworkMetric(equipment=equipment, timestamp=now - timedelta(minutes=i + 1), **fields)
+                for i, fields in enumerate(values)
+            ])
+        # Hors période
+        NetworkMetric.objects.bulk_create([NetworkMetric(equipment=equipment, timestamp=now - timedelta(days=2))])
+
+    def test_matches_legacy_computation(self):
+        response = self.client.get('/api/metrics/summary/')
+        self.assertEqual(response.status_code, 200)
+        queryset = NetworkMetric.objects.filter(timestamp__gte=timezone.now() - timedelta(hours=24))
+        expected = MetricsSummarySerializer(legacy_summary(queryset), many=True).data
+        self.assertEqual(len(response.json()), 2)
+        for row, reference in zip(response.json(), expected):
+            for field, value in reference.items():
+                with self.subTest(equipment=row['equipment_name'], field=field):
+                    if isinstance(value, float):
+                        self.assertAlmostEqual(row[field], value)
+                    else:
+                        self.assertEqual(row[field], value)
+        for row, values in zip(expected, [(25 / 3, 50 / 3, 200 / 3), (0, 37.5, 50)]):
+            for field, value in zip(('avg_memory_usage', 'avg_disk_usage', 'uptime_percentage'), values):
+                self.assertAlmostEqual(row[field], value)
+
+    def test_invalid_hours(self):
+        for hours in ('abc', '0', '-3'):
+            with self.subTest(hours=hours):
+                self.assertEqual(self.client.get('/api/metrics/summary/', {'hours': hours}).status_code, 400)
+        self.assertEqual(len(self.client.get('/api/metrics/summary/', {'hours': 72}).json()), 2)
+
+
+class ScaleToolsTests(TestCase):
+    def test_seed_scale_row_counts(self):
+        out = io.StringIO()
+        options = dict(companies=2, sites=3, equipment=5, interval=3600, raw_hours=2, hourly_days=1,
+                       history_days=3, alerts=2, batch_size=4, stdout=out)
+        call_command('seed_scale', **options)
+        companies = Company.objects.filter(name__startswith='Scale ')
+        equipment = Equipment.objects.filter(company__in=companies)
+        self.assertEqual(
+            [companies.count(), User.objects.filter(username__startswith='scale-').count(),
+             ThresholdProfile.objects.filter(company__in=companies).count(),
+             Site.objects.filter(company__in=companies).count(), equipment.count()],
+            [2, 2, 2, 3, 5],
+        )
+        # Deux mesures brutes, 24 cumuls horaires, 3 journaliers et 2 alertes par équipement
+        self.assertEqual(NetworkMetric.objects.filter(equipment__in=equipment).count(), 10)
+        self.assertEqual(MetricRollupHour.objects.filter(equipment__in=equipment).count(), 120)
+        self.assertEqual(MetricRollupDay.objects.filter(equipment__in=equipment).count(), 15)
+        self.assertEqual(Alert.objects.filter(equipment__in=equipment).count(), 10)
+        self.assertEqual(LatestMetric.objects.filter(equipment__in=equipment).count(), 5)
+        self.assertIn('2 entreprises, 3 sites, 5 équipements, 10 mesures brutes, 135 cumuls, 10 alertes', out.getvalue())
+
+        with self.assertRaisesMessage(CommandError, 'existe déjà'):
+            call_command('seed_scale', **options)
+
+    def test_compare_tolerance(self):
+        baseline = {'summary': {'queries': 3, 'p50_ms': 10.0, 'p95_ms': 20.0}, 'latest': {'p50_ms': 1.0}}
+        within = {'summary': {'queries': 3, 'p50_ms': 12.0, 'p95_ms': 24.0}, 'latest': {'p50_ms': 1.1}}
+        self.assertEqual(compare(baseline, within, 0.25, 1), [])
+        # Au-delà de la tolérance relative mais sous l'écart absolu minimal: ignoré
+        self.assertEqual(compare(baseline, {'latest': {'p50_ms': 1.9}}, 0.25, 1), [])
+
+        regressed = {'summary': {'queries': 4, 'p50_ms': 13.0, 'p95_ms': 24.0}, 'new': {'p50_ms': 99.0}}
+        self.assertEqual(compare(baseline, regressed, 0.25, 1), [
+            'summary.queries: 3 -> 4 requêtes',
+            'summary.p50_ms: 10.0 -> 13.0 ms (+30%)',
+        ])
+        self.assertEqual(compare(baseline, regressed, 0.5, 1), ['summary.queries: 3 -> 4 requêtes'])
+
+
+class LoadTestTests(LiveServerTestCase):
+    def setUp(self):
+        cache.clear()
+        company = Company.objects.create(name='ACME')
+        User.objects.create_user('acme', password='acme', company=company)
+        site = Site.objects.create(name='Site', address='-', company=company)
+        equipment = Equipment.objects.bulk_create([
+            Equipment(name=f'Switch {i}', type='switch', site=site) for i in range(4)
+        ])
+        NetworkMetric.objects.bulk_create([NetworkMetric(equipment=item) for item in equipment])
+
+    def test_short_run(self):
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'loadtest', url=self.live_server_url, users=['acme'], password='acme', collectors=2, dashboards=2,
+                duration=1, batch_size=2, collector_interval=0.2, poll_interval=0.1, seed=1, json=path,
+                max_error_rate=0, stdout=out,
+            )
+            with open(path) as handle:
+                report = json.load(handle)
+
+        self.assertEqual(report['users'], {'acme': 4})
+        ingest = report['endpoints']['POST /api/metrics/ingest/']
+        self.assertGreater(ingest['requests'], 0)
+        self.assertGreater(ingest['rows_per_s'], 0)
+        self.assertGreater(NetworkMetric.objects.count(), 4)
+        self.assertIn('GET /api/metrics/latest/', report['endpoints'])
+        for stats in [*report['endpoints'].values(), report['total']]:
+            self.assertEqual(stats['errors'], 0)
+            self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+            self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+            self.assertLessEqual(stats['p99_ms'], stats['max_ms'])
+        self.assertIn('mesures acceptées/s', out.getvalue())
+
+
+class ThresholdHierarchyTests(TestCase):
+    def setUp(self):
+        threshold_cache.invalidate()
+        self.company = Company.objects.create(name='ACME')
+        self.user = User.objects.create_user('acme', password='acme', company=self.company)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.site = Site.objects.create(name='Site', address='-', company=self.company)
+        self.switch = Equipment.objects.create(name='Switch', type='switch', site=self.site)
+        self.camera = Equipment.objects.create(name='Caméra', type='camera', site=self.site)
+
+    def effective(self, equipment):
+        data = self.client.get('/api/thresholds/effective/', {'equipment': equipment.pk}).json()
+        thresholds = data[0]['thresholds']
+        return thresholds and {field: (item['value'], item['source']) for field, item in thresholds.items()}
+
+    def test_resolve_precedence(self):
+        profiles = {
+            ('company', None): dict.fromkeys(THRESHOLD_FIELDS, 1.0),
+            ('type', 'switch'): {**dict.fromkeys(THRESHOLD_FIELDS), 'cpu_warning_threshold': 2.0, 'ping_warning_threshold': 2.0},
+            ('site', 7): {**dict.fromkeys(THRESHOLD_FIELDS), 'cpu_warning_threshold': 3.0},
+        }
+        override = {**dict.fromkeys(THRESHOLD_FIELDS), 'cpu_critical_threshold': 4.0}
+        resolved = resolve(override, 7, 'switch', profiles)
+        self.assertEqual(resolved['cpu_critical_threshold'], (4.0, 'equipment'))
+        self.assertEqual(resolved['cpu_warning_threshold'], (3.0, 'site'))
+        self.assertEqual(resolved['ping_warning_threshold'], (2.0, 'type'))
+        self.assertEqual(resolved['disk_warning_threshold'], (1.0, 'company'))
+
+        del profiles[('company', None)]
+        self.assertEqual(resolve(None, 7, 'switch', profiles)['disk_warning_threshold'], (80.0, 'default'))
+        # Aucun niveau applicable: équipement non surveillé
+        self.assertIsNone(resolve(None, 8, 'camera', profiles))
+
+    def test_effective_follows_profile_changes(self):
+        self.assertIsNone(self.effective(self.switch))
+
+        ThresholdProfile.objects.create(company=self.company, cpu_warning_threshold=60)
+        ThresholdProfile.objects.create(company=self.company, equipment_type='switch', cpu_warning_threshold=65)
+        self.assertEqual(self.effective(self.switch)['cpu_warning_threshold'], (65.0, 'type'))
+        self.assertEqual(self.effective(self.camera)['cpu_warning_threshold'], (60.0, 'company'))
+        self.assertEqual(self.effective(self.camera)['cpu_critical_threshold'], (95.0, 'default'))
+
+        site_profile = ThresholdProfile.objects.create(company=self.company, site=self.site, cpu_warning_threshold=70)
+        AlertThreshold.objects.create(equipment=self.switch, cpu_warning_threshold=75)
+        self.assertEqual(self.effective(self.switch)['cpu_warning_threshold'], (75.0, 'equipment'))
+        self.assertEqual(self.effective(self.camera)['cpu_warning_threshold'], (70.0, 'site'))
+
+        site_profile.delete()
+        self.assertEqual(self.effective(self.camera)['cpu_warning_threshold'], (60.0, 'company'))
+
+    def test_bulk_update_writes_only_given_fields(self):
+        ThresholdProfile.objects.create(company=self.company, ping_warning_threshold=150)
+        AlertThreshold.objects.create(equipment=self.switch, cpu_warning_threshold=75)
+        other_site = Site.objects.create(name='Autre', address='-', company=Company.objects.create(name='Autre'))
+        foreign = Equipment.objects.create(name='Autre', type='switch', site=other_site)
+
+        response = self.client.post('/api/thresholds/bulk_update/', {
+            'equipment_ids': [self.switch.pk, self.camera.pk, foreign.pk],
+            'thresholds': {'cpu_critical_threshold': 99},
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['ignored'], [foreign.pk])
+
+        overrides = {row['equipment_id']: row for row in AlertThreshold.objects.values()}
+        self.assertEqual(set(overrides), {self.switch.pk, self.camera.pk})
+        self.assertEqual(overrides[self.switch.pk]['cpu_warning_threshold'], 75.0)
+        self.assertEqual(overrides[self.camera.pk]['cpu_warning_threshold'], None)
+        for row in overrides.values():
+            self.assertEqual(row['cpu_critical_threshold'], 99.0)
+            self.assertEqual([row[field] for field in THRESHOLD_DEFAULTS if field not in (
+                'cpu_warning_threshold', 'cpu_critical_threshold')], [None] * 8)
+
+        effective = self.effective(self.camera)
+        self.assertEqual(effective['cpu_critical_threshold'], (99.0, 'equipment'))
+        self.assertEqual(effective['ping_warning_threshold'], (150.0, 'company'))
+
+    def test_bulk_update_validates_ids_before_writing(self):
+        for equipment_ids in ([self.switch.pk, None], str(self.switch.pk), [self.switch.pk, 'x']):
+            with self.subTest(equipment_ids=equipment_ids):
+                response = self.client.post('/api/thresholds/bulk_update/', {
+                    'equipment_ids': equipment_ids, 'thresholds': {'cpu_critical_threshold': 99},
+                }, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(AlertThreshold.objects.exists())
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class ProberTests(TestCase):
+    def probe(self, target, ports, **kwargs):
+        prober = Prober(ports=ports, timeout=kwargs.pop('timeout', 1.0), **kwargs)
+
+        async def run():
+            await prober.probe(target)
+            return prober.buffer[0]
+
+        return asyncio.run(run())
+
+    def test_local_listener(self):
+        async def serve():
+            server = await asyncio.start_server(lambda reader, writer: writer.close(), '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                target = Target(1, '127.0.0.1', 30)
+                result = await tcp_probe(target, [port], attempts=3, timeout=1.0)
+                return port, target, result
+
+        port, target, result = asyncio.run(serve())
+        self.assertEqual((result.attempts, len(result.latencies), result.packet_loss), (3, 3, 0.0))
+        self.assertLess(result.latency, 1000)
+        # Port qui a répondu retenu pour les sondes suivantes
+        self.assertEqual(target.port, port)
+
+    def test_closed_port_is_an_answer(self):
+        # Un refus de connexion prouve que l'hôte répond
+        metric = self.probe(Target(1, '127.0.0.1', 30), [free_port()])
+        self.assertTrue(metric.is_online)
+        self.assertEqual(metric.packet_loss, 0.0)
+        self.assertIsNotNone(metric.ping_response_time)
+
+    def test_unanswered_probe(self):
+        # File d'attente d'acceptation pleine: le SYN suivant reste sans réponse
+        with socket.socket() as listener, socket.socket() as client:
+            listener.bind(('127.0.0.1', 0))
+            listener.listen(0)
+            client.connect(listener.getsockname())
+            metric = self.probe(Target(1, '127.0.0.1', 30), [listener.getsockname()[1]], timeout=0.2)
+        self.assertFalse(metric.is_online)
+        self.assertEqual((metric.packet_loss, metric.ping_response_time), (100.0, None))
+        self.assertEqual(metric.connection_quality, 'offline')
+        self.assertEqual(ProbeResult(latencies=[10.0], attempts=4).packet_loss, 75.0)
+
+    def test_interval_clamped(self):
+        site = Site.objects.create(name='Site', address='-', company=Company.objects.create(name='ACME'))
+        Equipment.objects.create(name='Switch', type='switch', site=site, ip_address='10.0.0.1')
+        site.probe_interval = 0
+        with self.assertRaises(ValidationError):
+            site.full_clean()
+        Site.objects.update(probe_interval=0)
+        self.assertEqual(list(load_targets().values()), [('10.0.0.1', 1)])
+
+    def test_address_change_keeps_one_schedule(self):
+        prober = Prober()
+        rows = {1: ('10.0.0.1', 30)}
+        with mock.patch('metrics.prober.load_targets', side_effect=lambda company: dict(rows)):
+            prober.schedule(asyncio.run(prober.load()), 0)
+            rows[1] = ('10.0.0.2', 30)
+            prober.schedule(asyncio.run(prober.load()), 0)
+
+        target = prober.pop_due(30)
+        self.assertEqual(target.host, '10.0.0.2')
+        # L'entrée de l'ancienne adresse est écartée au lieu de sonder l'équipement deux fois
+        self.assertIsNone(prober.pop_due(30))
+        self.assertEqual(len(prober.queue), 1)
+
+
+class ThresholdEvaluationTests(TestCase):
+    """Profil d'entreprise par défaut: CPU 80 % (avertissement) / 95 % (critique)"""
+
+    def setUp(self):
+        threshold_cache.invalidate()
+        open_alert_cache.invalidate()
+        company = Company.objects.create(name='ACME')
+        ThresholdProfile.objects.create(company=company)
+        site = Site.objects.create(name='Site', address='-', company=company)
+        self.equipment = [
+            Equipment.objects.create(name=f'Switch {i}', type='switch', site=site) for i in range(3)
+        ]
+        self.start = timezone.now() - timedelta(hours=1)
+        self.step = 0
+
+    def ingest(self, *values, equipment=None):
+        """Une mesure CPU par valeur, à une minute d'intervalle, pour chaque équipement"""
+        metrics = []
+        for value in values:
+            self.step += 1
+            for item in equipment or self.equipment[:1]:
+                metrics.append(NetworkMetric(
+                    equipment=item, timestamp=self.start + timedelta(minutes=self.step), cpu_usage=value
+                ))
+        NetworkMetric.objects.upsert(metrics)
+
+    def alerts(self):
+        return list(Alert.objects.order_by('id').values_list('type', 'status', 'occurrences'))
+
+    def test_escalations_batched(self):
+        self.ingest(85, equipment=self.equipment)
+        self.assertEqual(self.alerts(), [('warning', 'active', 1)] * 3)
+
+        metrics = [
+            NetworkMetric(equipment=item, timestamp=self.start + timedelta(minutes=5), cpu_usage=96 + i)
+            for i, item in enumerate(self.equipment)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            NetworkMetric.objects.upsert(metrics)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "alerts_alert"')]
+        # Incrément des occurrences puis une seule aggravation pour les trois alertes
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(self.alerts(), [('error', 'active', 2)] * 3)
+        self.assertEqual(
+            sorted(Alert.objects.values_list('message', flat=True)),
+            [f'Utilisation CPU: {value:.1f} % (seuil critique 95 %)' for value in (96, 97, 98)],
+        )
+
+    def test_hysteresis(self):
+        self.ingest(85)
+        # Sous le seuil mais au-dessus de 72 % (80 % - 10 %): l'alerte reste ouverte
+        self.ingest(75, 79)
+        self.assertEqual(self.alerts(), [('warning', 'active', 1)])
+        # Nouveau dépassement: la même alerte est incrémentée
+        self.ingest(82)
+        self.assertEqual(self.alerts(), [('warning', 'active', 2)])
+        self.assertEqual(Alert.objects.get().last_seen_at, self.start + timedelta(minutes=4))
+
+        self.ingest(71)
+        self.assertEqual(self.alerts(), [('warning', 'resolved', 2)])
+        self.ingest(85)
+        self.assertEqual(self.alerts(), [('warning', 'resolved', 2), ('warning', 'active', 1)])
+
+    def test_no_deescalation(self):
+        self.ingest(96)
+        self.ingest(85)
+        alert = Alert.objects.get()
+        self.assertEqual(
+            (alert.type, alert.status, alert.occurrences, alert.title), ('error', 'active', 2, 'Utilisation CPU critique')
+        )
+        self.ingest(50)
+        self.assertEqual(self.alerts(), [('error', 'resolved', 2)])
+
+    def test_escalation_inside_batch(self):
+        # Un dépassement refermé dans le même lot est enregistré déjà résolu, au niveau le plus haut
+        self.ingest(85, 97, 60)
+        self.assertEqual(self.alerts(), [('error', 'resolved', 2)])
+        self.ingest(90, 91)
+        self.assertEqual(self.alerts(), [('error', 'resolved', 2), ('warning', 'active', 2)])
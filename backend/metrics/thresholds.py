@@ -0,0 +1,420 @@
+"""
+Évaluation des seuils d'alerte (AlertThreshold) sur chaque lot de mesures ingéré.
+
+Seuils hiérarchiques: chaque valeur est prise, dans cet ordre, dans la
+surcharge de l'équipement (AlertThreshold), le profil de son site, celui de son
+type puis celui de son entreprise (ThresholdProfile), à défaut dans
+``THRESHOLD_DEFAULTS``. Un équipement sans surcharge ni profil applicable n'est
+pas surveillé. Les profils sont gardés en mémoire par entreprise et les seuils
+effectifs par équipement: un profil d'entreprise couvre tout le parc sans une
+ligne par équipement. Les entrées sont invalidées à l'enregistrement ou à la
+suppression d'une surcharge, d'un profil ou d'un équipement.
+
+Un lot est évalué par équipement et par règle en un seul passage chronologique;
+les écritures d'alertes sont groupées.
+
+Hystérésis: une alerte ouverte ne redescend pas de sévérité et n'est résolue
+que lorsque la valeur repasse sous le seuil d'avertissement diminué de
+``HYSTERESIS`` (10 %), pour qu'une valeur oscillant autour du seuil ne crée
+pas une alerte par mesure.
+
+Déduplication: au plus une alerte ouverte par (équipement, règle, sévérité),
+garanti par une contrainte unique partielle. Un dépassement répété incrémente
+``occurrences`` et ``last_seen_at`` de l'alerte ouverte, retrouvée via un cache
+en mémoire du processus.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from vigileos.cache import bump_generation
+from .models import ThresholdProfile, THRESHOLD_DEFAULTS
+
+HYSTERESIS = 0.1
+
+# Niveau de sévérité -> type d'alerte
+WARNING, CRITICAL = 1, 2
+ALERT_TYPES = {WARNING: 'warning', CRITICAL: 'error'}
+
+OPEN_STATUSES = Alert.OPEN_STATUSES
+LEVELS = {'warning': WARNING, 'error': CRITICAL}
+
+# règle -> (valeur lue sur la mesure, champs avertissement/critique, libellé, unité)
+RULES = {
+    'ping': ('ping_response_time', 'ping_warning_threshold', 'ping_critical_threshold', 'Temps de réponse ping', 'ms'),
+    'packet_loss': ('packet_loss', 'packet_loss_warning', 'packet_loss_critical', 'Perte de paquets', '%'),
+    'cpu': ('cpu_usage', 'cpu_warning_threshold', 'cpu_critical_threshold', 'Utilisation CPU', '%'),
+    'memory': ('memory_usage_percent', 'memory_warning_threshold', 'memory_critical_threshold', 'Utilisation mémoire', '%'),
+    'disk': ('disk_usage_percent', 'disk_warning_threshold', 'disk_critical_threshold', 'Utilisation disque', '%'),
+}
+
+THRESHOLD_FIELDS = [field for _, warning, critical, _, _ in RULES.values() for field in (warning, critical)]
+
+
+# Niveaux de la hiérarchie, du plus spécifique au plus général
+SCOPES = ('equipment', 'site', 'type', 'company')
+
+
+def load_profiles(company_ids):
+    """{entreprise: {(niveau, site ou type): {champ: valeur}}} en une requête"""
+    profiles = {company_id: {} for company_id in company_ids}
+    rows = ThresholdProfile.objects.filter(company_id__in=company_ids).values(
+        'company_id', 'site_id', 'equipment_type', *THRESHOLD_FIELDS
+    )
+    for row in rows:
+        if row['site_id'] is not None:
+            key = ('site', row['site_id'])
+        elif row['equipment_type']:
+            key = ('type', row['equipment_type'])
+        else:
+            key = ('company', None)
+        profiles[row['company_id']][key] = row
+    return profiles
+
+
+def resolve(override, site_id, equipment_type, profiles):
+    """
+    {champ: (valeur, niveau d'origine)} pour un équipement, ou None si aucun
+    niveau ne le couvre. ``override`` est la surcharge de l'équipement (ou None).
+    """
+    layers = [
+        (scope, values) for scope, values in (
+            ('equipment', override),
+            ('site', profiles.get(('site', site_id))),
+            ('type', profiles.get(('type', equipment_type))),
+            ('company', profiles.get(('company', None))),
+        )
+        if values is not None
+    ]
+    if not layers:
+        return None
+    resolved = {}
+    for field in THRESHOLD_FIELDS:
+        resolved[field] = next(
+            ((values[field], scope) for scope, values in layers if values[field] is not None),
+            (THRESHOLD_DEFAULTS[field], 'default'),
+        )
+    return resolved
+
+
+class ThresholdCache:
+    """
+    Seuils effectifs par équipement en mémoire du processus: {règle: (avertissement, critique)},
+    ou None pour un équipement non surveillé. Les profils sont gardés par
+    entreprise. ``ttl`` borne la durée de vie d'une entrée modifiée depuis un
+    autre processus.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        # équipement -> (expiration, entreprise, seuils)
+        self._entries = {}
+        # entreprise -> (expiration, profils)
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def profiles(self, company_ids):
+        now = time.monotonic()
+        with self._lock:
+            found = {
+                company_id: entry[1]
+                for company_id in company_ids
+                if (entry := self._profiles.get(company_id)) and entry[0] > now
+            }
+        missing = set(company_ids) - found.keys()
+        if missing:
+            loaded = load_profiles(missing)
+            with self._lock:
+                for company_id, profiles in loaded.items():
+                    self._profiles[company_id] = (now + self.ttl, profiles)
+            found.update(loaded)
+        return found
+
+    def effective(self, equipment_ids):
+        """
+        {équipement: (entreprise, {champ: (valeur, niveau)} ou None)}, lus en base
+        (surcharges jointes aux équipements) avec les profils en cache
+        """
+        rows = list(Equipment.objects.filter(id__in=equipment_ids).values(
+            'id', 'company_id', 'site_id', 'type', 'thresholds__id',
+            *[f'thresholds__{field}' for field in THRESHOLD_FIELDS],
+        ))
+        profiles = self.profiles({row['company_id'] for row in rows})
+        result = {}
+        for row in rows:
+            override = None
+            if row['thresholds__id'] is not None:
+                override = {field: row[f'thresholds__{field}'] for field in THRESHOLD_FIELDS}
+            result[row['id']] = (
+                row['company_id'], resolve(override, row['site_id'], row['type'], profiles[row['company_id']])
+            )
+        return result
+
+    def get_many(self, equipment_ids):
+        now = time.monotonic()
+        with self._lock:
+            found = {
+                equipment_id: entry[2]
+                for equipment_id in equipment_ids
+                if (entry := self._entries.get(equipment_id)) and entry[0] > now
+            }
+        missing = set(equipment_ids) - found.keys()
+        if missing:
+            loaded = dict.fromkeys(missing)
+            companies = dict.fromkeys(missing)
+            for equipment_id, (company_id, resolved) in self.effective(missing).items():
+                companies[equipment_id] = company_id
+                if resolved is not None:
+                    loaded[equipment_id] = {
+                        rule: (resolved[warning][0], resolved[critical][0])
+                        for rule, (_, warning, critical, _, _) in RULES.items()
+                    }
+            with self._lock:
+                for equipment_id, thresholds in loaded.items():
+                    self._entries[equipment_id] = (now + self.ttl, companies[equipment_id], thresholds)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, equipment_id=None):
+        with self._lock:
+            if equipment_id is None:
+                self._entries.clear()
+                self._profiles.clear()
+            else:
+                self._entries.pop(equipment_id, None)
+
+    def invalidate_many(self, equipment_ids):
+        with self._lock:
+            for equipment_id in equipment_ids:
+                self._entries.pop(equipment_id, None)
+
+    def invalidate_company(self, company_id):
+        """Après modification d'un profil: profils et seuils de tout le parc de l'entreprise"""
+        with self._lock:
+            self._profiles.pop(company_id, None)
+            stale = [key for key, entry in self._entries.items() if entry[1] == company_id]
+            for key in stale:
+                del self._entries[key]
+
+
+class OpenAlertCache:
+    """
+    Alerte ouverte par (équipement, règle) en mémoire du processus: (id, niveau),
+    ou None quand il n'y en a pas. Les écritures sur les alertes sont filtrées sur
+    le statut ouvert, une entrée périmée ne peut donc pas rouvrir une alerte résolue.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            found = {
+                key: entry[1]
+                for key in keys
+                if (entry := self._entries.get(key)) and entry[0] > now
+            }
+        missing = set(keys) - found.keys()
+        if missing:
+            loaded = dict.fromkeys(missing)
+            rows = Alert.objects.filter(
+                equipment_id__in={equipment_id for equipment_id, _ in missing},
+                rule__in={rule for _, rule in missing},
+                status__in=OPEN_STATUSES,
+            ).order_by('created_at').values_list('equipment_id', 'rule', 'id', 'type')
+            for equipment_id, rule, alert_id, alert_type in rows:
+                if (equipment_id, rule) in loaded:
+                    loaded[equipment_id, rule] = (alert_id, LEVELS.get(alert_type, WARNING))
+            self.update(loaded, now)
+            found.update(loaded)
+        return found
+
+    def update(self, entries, now=None):
+        expires = (now or time.monotonic()) + self.ttl
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[key] = (expires, value)
+
+    def invalidate(self, keys=None):
+        with self._lock:
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+
+
+threshold_cache = ThresholdCache()
+open_alert_cache = OpenAlertCache()
+
+
+def severity(value, warning, critical):
+    if value >= critical:
+        return CRITICAL
+    if value >= warning:
+        return WARNING
+    return 0
+
+
+def next_state(state, samples, warning, critical):
+    """
+    Parcourt une suite chronologique de (horodatage, valeur) depuis le niveau ``state``.
+    Renvoie (niveau le plus haut atteint, niveau final, nombre de dépassements,
+    horodatage du dernier dépassement).
+    """
+    clear_below = warning * (1 - HYSTERESIS)
+    peak, hits, last_seen = state, 0, None
+    for timestamp, value in samples:
+        level = severity(value, warning, critical)
+        if level:
+            hits += 1
+            last_seen = timestamp
+        if level > state:
+            state = level
+            peak = max(peak, level)
+        elif state and value < clear_below:
+            state = 0
+    return peak, state, hits, last_seen
+
+
+def _describe(rule, level, value, thresholds):
+    _, _, _, label, unit = RULES[rule]
+    if level == CRITICAL:
+        return f"{label} critique", f"{label}: {value:.1f} {unit} (seuil critique {thresholds[1]:g} {unit})"
+    return f"{label} élevé(e)", f"{label}: {value:.1f} {unit} (seuil d'avertissement {thresholds[0]:g} {unit})"
+
+
+def _bump(bumps, now):
+    """Incrémente occurrences / last_seen_at de plusieurs alertes ouvertes en une requête"""
+    # Une branche CASE par valeur distincte plutôt que par alerte
+    by_hits, by_last_seen = defaultdict(list), defaultdict(list)
+    for pk, (hits, last_seen) in bumps.items():
+        by_hits[hits].append(pk)
+        by_last_seen[last_seen].append(pk)
+    updated = Alert.objects.filter(pk__in=bumps, status__in=OPEN_STATUSES).update(
+        occurrences=F('occurrences') + Case(
+            *[When(pk__in=pks, then=Value(hits)) for hits, pks in by_hits.items()],
+            output_field=IntegerField(),
+        ),
+        last_seen_at=Case(*[When(pk__in=pks, then=Value(last_seen)) for last_seen, pks in by_last_seen.items()]),
+        updated_at=now,
+    )
+    return updated == len(bumps)
+
+
+def _escalate(escalated, now):
+    """
+    Aggrave des alertes ouvertes, une requête par (sévérité, statut) cible.
+    Renvoie les clés dont le cache doit être relu.
+    """
+    groups = defaultdict(dict)
+    for key, (alert_id, values) in escalated.items():
+        groups[values['type'], values['status']][alert_id] = (key, values)
+    stale = []
+    for (alert_type, alert_status), group in groups.items():
+        titles = defaultdict(list)
+        for pk, (_, values) in group.items():
+            titles[values['title']].append(pk)
+        # L'aggravation change la sévérité: la clé de déduplication suit la ligne
+        updated = Alert.objects.filter(pk__in=group, status__in=OPEN_STATUSES).update(
+            type=alert_type,
+            status=alert_status,
+            resolved_at=None if alert_status == 'active' else now,
+            title=Case(*[When(pk__in=pks, then=Value(title)) for title, pks in titles.items()]),
+            message=Case(*[When(pk=pk, then=Value(values['message'])) for pk, (_, values) in group.items()]),
+            updated_at=now,
+        )
+        if updated == len(group):
+            open_alert_cache.update({
+                key: (pk, LEVELS[alert_type]) if alert_status == 'active' else None
+                for pk, (key, _) in group.items()
+            })
+        else:
+            # Une alerte du cache a été fermée ailleurs: relecture au prochain lot
+            stale.extend(key for key, _ in group.values())
+    return stale
+
+
+def evaluate(metrics):
+    """
+    Évalue un lot de NetworkMetric et crée, aggrave ou résout les alertes.
+    Renvoie le nombre d'alertes (créées, aggravées, résolues).
+    """
+    configured = {
+        equipment_id: thresholds
+        for equipment_id, thresholds in threshold_cache.get_many({metric.equipment_id for metric in metrics}).items()
+        if thresholds
+    }
+    if not configured:
+        return 0, 0, 0
+
+    # Colonnes (horodatage, valeur) par (équipement, règle), dans l'ordre chronologique
+    columns = defaultdict(list)
+    for metric in sorted(metrics, key=lambda metric: metric.timestamp):
+        thresholds = configured.get(metric.equipment_id)
+        if thresholds is None:
+            continue
+        for rule, (attribute, *_) in RULES.items():
+            value = getattr(metric, attribute)
+            if value is not None:
+                columns[metric.equipment_id, rule].append((metric.timestamp, value))
+    if not columns:
+        return 0, 0, 0
+
+    companies = {metric.equipment_id: metric.company_id for metric in metrics}
+    open_alerts = open_alert_cache.get_many(columns.keys())
+    now = timezone.now()
+    created, escalated, resolved, bumps = [], {}, {}, {}
+    for key, samples in columns.items():
+        equipment_id, rule = key
+        thresholds = configured[equipment_id][rule]
+        alert_id, current = open_alerts[key] or (None, 0)
+        peak, state, hits, last_seen = next_state(current, samples, *thresholds)
+
+        if peak > current:
+            # Un dépassement refermé dans le même lot est enregistré déjà résolu
+            title, message = _describe(rule, peak, max(value for _, value in samples), thresholds)
+            values = {
+                'type': ALERT_TYPES[peak], 'title': title, 'message': message,
+                'status': 'active' if state else 'resolved', 'resolved_at': None if state else now,
+            }
+            if alert_id is None:
+                created.append((key, Alert(
+                    equipment_id=equipment_id, company_id=companies[equipment_id], rule=rule, occurrences=hits, last_seen_at=last_seen, **values,
+                )))
+                continue
+            escalated[key] = (alert_id, values)
+        elif current and not state:
+            resolved[key] = alert_id
+        if alert_id is not None and hits:
+            bumps[alert_id] = (hits, last_seen)
+
+    stale = []
+    if bumps and not _bump(bumps, now):
+        # Une alerte du cache a été fermée ailleurs: relecture au prochain lot
+        stale.extend(key for key, entry in open_alerts.items() if entry and entry[0] in bumps)
+    if escalated:
+        stale.extend(_escalate(escalated, now))
+    if resolved:
+        Alert.objects.filter(pk__in=resolved.values(), status__in=OPEN_STATUSES).update(
+            status='resolved', resolved_at=now, updated_at=now
+        )
+        open_alert_cache.update(dict.fromkeys(resolved))
+    if created:
+        # En cas de course avec un autre processus, la contrainte unique partielle écarte le doublon
+        Alert.objects.bulk_create([alert for _, alert in created], ignore_conflicts=True)
+        stale.extend(key for key, alert in created if alert.status == 'active')
+    if stale:
+        open_alert_cache.invalidate(stale)
+    if created or escalated or resolved or bumps:
+        # Les compteurs d'occurrences figurent aussi dans les réponses d'API en cache
+        bump_generation({companies[equipment_id] for equipment_id, _ in columns})
+    return len(created), len(escalated), len(resolved)
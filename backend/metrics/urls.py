@@ -1,8 +1,9 @@
 from rest_framework.routers import DefaultRouter
-from .views import NetworkMetricViewSet, AlertThresholdViewSet
+from .views import NetworkMetricViewSet, AlertThresholdViewSet, ThresholdProfileViewSet
 
 router = DefaultRouter()
 router.register(r'metrics', NetworkMetricViewSet, basename='metric')
 router.register(r'thresholds', AlertThresholdViewSet, basename='threshold')
+router.register(r'threshold-profiles', ThresholdProfileViewSet, basename='threshold-profile')
 
 urlpatterns = router.urls
\ No newline at end of file
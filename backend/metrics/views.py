@@ -1,19 +1,37 @@
-from rest_framework import viewsets, status
+import csv
+
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg, Count, Q
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
-from .models import NetworkMetric, AlertThreshold
+from equipment.models import Equipment
+from vigileos.export import EXPORT_FORMATS, export_response
+from vigileos.pagination import KeysetPagination
+from .models import NetworkMetric, LatestMetric, AlertThreshold, ThresholdProfile, MEASUREMENT_FIELDS, ROLLUP_FIELDS
+from .aggregation import summarize_by_equipment
+from .downsampling import lttb_indices
+from .thresholds import THRESHOLD_FIELDS, threshold_cache
+from .rollups import SERIES_FIELDS, parse_period, parse_range, rollup_rows, select_resolution, series_columns
+from .ingest import (
+    BodyTooLarge, CSV_CONTENT_TYPES, NDJSON_CONTENT_TYPES, MetricIngestor, iter_csv, iter_ndjson, max_body_bytes,
+    open_body
+)
 from .serializers import (
-    NetworkMetricSerializer, NetworkMetricCreateSerializer,
-    AlertThresholdSerializer, MetricsSummarySerializer
+    NetworkMetricSerializer, NetworkMetricCreateSerializer, LatestMetricSerializer,
+    AlertThresholdSerializer, ThresholdProfileSerializer, ThresholdValuesSerializer, MetricsSummarySerializer
 )
 
+METRIC_EXPORT_COLUMNS = [
+    ('id', 'id'), ('equipment', 'equipment_id'), ('timestamp', 'timestamp'),
+] + [(field, field) for field in MEASUREMENT_FIELDS]
+
 class NetworkMetricViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['equipment', 'is_online', 'connection_quality']
     ordering = ['-timestamp']
@@ -21,7 +39,7 @@ class NetworkMetricViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # Filtrer les métriques par l'entreprise de l'utilisateur
         return NetworkMetric.objects.filter(
-            equipment__site__company=self.request.user.company
+            company_id=self.request.user.company_id
         ).select_related('equipment', 'equipment__site')
     
     def get_serializer_class(self):
@@ -35,56 +53,17 @@ class NetworkMetricViewSet(viewsets.ModelViewSet):
         queryset = self.get_queryset()
         
         # Filtrer par période (défaut: 24h)
-        hours = int(request.query_params.get('hours', 24))
+        try:
+            hours = int(request.query_params.get('hours', 24))
+        except ValueError:
+            return Response({'error': 'hours: entier attendu'}, status=status.HTTP_400_BAD_REQUEST)
+        if hours < 1:
+            return Response({'error': 'hours: entier positif attendu'}, status=status.HTTP_400_BAD_REQUEST)
         start_time = timezone.now() - timedelta(hours=hours)
         queryset = queryset.filter(timestamp__gte=start_time)
         
-        # Agrégation par équipement
-        summary_data = []
-        equipment_ids = queryset.values_list('equipment_id', flat=True).distinct()
-        
-        for equipment_id in equipment_ids:
-            equipment_metrics = queryset.filter(equipment_id=equipment_id)
-            equipment = equipment_metrics.first().equipment
-            
-            # Calculs d'agrégation
-            aggregates = equipment_metrics.aggregate(
-                avg_ping=Avg('ping_response_time'),
-                avg_cpu=Avg('cpu_usage'),
-                total_measurements=Count('id')
-            )
-            
-            # Calcul du pourcentage d'uptime
-            online_count = equipment_metrics.filter(is_online=True).count()
-            uptime_percentage = (online_count / aggregates['total_measurements'] * 100) if aggregates['total_measurements'] > 0 else 0
-            
-            # Calcul des moyennes d'utilisation mémoire et disque
-            memory_usage_avg = 0
-            disk_usage_avg = 0
-            
-            for metric in equipment_metrics:
-                if metric.memory_usage_percent:
-                    memory_usage_avg += metric.memory_usage_percent
-                if metric.disk_usage_percent:
-                    disk_usage_avg += metric.disk_usage_percent
-            
-            count = aggregates['total_measurements']
-            if count > 0:
-                memory_usage_avg /= count
-                disk_usage_avg /= count
-            
-            summary_data.append({
-                'equipment_id': equipment_id,
-                'equipment_name': equipment.name,
-                'site_name': equipment.site.name,
-                'latest_timestamp': equipment_metrics.first().timestamp,
-                'avg_ping': aggregates['avg_ping'],
-                'avg_cpu': aggregates['avg_cpu'],
-                'avg_memory_usage': memory_usage_avg,
-                'avg_disk_usage': disk_usage_avg,
-                'uptime_percentage': uptime_percentage,
-                'total_measurements': count
-            })
+        # Agrégation par équipement en une seule requête GROUP BY
+        summary_data = summarize_by_equipment(queryset)
         
         serializer = MetricsSummarySerializer(summary_data, many=True)
         return Response(serializer.data)
@@ -92,22 +71,122 @@ class NetworkMetricViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def latest(self, request):
         """Dernières métriques pour tous les équipements"""
-        # Récupérer la dernière métrique pour chaque équipement
-        latest_metrics = []
-        equipment_ids = self.get_queryset().values_list('equipment_id', flat=True).distinct()
+        # Lecture directe de l'instantané maintenu à l'ingestion
+        latest_metrics = LatestMetric.objects.filter(
+            equipment__company_id=request.user.company_id
+        ).select_related('equipment', 'equipment__site').order_by('equipment_id')
         
-        for equipment_id in equipment_ids:
-            latest_metric = self.get_queryset().filter(equipment_id=equipment_id).first()
-            if latest_metric:
-                latest_metrics.append(latest_metric)
-        
-        serializer = self.get_serializer(latest_metrics, many=True)
+        serializer = LatestMetricSerializer(latest_metrics, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def rollups(self, request):
+        """Cumuls par intervalle, lus dans la résolution la plus grossière adaptée à la plage"""
+        try:
+            start, end, points = parse_range(request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        equipment_ids = self.company_equipment_ids(request.query_params.getlist('equipment'))
+        resolution = select_resolution(start, end, points)
+        rows = rollup_rows(equipment_ids, start, end, resolution)
+        
+        results = []
+        for row in rows:
+            item = {
+                'equipment': row['equipment_id'],
+                'bucket': row['bucket'],
+                'sample_count': row['sample_count'],
+                'uptime_percentage': row['online_count'] * 100 / row['sample_count'],
+            }
+            for field in ROLLUP_FIELDS:
+                count = row[f'{field}_count']
+                item[field] = {
+                    'min': row[f'{field}_min'],
+                    'max': row[f'{field}_max'],
+                    'avg': row[f'{field}_sum'] / count if count else None,
+                }
+            results.append(item)
+        
+        return Response({'resolution': resolution, 'from': start, 'to': end, 'results': results})
+    
+    @action(detail=False, methods=['get'])
+    def series(self, request):
+        """Série compacte en colonnes pour graphiques, agrégée en base et sous-échantillonnée (LTTB)"""
+        params = request.query_params
+        try:
+            start, end, points = parse_range(params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        equipment_id = params.get('equipment', '')
+        if not equipment_id.isdigit():
+            return Response({'error': 'equipment est requis'}, status=status.HTTP_400_BAD_REQUEST)
+        if not self.company_equipment_ids([equipment_id]):
+            return Response({'error': 'Équipement introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        
+        fields = [field for field in params.get('fields', 'ping_response_time').split(',') if field]
+        unknown = [field for field in fields if field not in SERIES_FIELDS]
+        if unknown or not fields:
+            return Response(
+                {'error': f"fields: valeurs possibles {', '.join(SERIES_FIELDS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        resolution = select_resolution(start, end, points)
+        timestamps, columns = series_columns(int(equipment_id), start, end, resolution, fields)
+        epochs = [int(timestamp.timestamp() * 1000) for timestamp in timestamps]
+        
+        # Réduction au nombre de points demandé, guidée par le premier champ
+        if params.get('downsample', 'lttb') == 'lttb' and len(epochs) > points:
+            indices = lttb_indices(epochs, columns[fields[0]], points)
+            epochs = [epochs[i] for i in indices]
+            columns = {field: [values[i] for i in indices] for field, values in columns.items()}
+        
+        return Response({
+            'equipment': int(equipment_id),
+            'resolution': resolution,
+            'from': start,
+            'to': end,
+            'timestamps': epochs,
+            **columns,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Export en flux des métriques (?output=csv|ndjson&gzip=1&from=&to=)"""
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"output: valeurs possibles {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start, end = parse_period(request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            timestamp__gte=start, timestamp__lt=end
+        ).order_by('timestamp', 'id')
+        return export_response(
+            queryset, METRIC_EXPORT_COLUMNS, output,
+            gzip=request.query_params.get('gzip') in ('1', 'true'), filename='metrics'
+        )
+    
+    def company_equipment_ids(self, requested_ids):
+        """Équipements de l'entreprise, éventuellement restreints aux identifiants demandés"""
+        equipment = Equipment.objects.filter(company_id=self.request.user.company_id)
+        if requested_ids:
+            equipment = equipment.filter(id__in=[value for value in requested_ids if value.isdigit()])
+        return list(equipment.values_list('id', flat=True))
+    
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         """Création en masse de métriques"""
-        serializer = NetworkMetricCreateSerializer(data=request.data, many=True)
+        serializer = NetworkMetricCreateSerializer(
+            data=request.data, many=True, context=self.get_serializer_context()
+        )
         if serializer.is_valid():
             serializer.save()
             return Response(
@@ -115,6 +194,41 @@ class NetworkMetricViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], parser_classes=[])
+    def ingest(self, request):
+        """Ingestion en flux de métriques (NDJSON ou CSV, gzip accepté)"""
+        content_type = request.content_type.split(';')[0].strip().lower()
+        if content_type in NDJSON_CONTENT_TYPES:
+            iter_rows = iter_ndjson
+        elif content_type in CSV_CONTENT_TYPES:
+            iter_rows = iter_csv
+        else:
+            return Response(
+                {'error': 'Content-Type attendu: application/x-ndjson ou text/csv'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        
+        if request.stream is None:
+            return Response({'error': 'Corps de requête vide'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        ingestor = MetricIngestor(request.user.company_id)
+        body = open_body(request.stream, request.META.get('HTTP_CONTENT_ENCODING'), max_body_bytes())
+        try:
+            result = ingestor.ingest(iter_rows(body))
+        except BodyTooLarge as exc:
+            # Rien n'est écrit: la transaction d'ingestion a été annulée
+            return Response({'error': str(exc)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except (OSError, EOFError, UnicodeDecodeError, csv.Error) as exc:
+            # Flux illisible: la transaction a été annulée, rien n'est écrit
+            return Response(
+                {'error': f'Corps de requête illisible: {exc}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if result['rejected'] and not result['accepted']:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
 
 class AlertThresholdViewSet(viewsets.ModelViewSet):
     serializer_class = AlertThresholdSerializer
@@ -125,12 +239,12 @@ class AlertThresholdViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # Filtrer les seuils par l'entreprise de l'utilisateur
         return AlertThreshold.objects.filter(
-            equipment__site__company=self.request.user.company
-        ).select_related('equipment', 'equipment__site')
+            equipment__company_id=self.request.user.company_id
+        ).select_related('equipment', 'equipment__site').order_by('equipment__name', 'id')
     
     @action(detail=False, methods=['post'])
     def bulk_update(self, request):
-        """Mise à jour en masse des seuils"""
+        """Mise à jour en masse des surcharges par équipement, en un seul upsert"""
         equipment_ids = request.data.get('equipment_ids', [])
         threshold_data = request.data.get('thresholds', {})
         
@@ -139,19 +253,73 @@ class AlertThresholdViewSet(viewsets.ModelViewSet):
                 {'error': 'equipment_ids et thresholds sont requis'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        updated_count = 0
-        for equipment_id in equipment_ids:
-            threshold, created = AlertThreshold.objects.get_or_create(
-                equipment_id=equipment_id,
-                defaults=threshold_data
+        # Validé avant toute écriture: ni None, ni chaîne parcourue caractère par caractère
+        ids_field = serializers.ListField(child=serializers.IntegerField())
+        try:
+            equipment_ids = set(ids_field.run_validation(equipment_ids))
+        except serializers.ValidationError:
+            return Response({'error': 'equipment_ids: liste d\'identifiants attendue'}, status=status.HTTP_400_BAD_REQUEST)
+        unknown = set(threshold_data) - set(THRESHOLD_FIELDS)
+        if unknown:
+            return Response(
+                {'error': f"Champs inconnus: {', '.join(sorted(unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            if not created:
-                for key, value in threshold_data.items():
-                    setattr(threshold, key, value)
-                threshold.save()
-            updated_count += 1
+        serializer = ThresholdValuesSerializer(data=threshold_data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        values = serializer.validated_data
+        owned = list(Equipment.objects.filter(
+            company_id=request.user.company_id, id__in=equipment_ids
+        ).values_list('id', flat=True))
+        
+        # Surcharges créées ou mises à jour sur les seuls champs fournis; les autres restent hérités
+        AlertThreshold.objects.bulk_create(
+            [AlertThreshold(equipment_id=equipment_id, **values) for equipment_id in owned],
+            update_conflicts=True, unique_fields=['equipment'], update_fields=[*values, 'updated_at'],
+            batch_size=1000,
+        )
+        threshold_cache.invalidate_many(owned)
+        transaction.on_commit(lambda: threshold_cache.invalidate_many(owned))
         
         return Response({
-            'status': f'{updated_count} seuils mis à jour'
+            'status': f'{len(owned)} seuils mis à jour',
+            'ignored': sorted(equipment_ids - set(owned)),
         })
+    
+    @action(detail=False, methods=['get'])
+    def effective(self, request):
+        """Seuils effectifs et niveau d'origine de chaque valeur (?equipment=<id>, répétable)"""
+        try:
+            equipment_ids = {int(value) for value in request.query_params.getlist('equipment')}
+        except ValueError:
+            return Response({'error': 'equipment: identifiant entier attendu'}, status=status.HTTP_400_BAD_REQUEST)
+        if not equipment_ids:
+            return Response({'error': 'Paramètre equipment requis'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        resolved = threshold_cache.effective(equipment_ids)
+        return Response([
+            {
+                'equipment': equipment_id,
+                'thresholds': thresholds and {
+                    field: {'value': value, 'source': source} for field, (value, source) in thresholds.items()
+                },
+            }
+            for equipment_id, (company_id, thresholds) in sorted(resolved.items())
+            if company_id == request.user.company_id
+        ])
+
+
+class ThresholdProfileViewSet(viewsets.ModelViewSet):
+    """Profils de seuils d'entreprise, de site et de type d'équipement"""
+    serializer_class = ThresholdProfileSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['site', 'equipment_type']
+    
+    def get_queryset(self):
+        return ThresholdProfile.objects.filter(
+            company_id=self.request.user.company_id
+        ).select_related('site').order_by('id')
+    
+    def perform_create(self, serializer):
+        serializer.save(company_id=self.request.user.company_id)
@@ -0,0 +1,115 @@
+"""
+Transport des notifications temps réel entre processus.
+
+Une notification est un petit dict JSON (``company``, ``topic`` et, pour les
+mesures, ``equipment``): elle signale un changement, les lignes sont relues par
+le hub du processus qui a des abonnés. ``LocalBroker`` suffit quand l'API et
+les flux tournent dans un seul processus ASGI; avec plusieurs workers (ou une
+ingestion par ``run_prober`` / ``import_metrics``), ``PostgresBroker`` relaie
+les notifications via LISTEN/NOTIFY.
+"""
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBroker:
+    """Notifications remises directement au hub du processus"""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    @property
+    def listening(self):
+        # Sans flux ouvert dans le processus, inutile de préparer les notifications
+        return bool(self.hub.feeds)
+
+    def publish(self, messages):
+        for message in messages:
+            self.hub.deliver(message)
+
+    def start(self):
+        pass
+
+
+class PostgresBroker:
+    """
+    NOTIFY à la publication, LISTEN dans un thread dédié (démarré au premier
+    abonné du processus). Le processus reçoit aussi ses propres notifications.
+    """
+    channel = 'vigileos_realtime'
+    # Limite de PostgreSQL: 8000 octets par notification
+    max_payload = 7900
+
+    # Les abonnés peuvent être dans n'importe quel processus
+    listening = True
+
+    def __init__(self, hub):
+        self.hub = hub
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _payloads(self, message):
+        payload = json.dumps(message, separators=(',', ':'))
+        if len(payload) <= self.max_payload or not message.get('equipment'):
+            yield payload
+            return
+        # Lot de mesures trop gros: découpage de la liste d'équipements
+        equipment = message['equipment']
+        half = len(equipment) // 2
+        for part in (equipment[:half], equipment[half:]):
+            yield from self._payloads({**message, 'equipment': part})
+
+    def publish(self, messages):
+        with connection.cursor() as cursor:
+            for message in messages:
+                for payload in self._payloads(message):
+                    cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name='realtime-listen', daemon=True)
+                self._thread.start()
+
+    def _listen(self):
+        wrapper = connections['default']
+        reconnect = False
+        while True:
+            try:
+                conn = wrapper.Database.connect(**wrapper.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                if reconnect:
+                    # Notifications perdues pendant la coupure: tous les clients resynchronisent
+                    self.hub.deliver({'company': None, 'topic': 'resync'})
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.hub.deliver(json.loads(conn.notifies.pop(0).payload))
+            except Exception:
+                reconnect = True
+                logger.exception('realtime: écoute PostgreSQL interrompue, reconnexion')
+                time.sleep(5)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        from .hub import hub
+        _broker = import_string(settings.REALTIME_BROKER)(hub)
+    return _broker
@@ -0,0 +1,240 @@
+"""
+Diffusion en mémoire des événements temps réel aux flux ouverts du processus.
+
+Un flux par entreprise (``Feed``) regroupe les abonnés: à chaque notification,
+les alertes modifiées ou les derniers instantanés de mesures sont relus une
+seule fois, encodés une seule fois, puis déposés dans la file bornée de chaque
+abonné. Les notifications reçues pendant une lecture sont fusionnées dans la
+suivante. Un abonné trop lent pour vider sa file perd les événements en attente
+et reçoit ``resync`` (relire via ``?updated_since=``); s'il ne lit même pas
+cette demande avant que la file se remplisse de nouveau, il est déconnecté.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ('alerts', 'metrics')
+ALERT_BATCH_LIMIT = 500
+
+
+def encode(event, data):
+    """Trame SSE, encodée une fois pour tous les abonnés"""
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'event: {event}\ndata: {payload}\n\n'.encode()
+
+
+RESYNC = encode('resync', {})
+
+
+class Subscription:
+    def __init__(self, company_id, topics, size):
+        self.company_id = company_id
+        self.topics = topics
+        self.queue = asyncio.Queue(size)
+        self.closed = False
+        self.resync_pending = False
+        self.dropped = 0
+
+    def _drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.dropped += 1
+
+    def push(self, chunk):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(chunk)
+        except asyncio.QueueFull:
+            if self.resync_pending:
+                self.close()
+                return
+            self._drain()
+            self.queue.put_nowait(RESYNC)
+            self.resync_pending = True
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._drain()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout):
+        """Prochaine trame, b'' après ``timeout`` secondes sans événement, None à la fermeture"""
+        try:
+            chunk = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return b''
+        if chunk is RESYNC:
+            self.resync_pending = False
+        return chunk
+
+
+@dataclass(eq=False)
+class Feed:
+    company_id: int
+    alerts_since: datetime
+    subscribers: set = field(default_factory=set)
+    # (type, id) -> horodatage déjà diffusé, pour ignorer les relectures du recouvrement
+    sent: dict = field(default_factory=dict)
+    pending_alerts: bool = False
+    pending_metrics: set = field(default_factory=set)
+    task: asyncio.Task = None
+
+
+def alert_changes(company_id, since, sent):
+    """Alertes modifiées et supprimées depuis ``since`` (moins le recouvrement), hors déjà diffusées"""
+    from alerts.models import Alert
+    from alerts.serializers import AlertSerializer
+    from sync.mixins import SYNC_OVERLAP
+    from sync.models import Tombstone
+
+    close_old_connections()
+    try:
+        rows = list(
+            Alert.objects.filter(company_id=company_id, updated_at__gt=since - SYNC_OVERLAP)
+            .select_related('equipment__site')
+            .order_by('updated_at', 'pk')[:ALERT_BATCH_LIMIT + 1]
+        )
+        if len(rows) > ALERT_BATCH_LIMIT:
+            return None, None, timezone.now()
+        deleted = [
+            (object_id, deleted_at)
+            for object_id, deleted_at in Tombstone.objects.filter(
+                company_id=company_id, model='alert', deleted_at__gt=since - SYNC_OVERLAP
+            ).values_list('object_id', 'deleted_at')
+            if sent.get(('deleted', object_id)) != deleted_at
+        ]
+        rows = [row for row in rows if sent.get(('alert', row.pk)) != row.updated_at]
+        until = max([since, *(row.updated_at for row in rows), *(at for _, at in deleted)])
+        for row in rows:
+            sent['alert', row.pk] = row.updated_at
+        for object_id, deleted_at in deleted:
+            sent['deleted', object_id] = deleted_at
+        for key, at in list(sent.items()):
+            if at <= until - SYNC_OVERLAP:
+                del sent[key]
+        return AlertSerializer(rows, many=True).data, [object_id for object_id, _ in deleted], until
+    finally:
+        close_old_connections()
+
+
+def metric_snapshots(company_id, equipment_ids):
+    from metrics.models import LatestMetric
+    from metrics.serializers import LatestMetricSerializer
+
+    close_old_connections()
+    try:
+        rows = (
+            LatestMetric.objects.filter(equipment_id__in=equipment_ids, equipment__company_id=company_id)
+            .select_related('equipment__site')
+            .order_by('equipment_id')
+        )
+        return LatestMetricSerializer(rows, many=True).data
+    finally:
+        close_old_connections()
+
+
+class Hub:
+    def __init__(self):
+        self.loop = None
+        self.feeds = {}
+
+    def subscribe(self, company_id, topics):
+        """À appeler depuis la boucle asyncio du serveur"""
+        from .brokers import get_broker
+
+        self.loop = asyncio.get_running_loop()
+        get_broker().start()
+        subscription = Subscription(company_id, topics, settings.REALTIME_QUEUE_SIZE)
+        feed = self.feeds.get(company_id)
+        if feed is None:
+            feed = self.feeds[company_id] = Feed(company_id, alerts_since=timezone.now())
+        feed.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        feed = self.feeds.get(subscription.company_id)
+        if feed is None:
+            return
+        feed.subscribers.discard(subscription)
+        if not feed.subscribers:
+            del self.feeds[subscription.company_id]
+            if feed.task:
+                feed.task.cancel()
+
+    def deliver(self, message):
+        """Point d'entrée des brokers, depuis n'importe quel thread"""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self.dispatch(message)
+        else:
+            loop.call_soon_threadsafe(self.dispatch, message)
+
+    def dispatch(self, message):
+        if message['topic'] == 'resync':
+            feeds = self.feeds.values() if message['company'] is None else [self.feeds.get(message['company'])]
+            for feed in feeds:
+                if feed:
+                    self.broadcast(feed, TOPICS, RESYNC)
+            return
+        feed = self.feeds.get(message['company'])
+        if feed is None:
+            return
+        if message['topic'] == 'changed':
+            feed.pending_alerts = True
+        elif message['topic'] == 'metrics':
+            feed.pending_metrics.update(message['equipment'])
+        if feed.task is None or feed.task.done():
+            feed.task = self.loop.create_task(self.drain(feed))
+
+    def broadcast(self, feed, topics, chunk):
+        for subscription in list(feed.subscribers):
+            if not set(topics).isdisjoint(subscription.topics):
+                subscription.push(chunk)
+                if subscription.closed:
+                    feed.subscribers.discard(subscription)
+
+    async def drain(self, feed):
+        while feed.subscribers and (feed.pending_alerts or feed.pending_metrics):
+            try:
+                if feed.pending_alerts:
+                    feed.pending_alerts = False
+                    alerts, deleted, feed.alerts_since = await sync_to_async(
+                        alert_changes, thread_sensitive=False
+                    )(feed.company_id, feed.alerts_since, feed.sent)
+                    if alerts is None:
+                        # Rafale trop importante pour être poussée: les clients relisent l'API
+                        feed.sent.clear()
+                        self.broadcast(feed, ['alerts'], RESYNC)
+                    elif alerts or deleted:
+                        self.broadcast(feed, ['alerts'], encode('alerts', {'results': alerts, 'deleted': deleted}))
+                if feed.pending_metrics:
+                    equipment_ids, feed.pending_metrics = feed.pending_metrics, set()
+                    snapshots = await sync_to_async(metric_snapshots, thread_sensitive=False)(
+                        feed.company_id, equipment_ids
+                    )
+                    if snapshots:
+                        self.broadcast(feed, ['metrics'], encode('metrics', snapshots))
+            except Exception:
+                logger.exception('realtime: lecture des changements impossible (entreprise %s)', feed.company_id)
+                self.broadcast(feed, TOPICS, RESYNC)
+
+
+hub = Hub()
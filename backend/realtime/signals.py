@@ -0,0 +1,30 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.dispatch import receiver
+
+from metrics.signals import metrics_ingested
+from vigileos.cache import tenant_changed
+from .brokers import get_broker
+
+
+@receiver(tenant_changed)
+def publish_changes(sender, company_ids, **kwargs):
+    # Déjà après commit: les flux relisent les alertes modifiées de ces entreprises
+    broker = get_broker()
+    if broker.listening:
+        broker.publish([{'company': company_id, 'topic': 'changed'} for company_id in company_ids])
+
+
+@receiver(metrics_ingested)
+def publish_metrics(sender, metrics, backfill=False, **kwargs):
+    if backfill or not get_broker().listening:
+        return
+    by_company = defaultdict(set)
+    for metric in metrics:
+        by_company[metric.company_id].add(metric.equipment_id)
+    messages = [
+        {'company': company_id, 'topic': 'metrics', 'equipment': sorted(equipment_ids)}
+        for company_id, equipment_ids in by_company.items()
+    ]
+    transaction.on_commit(lambda: get_broker().publish(messages))
@@ -0,0 +1,117 @@
+"""
+Flux Server-Sent Events: ``GET /api/realtime/stream/?token=<access>&topics=alerts,metrics``.
+
+Application ASGI brute, montée devant Django dans ``vigileos/asgi.py``: une
+connexion ouverte ne coûte qu'une coroutine et une file bornée, sans thread ni
+connexion SQL. Le jeton d'accès SimpleJWT est lu dans ``?token=`` (EventSource
+ne permet pas d'en-têtes) ou dans ``Authorization: Bearer``; le flux se ferme à
+son expiration et le client se reconnecte avec un jeton rafraîchi.
+"""
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from sync.mixins import encode_cursor
+from users.authentication import CachedJWTAuthentication
+from .hub import TOPICS, encode, hub
+
+PATH = '/api/realtime/stream/'
+
+
+def authenticate(raw_token):
+    """Utilisateur actif et date d'expiration du jeton, ou ValueError"""
+    authentication = CachedJWTAuthentication()
+    try:
+        token = authentication.get_validated_token(raw_token)
+        user = authentication.get_user(token)
+    except InvalidToken:
+        raise ValueError("Jeton d'accès invalide ou expiré")
+    except AuthenticationFailed as exc:
+        raise ValueError(str(exc.detail))
+    if not user.company_id:
+        raise ValueError('Utilisateur sans entreprise')
+    return user, token['exp']
+
+
+async def error(send, status, message):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps({'error': message}).encode()})
+
+
+async def stream(scope, receive, send):
+    if scope['method'] != 'GET':
+        await error(send, 405, 'Méthode non autorisée')
+        return
+
+    params = parse_qs(scope['query_string'].decode())
+    raw_token = params.get('token', [''])[0]
+    if not raw_token:
+        header = dict(scope['headers']).get(b'authorization', b'').decode()
+        raw_token = header[7:] if header.startswith('Bearer ') else ''
+    topics = set(params.get('topics', [','.join(TOPICS)])[0].split(','))
+    if not raw_token:
+        await error(send, 401, "Jeton d'accès manquant")
+        return
+    if not topics or not topics <= set(TOPICS):
+        await error(send, 400, f"topics: valeurs possibles {', '.join(TOPICS)}")
+        return
+    try:
+        user, expires_at = await sync_to_async(authenticate, thread_sensitive=False)(raw_token.encode())
+    except ValueError as exc:
+        await error(send, 401, str(exc))
+        return
+
+    subscription = hub.subscribe(user.company_id, topics)
+    disconnected = False
+
+    async def watch():
+        nonlocal disconnected
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected = True
+                subscription.close()
+                return
+
+    watcher = hub.loop.create_task(watch())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        # Curseur ?updated_since= à partir duquel relire l'API après un resync
+        ready = b'retry: 5000\n' + encode('ready', {'cursor': encode_cursor(timezone.now()), 'topics': sorted(topics)})
+        await send({'type': 'http.response.body', 'body': ready, 'more_body': True})
+
+        while True:
+            remaining = expires_at - time.time()
+            if remaining <= 0:
+                await send({'type': 'http.response.body', 'body': encode('expired', {}), 'more_body': True})
+                break
+            chunk = await subscription.get(min(settings.REALTIME_HEARTBEAT, remaining))
+            if chunk is None:
+                break
+            # Commentaire SSE: maintient la connexion ouverte à travers les proxys
+            await send({'type': 'http.response.body', 'body': chunk or b': ping\n\n', 'more_body': True})
+        if not disconnected:
+            await send({'type': 'http.response.body', 'body': b''})
+    except OSError:
+        pass
+    finally:
+        watcher.cancel()
+        subscription.close()
+        hub.unsubscribe(subscription)
@@ -0,0 +1,181 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from metrics.models import NetworkMetric
+from sites.models import Site
+from users.models import Company
+from vigileos.asgi import application
+from .brokers import LocalBroker, get_broker
+from .hub import encode, hub
+from .stream import PATH
+
+User = get_user_model()
+TIMEOUT = 5
+
+
+def parse(frame):
+    """(événement, données) d'une trame SSE"""
+    fields = dict(line.split(': ', 1) for line in frame.decode().splitlines() if ': ' in line)
+    return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+
+class Connection:
+    """Client SSE simulé: ``receive`` attend la déconnexion, ``send`` collecte les trames"""
+
+    def __init__(self, token=None, topics='alerts,metrics'):
+        query = f'topics={topics}' + (f'&token={token}' if token else '')
+        self.scope = {'type': 'http', 'method': 'GET', 'path': PATH, 'query_string': query.encode(), 'headers': []}
+        self.status = None
+        self.frames = asyncio.Queue()
+        self.disconnected = asyncio.Event()
+        # Client qui ne lit plus: send bloque tant que la porte est fermée
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.task = None
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+            return
+        await self.frames.put(message['body'])
+        await self.gate.wait()
+
+    def open(self):
+        self.task = asyncio.ensure_future(application(self.scope, self.receive, self.send))
+        return self
+
+    async def next(self):
+        return await asyncio.wait_for(self.frames.get(), TIMEOUT)
+
+    async def event(self):
+        """Prochain événement, battements de cœur ignorés"""
+        while (frame := await self.next()).startswith(b': '):
+            pass
+        return parse(frame)
+
+    async def close(self):
+        self.disconnected.set()
+        self.gate.set()
+        await asyncio.wait_for(self.task, TIMEOUT)
+
+
+class StreamTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.tokens, self.equipment = {}, {}
+        for name in ('ACME', 'Autre'):
+            company = Company.objects.create(name=name)
+            user = User.objects.create_user(name.lower(), password='-', company=company)
+            site = Site.objects.create(name='Site', address='-', company=company)
+            self.tokens[name] = str(AccessToken.for_user(user))
+            self.equipment[name] = Equipment.objects.create(name=f'Switch {name}', type='switch', site=site)
+
+    def tearDown(self):
+        self.assertEqual(hub.feeds, {})
+
+    def run_async(self, coroutine):
+        return asyncio.run(asyncio.wait_for(coroutine, 4 * TIMEOUT))
+
+    def test_token_required(self):
+        async def run():
+            for token in (None, 'invalide'):
+                connection = Connection(token).open()
+                await connection.task
+                self.assertEqual(connection.status, 401)
+                self.assertIn('error', json.loads(await connection.next()))
+        self.run_async(run())
+
+    def test_events_stay_within_company(self):
+        async def run():
+            acme, other = Connection(self.tokens['ACME']).open(), Connection(self.tokens['Autre']).open()
+            for connection in (acme, other):
+                self.assertEqual((await connection.event())[0], 'ready')
+                self.assertEqual(connection.status, 200)
+
+            alert = await sync_to_async(Alert.objects.create)(
+                title='Lien coupé', message='-', equipment=self.equipment['ACME'],
+            )
+            event, data = await acme.event()
+            self.assertEqual((event, [row['id'] for row in data['results']]), ('alerts', [alert.pk]))
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(other.frames.get(), 0.5)
+
+            for connection in (acme, other):
+                await connection.close()
+        self.run_async(run())
+
+    @override_settings(REALTIME_QUEUE_SIZE=2)
+    def test_slow_consumer_resyncs_then_drops(self):
+        company_id = self.equipment['ACME'].company_id
+        chunks = [encode('alerts', {'results': [], 'deleted': [i]}) for i in range(10)]
+
+        async def run():
+            connection = Connection(self.tokens['ACME'], topics='alerts')
+            connection.gate.clear()
+            connection.open()
+            self.assertEqual((await connection.event())[0], 'ready')
+            feed = hub.feeds[company_id]
+
+            # File pleine: les événements en attente sont remplacés par resync
+            for chunk in chunks[:4]:
+                hub.broadcast(feed, ['alerts'], chunk)
+            connection.gate.set()
+            self.assertEqual((await connection.event())[0], 'resync')
+            self.assertEqual(await connection.event(), ('alerts', {'results': [], 'deleted': [3]}))
+
+            # Toujours en retard avec un resync non lu: déconnecté
+            connection.gate.clear()
+            hub.broadcast(feed, ['alerts'], chunks[4])
+            await connection.event()
+            for chunk in chunks[5:]:
+                hub.broadcast(feed, ['alerts'], chunk)
+            self.assertFalse(feed.subscribers)
+            connection.gate.set()
+            await asyncio.wait_for(connection.task, TIMEOUT)
+            # Fin de réponse, sans les événements perdus
+            self.assertEqual(await connection.next(), b'')
+            self.assertTrue(connection.frames.empty())
+        self.run_async(run())
+
+    def test_disconnect_unsubscribes(self):
+        company_id = self.equipment['ACME'].company_id
+
+        async def run():
+            connection = Connection(self.tokens['ACME']).open()
+            await connection.event()
+            self.assertEqual(len(hub.feeds[company_id].subscribers), 1)
+            await connection.close()
+            self.assertNotIn(company_id, hub.feeds)
+            # Rien n'est envoyé après la déconnexion
+            self.assertTrue(connection.frames.empty())
+        self.run_async(run())
+
+    def test_local_broker_round_trip(self):
+        broker = get_broker()
+        self.assertIsInstance(broker, LocalBroker)
+        self.assertFalse(broker.listening)
+        equipment = self.equipment['ACME']
+
+        async def run():
+            connection = Connection(self.tokens['ACME'], topics='metrics').open()
+            await connection.event()
+            self.assertTrue(broker.listening)
+            await sync_to_async(NetworkMetric.objects.bulk_create)([NetworkMetric(equipment=equipment, cpu_usage=42)])
+            event, data = await connection.event()
+            self.assertEqual(event, 'metrics')
+            self.assertEqual([(row['equipment'], row['cpu_usage']) for row in data], [(equipment.pk, 42.0)])
+            await connection.close()
+        self.run_async(run())
+        self.assertFalse(broker.listening)
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='site',
+            name='probe_interval',
+            field=models.PositiveIntegerField(default=30, help_text='Secondes entre deux sondes des équipements du site (run_prober)', verbose_name='Intervalle de sonde'),
+        ),
+    ]
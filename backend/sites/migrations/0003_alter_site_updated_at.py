@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0002_site_probe_interval'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='site',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Mis à jour le'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.10 on 2026-10-18 00:35
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0003_alter_site_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='site',
+            name='probe_interval',
+            field=models.PositiveIntegerField(default=30, help_text='Secondes entre deux sondes des équipements du site (run_prober)', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Intervalle de sonde'),
+        ),
+    ]
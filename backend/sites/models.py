@@ -1,4 +1,5 @@
-from django.db import models
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
 from users.models import Company
 
 class Site(models.Model):
@@ -13,8 +14,11 @@ class Site(models.Model):
     address = models.TextField(verbose_name="Adresse")
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="sites", verbose_name="Entreprise")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='online', verbose_name="Statut")
+    probe_interval = models.PositiveIntegerField(default=30, validators=[MinValueValidator(1)],
+                                                 verbose_name="Intervalle de sonde",
+                                                 help_text="Secondes entre deux sondes des équipements du site (run_prober)")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
-    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Mis à jour le")
     
     class Meta:
         verbose_name = "Site"
@@ -22,3 +26,23 @@ class Site(models.Model):
     
     def __str__(self):
         return self.name
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_company_id = instance.__dict__.get('company_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from equipment.models import reassign_company
+        from sync.models import Tombstone
+        
+        loaded_company_id = getattr(self, '_loaded_company_id', None)
+        moved = not self._state.adding and loaded_company_id is not None and loaded_company_id != self.company_id
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if moved:
+                # Le company_id dénormalisé des équipements, alertes et mesures suit le site
+                reassign_company(list(self.equipment.values_list('id', flat=True)), self.company_id, loaded_company_id)
+                Tombstone.objects.create(company_id=loaded_company_id, model='site', object_id=self.pk)
+        self._loaded_company_id = self.company_id
@@ -4,5 +4,5 @@ from .models import Site
 class SiteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Site
-        fields = ['id', 'name', 'address', 'company', 'status', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'address', 'company', 'status', 'probe_interval', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -1,25 +1,28 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from vigileos.cache import CachedResponseMixin
+from sync.mixins import DeltaSyncMixin
 from .models import Site
 from .serializers import SiteSerializer
 from equipment.models import Equipment
 from equipment.serializers import EquipmentSerializer
 
-class SiteViewSet(viewsets.ModelViewSet):
+class SiteViewSet(DeltaSyncMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    sync_model_name = 'site'
     serializer_class = SiteSerializer
     
     def get_queryset(self):
         # Filtrer les sites par l'entreprise de l'utilisateur
-        return Site.objects.filter(company=self.request.user.company)
+        return Site.objects.filter(company_id=self.request.user.company_id).order_by('name', 'id')
     
     def perform_create(self, serializer):
         # Assigner automatiquement l'entreprise de l'utilisateur
-        serializer.save(company=self.request.user.company)
+        serializer.save(company_id=self.request.user.company_id)
     
     @action(detail=True)
     def equipment(self, request, pk=None):
         site = self.get_object()
-        equipments = Equipment.objects.filter(site=site)
+        equipments = Equipment.objects.filter(site=site).select_related('site').order_by('name', 'id')
         serializer = EquipmentSerializer(equipments, many=True)
         return Response(serializer.data)
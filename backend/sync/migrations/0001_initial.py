@@ -0,0 +1,31 @@
+# Generated by Django 4.2.10 on 2026-10-17 23:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50, verbose_name='Modèle')),
+                ('object_id', models.BigIntegerField(verbose_name='Identifiant supprimé')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Supprimé le')),
+                ('company', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='users.company', verbose_name='Entreprise')),
+            ],
+            options={
+                'verbose_name': 'Suppression',
+                'verbose_name_plural': 'Suppressions',
+                'indexes': [models.Index(fields=['company', 'model', 'deleted_at'], name='sync_tombstone_lookup_idx')],
+            },
+        ),
+    ]
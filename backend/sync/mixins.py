@@ -0,0 +1,122 @@
+"""
+Synchronisation incrémentale des listes (?updated_since=<curseur>).
+
+Le curseur est un horodatage en microsecondes depuis l'epoch (``0`` pour une
+première synchronisation), suivi de ``:<id>`` pour la page suivante d'un
+résultat tronqué. Un curseur complet relit les ``SYNC_OVERLAP`` dernières
+secondes: une transaction validée tardivement avec un ``updated_at`` antérieur
+n'est pas perdue (les lignes déjà reçues peuvent revenir, le client les
+remplace). La réponse porte un ETag dérivé de la génération de l'entreprise:
+tant que rien n'a été écrit, un GET conditionnel renvoie 304 sans requête SQL.
+"""
+import hashlib
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponseNotModified
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlencode
+from rest_framework import status
+from rest_framework.response import Response
+
+from vigileos.cache import generation
+from .models import Tombstone
+
+SYNC_OVERLAP = timedelta(seconds=10)
+SYNC_PAGE_SIZE = 1000
+
+CURSOR = re.compile(r'^(\d+)(?::(\d+))?$')
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(timestamp, pk=None):
+    value = str((timestamp - EPOCH) // timedelta(microseconds=1))
+    return f'{value}:{pk}' if pk is not None else value
+
+
+def decode_cursor(value):
+    """(horodatage, id ou None); accepte aussi une date ISO 8601"""
+    match = CURSOR.match(value)
+    if match:
+        return EPOCH + timedelta(microseconds=int(match.group(1))), int(match.group(2)) if match.group(2) else None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError('updated_since: curseur invalide')
+    return (timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed), None
+
+
+class DeltaSyncMixin:
+    """
+    Ajoute le mode ``?updated_since=`` à ``list``: lignes créées ou modifiées
+    depuis le curseur, identifiants supprimés et nouveau curseur.
+    """
+    sync_model_name = None
+
+    def sync_etag(self, request):
+        company_id = request.user.company_id
+        query = urlencode(sorted(
+            (key, sorted(values)) for key, values in request.query_params.lists() if key != 'updated_since'
+        ), doseq=True)
+        key = f'sync:{company_id}:{generation(company_id)}:{self.basename}:{query}'
+        return '"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+    def list(self, request, *args, **kwargs):
+        cursor = request.query_params.get('updated_since')
+        if cursor is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            since, last_pk = decode_cursor(cursor)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # L'ETag ne vaut que pour un curseur complet: la suite d'une page doit être lue
+        etag = self.sync_etag(request) if last_pk is None else None
+        if etag and etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        now = timezone.now()
+        if since < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS) and since > EPOCH:
+            return Response(
+                {'error': 'updated_since: curseur expiré, resynchronisation complète requise'},
+                status=status.HTTP_410_GONE
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if last_pk is None:
+            # Curseur complet: relecture de la fenêtre de recouvrement
+            since = since - SYNC_OVERLAP if since > EPOCH else since
+            queryset = queryset.filter(updated_at__gt=since)
+        else:
+            queryset = queryset.filter(Q(updated_at__gt=since) | Q(updated_at=since, pk__gt=last_pk))
+        rows = list(queryset.order_by('updated_at', 'pk')[:SYNC_PAGE_SIZE + 1])
+        has_more = len(rows) > SYNC_PAGE_SIZE
+        rows = rows[:SYNC_PAGE_SIZE]
+        until = rows[-1].updated_at if has_more else now
+
+        deleted = []
+        if since > EPOCH:
+            deleted = list(
+                Tombstone.objects.filter(
+                    company_id=request.user.company_id, model=self.sync_model_name,
+                    deleted_at__gt=since, deleted_at__lte=until,
+                ).values_list('object_id', flat=True)
+            )
+
+        response = Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'deleted': deleted,
+            'cursor': encode_cursor(rows[-1].updated_at, rows[-1].pk) if has_more else encode_cursor(now),
+            'has_more': has_more,
+        })
+        if etag and not has_more:
+            response['ETag'] = etag
+        return response
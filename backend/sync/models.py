@@ -0,0 +1,23 @@
+from django.db import models
+from users.models import Company
+
+
+class Tombstone(models.Model):
+    """Trace d'une suppression, pour la synchronisation incrémentale (?updated_since=)"""
+    # Sans contrainte: les suppressions en cascade d'une entreprise créent encore des traces,
+    # purgées ensuite avec la rétention (SYNC_TOMBSTONE_RETENTION_DAYS)
+    company = models.ForeignKey(Company, on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name="+", verbose_name="Entreprise")
+    model = models.CharField(max_length=50, verbose_name="Modèle")
+    object_id = models.BigIntegerField(verbose_name="Identifiant supprimé")
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Supprimé le")
+
+    class Meta:
+        verbose_name = "Suppression"
+        verbose_name_plural = "Suppressions"
+        indexes = [
+            models.Index(fields=['company', 'model', 'deleted_at'], name='sync_tombstone_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id}"
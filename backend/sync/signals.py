@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from sites.models import Site
+from .models import Tombstone
+
+
+@receiver(post_delete, sender=Site)
+def site_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(company_id=instance.company_id, model='site', object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Equipment)
+def equipment_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(company_id=instance.company_id, model='equipment', object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Alert)
+def alert_deleted(sender, instance, **kwargs):
+    Tombstone.objects.create(company_id=instance.company_id, model='alert', object_id=instance.pk)
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from sites.models import Site
+from users.models import Company
+from .mixins import SYNC_OVERLAP, encode_cursor
+
+User = get_user_model()
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name='ACME')
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('acme', password='-', company=self.company))
+        self.site = Site.objects.create(name='Site', address='-', company=self.company)
+        self.equipment = Equipment.objects.create(name='Switch', type='switch', site=self.site)
+        self.alert = Alert.objects.create(title='Alerte', message='-', equipment=self.equipment)
+        # Dernière synchronisation une heure après ces écritures (hors recouvrement)
+        past = timezone.now() - timedelta(hours=2)
+        for model in (Site, Equipment, Alert):
+            model.objects.update(updated_at=past)
+        self.cursor = encode_cursor(past + timedelta(hours=1))
+
+    def sync(self, url, cursor=None, **headers):
+        return self.client.get(url, {'updated_since': cursor or self.cursor}, **headers)
+
+    def test_deletions_reported(self):
+        for url, pk in (('/api/alerts/', self.alert.pk), ('/api/equipment/', self.equipment.pk),
+                        ('/api/sites/', self.site.pk)):
+            with self.subTest(url=url):
+                self.assertEqual(self.sync(url).json()['deleted'], [])
+                self.assertEqual(self.client.delete(f'{url}{pk}/').status_code, 204)
+                data = self.sync(url).json()
+                self.assertEqual(data['deleted'], [pk])
+                self.assertNotIn(pk, [row['id'] for row in data['results']])
+
+    def test_bulk_delete_reported(self):
+        alerts = Alert.objects.bulk_create([
+            Alert(title=f'Alerte {i}', message='-', equipment=self.equipment) for i in range(3)
+        ])
+        response = self.client.post('/api/alerts/bulk_delete/', {'filter': {'equipment': self.equipment.pk}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = self.sync('/api/alerts/').json()
+        self.assertEqual(sorted(data['deleted']), sorted([self.alert.pk, *(alert.pk for alert in alerts)]))
+
+    def test_continuation_cursor(self):
+        now = timezone.now()
+        Site.objects.bulk_create([Site(name=f'Site {i}', address='-', company=self.company) for i in range(4)])
+        # Deux sites au même horodatage: l'id départage les pages
+        Site.objects.filter(name__in=['Site 1', 'Site 2']).update(updated_at=now)
+        expected = list(Site.objects.filter(updated_at__gt=now - timedelta(minutes=30))
+                        .order_by('updated_at', 'pk').values_list('pk', flat=True))
+
+        seen, cursor = [], self.cursor
+        with mock.patch('sync.mixins.SYNC_PAGE_SIZE', 2):
+            while True:
+                data = self.sync('/api/sites/', cursor).json()
+                seen.extend(row['id'] for row in data['results'])
+                cursor = data['cursor']
+                if not data['has_more']:
+                    break
+                self.assertRegex(cursor, r'^\d+:\d+$')
+        self.assertEqual(seen, expected)
+        self.assertRegex(cursor, r'^\d+$')
+
+    def test_bad_and_expired_cursors(self):
+        self.assertEqual(self.sync('/api/sites/', 'hier').status_code, 400)
+        expired = encode_cursor(timezone.now() - timedelta(days=31))
+        self.assertEqual(self.sync('/api/sites/', expired).status_code, 410)
+        with override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=60):
+            self.assertEqual(self.sync('/api/sites/', expired).status_code, 200)
+        # Première synchronisation: tout est renvoyé, sans traces de suppression
+        data = self.sync('/api/sites/', '0').json()
+        self.assertEqual(([row['id'] for row in data['results']], data['deleted']), ([self.site.pk], []))
+
+    def test_etag(self):
+        for url in ('/api/sites/', '/api/equipment/', '/api/alerts/'):
+            with self.subTest(url=url):
+                etag = self.sync(url)['ETag']
+                self.assertEqual(self.sync(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        etag = self.sync('/api/alerts/')['ETag']
+        alert = Alert.objects.create(title='Nouvelle', message='-', equipment=self.equipment)
+        response = self.sync('/api/alerts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([row['id'] for row in response.json()['results']], [alert.pk])
+
+    def test_overlap_rereads_late_commits(self):
+        # Écriture validée tardivement avec un updated_at juste antérieur au curseur
+        cursor = timezone.now()
+        Site.objects.filter(pk=self.site.pk).update(updated_at=cursor - SYNC_OVERLAP / 2)
+        data = self.sync('/api/sites/', encode_cursor(cursor)).json()
+        self.assertEqual([row['id'] for row in data['results']], [self.site.pk])
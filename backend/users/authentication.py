@@ -0,0 +1,81 @@
+"""
+Authentification JWT sans lecture de l'utilisateur à chaque requête.
+
+L'identité dont les vues ont besoin (id, nom, drapeaux actif/staff/superuser,
+entreprise) est mise en cache par identifiant d'utilisateur pendant
+``PRINCIPAL_CACHE_TTL`` secondes. Les vues reçoivent une instance ``User``
+partielle: les autres champs sont différés et lus à la demande, un par un;
+une vue qui sérialise l'utilisateur complet le relit donc explicitement.
+
+L'entrée est supprimée à chaque enregistrement ou suppression de l'utilisateur
+(désactivation, changement d'entreprise, suppression de l'entreprise en
+cascade), voir ``users.signals``. Une modification par ``QuerySet.update``
+n'est vue qu'à l'expiration du TTL. Avec plusieurs processus, le cache doit être
+partagé (``CACHE_BACKEND``) pour que l'invalidation les atteigne tous.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+PRINCIPAL_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser', 'company_id')
+
+
+def _principal_key(user_id):
+    return f'principal:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'PRINCIPAL_CACHE_TTL', 300)
+
+
+def cache_principal(user):
+    """Met en cache l'identité d'un utilisateur déjà chargé (connexion)"""
+    values = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+    cache.set(_principal_key(getattr(user, api_settings.USER_ID_FIELD)), values, _ttl())
+
+
+def invalidate_principal(user_id):
+    cache.delete(_principal_key(user_id))
+    # Une authentification concurrente a pu remettre en cache l'état d'avant la transaction
+    transaction.on_commit(lambda: cache.delete(_principal_key(user_id)))
+
+
+def get_principal(user_id):
+    """Identité en cache, lue en base (une requête) et mise en cache si absente; None si inconnu"""
+    key = _principal_key(user_id)
+    values = cache.get(key)
+    if values is None:
+        values = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values(*PRINCIPAL_FIELDS).first()
+        if values is not None:
+            cache.set(key, values, _ttl())
+    return values
+
+
+def principal_user(values):
+    """Instance ``User`` partielle, comme chargée par ``.only(*PRINCIPAL_FIELDS)``"""
+    return User.from_db(router.db_for_read(User), list(values), list(values.values()))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # La révocation par mot de passe compare un haché absent du cache
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        values = get_principal(user_id)
+        if values is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not values['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return principal_user(values)
@@ -2,10 +2,13 @@ from rest_framework import status, permissions, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
 from django_filters.rest_framework import DjangoFilterBackend
+from .authentication import cache_principal
 from .models import Company
 from .serializers import UserSerializer, UserRegisterSerializer, CompanySerializer
 
@@ -28,17 +31,21 @@ class RegisterView(APIView):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        if response.status_code == 200:
-            # Récupérer l'utilisateur à partir du nom d'utilisateur dans la requête
-            username = request.data.get('username')
-            user = User.objects.get(username=username)
-            response.data['user'] = UserSerializer(user).data
-        return response
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        # Utilisateur déjà chargé par l'authentification: ni relecture, ni requête au premier appel authentifié
+        user = serializer.user
+        cache_principal(user)
+        return Response({**serializer.validated_data, 'user': UserSerializer(user).data})
 
 class UserProfileView(APIView):
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        # request.user ne porte que l'identité en cache: profil complet en une requête
+        user = User.objects.select_related('company').get(pk=request.user.pk)
+        serializer = UserSerializer(user)
         return Response(serializer.data)
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -51,7 +58,7 @@ class UserViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         # Les utilisateurs ne peuvent voir que les utilisateurs de leur entreprise
-        return User.objects.filter(company=self.request.user.company)
+        return User.objects.filter(company_id=self.request.user.company_id)
     
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
@@ -80,7 +87,7 @@ class CompanyViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         # Les utilisateurs ne peuvent voir que leur propre entreprise
-        return Company.objects.filter(id=self.request.user.company.id)
+        return Company.objects.filter(id=self.request.user.company_id)
     
     @action(detail=True, methods=['get'])
     def users(self, request, pk=None):
@@ -94,14 +101,14 @@ class CompanyViewSet(viewsets.ModelViewSet):
     def stats(self, request, pk=None):
         """Statistiques de l'entreprise"""
         company = self.get_object()
+        # Un agrégat par table plutôt qu'un COUNT par site
+        users = company.users.aggregate(total=Count('id'), active=Count('id', filter=Q(is_active=True)))
+        equipment = company.equipment.aggregate(total=Count('id'), active=Count('id', filter=Q(status='online')))
         stats = {
-            'total_users': company.users.count(),
-            'active_users': company.users.filter(is_active=True).count(),
+            'total_users': users['total'],
+            'active_users': users['active'],
             'total_sites': company.sites.count(),
-            'total_equipment': sum(site.equipment.count() for site in company.sites.all()),
-            'active_equipment': sum(
-                site.equipment.filter(status='active').count() 
-                for site in company.sites.all()
-            )
+            'total_equipment': equipment['total'],
+            'active_equipment': equipment['active'],
         }
         return Response(stats)
@@ -2,6 +2,8 @@
 ASGI config for vigileos project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Le flux temps réel (Server-Sent Events) est servi directement, sans passer par
+Django: voir ``realtime.stream``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +15,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vigileos.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from realtime.stream import PATH, stream  # noqa: E402  (Django doit être initialisé)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == PATH:
+        await stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
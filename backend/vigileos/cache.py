@@ -0,0 +1,154 @@
+"""
+Cache de lecture par entreprise (réponses d'API, tableau de bord).
+
+Chaque entreprise possède un compteur de génération stocké dans le cache Django;
+il fait partie de toutes les clés de lecture de l'entreprise. Une écriture
+incrémente la génération au lieu de rechercher les clés à supprimer: les
+anciennes entrées ne sont plus jamais lues et expirent d'elles-mêmes.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import urlencode
+
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Émis après commit de toute écriture invalidant le cache (argument: company_ids)
+tenant_changed = Signal()
+
+
+def _generation_key(company_id):
+    return f'tenant:{company_id}:generation'
+
+
+def _fresh_generation():
+    # Un compteur évincé du cache repart d'une valeur jamais utilisée
+    return time.time_ns() // 1000
+
+
+def generation(company_id):
+    key = _generation_key(company_id)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _fresh_generation(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump_generation(company_ids):
+    """Invalide toutes les lectures en cache des entreprises données"""
+    def bump():
+        for company_id in set(company_ids):
+            try:
+                cache.incr(_generation_key(company_id))
+            except ValueError:
+                cache.set(_generation_key(company_id), _fresh_generation(), None)
+
+    def committed():
+        # Une lecture concurrente a pu mettre en cache l'état d'avant la transaction
+        bump()
+        tenant_changed.send(sender=None, company_ids=set(company_ids))
+
+    company_ids = list(company_ids)
+    bump()
+    transaction.on_commit(committed)
+
+
+def bump_generation_for_equipment(equipment_ids):
+    """Invalide le cache des entreprises propriétaires de ces équipements"""
+    from equipment.models import Equipment
+    bump_generation(set(
+        Equipment.objects.filter(pk__in=equipment_ids).values_list('company_id', flat=True)
+    ))
+
+
+class CacheStats:
+    """Compteurs de succès / échecs par endpoint, en mémoire du processus"""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, hit):
+        with self._lock:
+            self._counts[endpoint, 'hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        stats = {}
+        for (endpoint, kind), value in counts.items():
+            stats.setdefault(endpoint, {'hits': 0, 'misses': 0})[kind] = value
+        for values in stats.values():
+            values['hit_rate'] = round(values['hits'] / (values['hits'] + values['misses']), 3)
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+cache_stats = CacheStats()
+
+
+class CachedResponseMixin:
+    """
+    Met en cache les réponses JSON de ``list`` et ``retrieve`` par entreprise,
+    endpoint et paramètres de requête normalisés. L'ETag est dérivé de la clé:
+    un GET conditionnel sans écriture depuis renvoie 304 sans lire le cache.
+    """
+    response_cache_timeout = RESPONSE_CACHE_TIMEOUT
+
+    def response_cache_key(self, request):
+        if request.accepted_renderer.format != 'json':
+            return None
+        company_id = request.user.company_id
+        query = urlencode(sorted((key, sorted(values)) for key, values in request.query_params.lists()), doseq=True)
+        digest = hashlib.md5(query.encode(), usedforsecurity=False).hexdigest()
+        return (
+            f'api:{company_id}:{generation(company_id)}:{self.basename}:{self.action}:'
+            f"{self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')}:{digest}"
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.response_cache_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        endpoint = f'{self.basename}-{self.action}'
+        etag = '"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+        if etag in request.headers.get('If-None-Match', ''):
+            cache_stats.record(endpoint, hit=True)
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+        cached = cache.get(key)
+        if cached is not None:
+            cache_stats.record(endpoint, hit=True)
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['ETag'] = etag
+            return response
+
+        cache_stats.record(endpoint, hit=False)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            # Rendu immédiat: on stocke les octets JSON, pas les objets du sérialiseur
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            cache.set(key, (response.content, response['Content-Type']), self.response_cache_timeout)
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
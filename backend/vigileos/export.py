@@ -0,0 +1,92 @@
+"""
+Export en flux (CSV / NDJSON, gzip optionnel) à mémoire constante.
+
+Les lignes sont lues côté serveur par ``QuerySet.iterator`` sur un
+``values_list`` et encodées par paquets: ni instances de modèle ni réponse
+complète ne sont construites en mémoire.
+"""
+import csv
+import json
+import zlib
+from datetime import date, datetime
+
+from django.http import StreamingHttpResponse
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _LineBuffer:
+    """Tampon en écriture seule pour csv.writer"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self):
+        data = ''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_rows(rows, columns, output, chunk_size):
+    """Encode un itérable de tuples en blocs de texte CSV ou NDJSON"""
+    if output == 'csv':
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for count, row in enumerate(rows, start=1):
+            writer.writerow(row)
+            if count % chunk_size == 0:
+                yield buffer.drain()
+        yield buffer.drain()
+    else:
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(dict(zip(columns, map(_json_value, row)))))
+            if len(lines) >= chunk_size:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+
+def compress(chunks):
+    compressor = zlib.compressobj(wbits=31)  # en-tête gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(queryset, columns, output='csv', gzip=False, filename='export', chunk_size=2000):
+    """
+    StreamingHttpResponse exportant ``queryset.values_list(*columns)``.
+
+    ``columns`` est une liste de (nom de colonne, chemin ORM).
+    """
+    names = [name for name, _ in columns]
+    rows = queryset.values_list(*[path for _, path in columns]).iterator(chunk_size=chunk_size)
+    chunks = encode_rows(rows, names, output, chunk_size)
+    filename = f'{filename}.{output}'
+    if gzip:
+        chunks = compress(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    else:
+        content_type = EXPORT_FORMATS[output]
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,184 @@
+"""
+Budget de requêtes SQL par requête HTTP.
+
+``QueryBudgetMiddleware`` compte, pour chaque requête, les requêtes SQL, leur
+durée cumulée, les instructions répétées à l'identique (signature d'un N+1:
+même SQL, paramètres différents) et la durée de la vue. Les mesures sont
+agrégées par endpoint (``request_stats``) en histogrammes à bornes fixes,
+exposés aux administrateurs sur ``/api/perf/``. La mesure passe par
+``connection.execute_wrapper``: un appel de fonction et un compteur par
+instruction, sans ``DEBUG`` ni copie des paramètres, d'où un coût négligeable
+en production. Au-delà de ``QUERY_BUDGET`` requêtes, un avertissement est journalisé.
+
+Les réponses en flux (export CSV) ne comptent que les requêtes faites avant le
+premier octet.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Bornes supérieures des classes d'histogramme (la dernière classe est ouverte)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+MS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Instructions répétées retenues par endpoint
+MAX_DUPLICATES = 10
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def fingerprint(sql):
+    """SQL sans littéraux ni longueur de liste IN: regroupe les variantes d'une même requête"""
+    return IN_LIST.sub('IN (...)', LITERAL.sub('?', sql))
+
+
+def duplicates(statements, threshold=2):
+    """{empreinte: occurrences} des instructions exécutées au moins ``threshold`` fois"""
+    counts = Counter(fingerprint(sql) for sql in statements)
+    return {sql: count for sql, count in counts.items() if count >= threshold}
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """Borne supérieure de la classe contenant le rang demandé (maximum pour la dernière)"""
+        rank = fraction * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        labels = [f'<={bound}' for bound in self.bounds] + [f'>{self.bounds[-1]}']
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'mean': round(self.sum / self.total, 2) if self.total else 0,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'max': round(self.max, 2),
+        }
+
+
+class EndpointStats:
+    def __init__(self):
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_ms = Histogram(MS_BUCKETS)
+        self.view_ms = Histogram(MS_BUCKETS)
+        # empreinte -> [requêtes HTTP concernées, répétitions maximales]
+        self.duplicates = {}
+
+
+class RequestStats:
+    """Histogrammes par endpoint, en mémoire du processus"""
+
+    def __init__(self):
+        self._endpoints = defaultdict(EndpointStats)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, queries, sql_ms, view_ms, repeated):
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            stats.queries.add(queries)
+            stats.sql_ms.add(sql_ms)
+            stats.view_ms.add(view_ms)
+            for sql, count in repeated.items():
+                entry = stats.duplicates.get(sql)
+                if entry is None:
+                    if len(stats.duplicates) >= MAX_DUPLICATES:
+                        continue
+                    entry = stats.duplicates[sql] = [0, 0]
+                entry[0] += 1
+                entry[1] = max(entry[1], count)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    'requests': stats.queries.total,
+                    'queries': stats.queries.snapshot(),
+                    'sql_ms': stats.sql_ms.snapshot(),
+                    'view_ms': stats.view_ms.snapshot(),
+                    'duplicates': [
+                        {'sql': sql, 'requests': requests, 'max_repeats': repeats}
+                        for sql, (requests, repeats) in sorted(
+                            stats.duplicates.items(), key=lambda item: -item[1][0]
+                        )
+                    ],
+                }
+                for endpoint, stats in sorted(self._endpoints.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+request_stats = RequestStats()
+
+
+class QueryRecorder:
+    """``execute_wrapper`` de la connexion: compte et chronomètre chaque instruction"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        view_ms = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        endpoint = f'{request.method} {match.view_name if match else "unresolved"}'
+        repeated = {}
+        if len(recorder.statements) < recorder.count:
+            # Empreintes calculées seulement quand une instruction s'est répétée
+            repeated = duplicates(recorder.statements.elements())
+        request_stats.record(endpoint, recorder.count, recorder.seconds * 1000, view_ms, repeated)
+
+        budget = getattr(settings, 'QUERY_BUDGET', None)
+        if budget is not None and recorder.count > budget:
+            worst = max(repeated.items(), key=lambda item: item[1], default=('-', 0))
+            logger.warning(
+                '%s: %d requêtes SQL (budget %d), %.1f ms SQL; la plus répétée (%d fois): %s',
+                endpoint, recorder.count, budget, recorder.seconds * 1000, worst[1], worst[0],
+            )
+        return response
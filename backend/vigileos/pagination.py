@@ -0,0 +1,192 @@
+"""
+Pagination par clé (keyset) pour les grandes collections (mesures, alertes).
+
+La page suivante se lit par ``WHERE (champ, id) < (dernière valeur, dernier id)``
+sur l'index composite (champ, id): son coût ne dépend pas de sa profondeur,
+contrairement à un OFFSET. Le champ est le premier de l'ordre demandé
+(``?ordering=`` ou ``ordering`` de la vue), départagé par l'id. Le total n'est
+calculé que sur demande: ``?count=exact`` ou ``?count=estimate`` (estimation du
+planificateur PostgreSQL, décompte plafonné ailleurs).
+
+``?page=N`` et un tri sur un champ nullable gardent la pagination par numéro
+de page, pour les clients existants.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_ESTIMATE_CAP = 10000
+
+
+def estimate_count(queryset):
+    """(nombre, estimé?) sans parcourir toute la table"""
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+    count = queryset.order_by()[:COUNT_ESTIMATE_CAP + 1].count()
+    return min(count, COUNT_ESTIMATE_CAP), count > COUNT_ESTIMATE_CAP
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Curseur invalide'
+
+    def __init__(self):
+        self.legacy = None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.REST_FRAMEWORK['PAGE_SIZE']
+        return max(1, min(size, self.max_page_size))
+
+    def get_keyset(self, request, queryset, view):
+        """(champ, décroissant) ou None quand l'ordre demandé ne se prête pas au keyset"""
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        ordering = ordering or getattr(view, 'ordering', None) or queryset.model._meta.ordering
+        if not ordering or 'page' in request.query_params:
+            return None
+        if any(name.lstrip('-') not in ('id', 'pk') for name in ordering[1:]):
+            return None
+        name = ordering[0].lstrip('-')
+        try:
+            field = queryset.model._meta.pk if name == 'pk' else queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation (score de recherche...): pas de clé stable
+            return None
+        if field.null:
+            return None
+        return field, ordering[0].startswith('-')
+
+    def encode_cursor(self, row, previous):
+        value = getattr(row, self.field.attname)
+        payload = {
+            'v': value.isoformat() if isinstance(value, datetime) else value,
+            'id': row.pk,
+            'p': int(previous),
+        }
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            return self.field.to_python(payload['v']), int(payload['id']), bool(payload['p'])
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+
+    def after(self, value, pk, descending):
+        """Lignes strictement après (value, pk) dans l'ordre donné"""
+        name = self.field.name
+        strict, inclusive = ('lt', 'lte') if descending else ('gt', 'gte')
+        # Borne redondante sur le seul champ: condition d'accès directe à l'index
+        return Q(**{f'{name}__{inclusive}': value}) & (
+            Q(**{f'{name}__{strict}': value}) | Q(**{name: value, f'pk__{strict}': pk})
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        keyset = self.get_keyset(request, queryset, view)
+        if keyset is None:
+            self.legacy = PageNumberPagination()
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.field, descending = keyset
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        backwards = bool(cursor and cursor[2])
+        reverse = descending != backwards
+
+        self.count = None
+        count_mode = request.query_params.get('count')
+        if count_mode == 'exact':
+            self.count, self.count_estimated = queryset.count(), False
+        elif count_mode == 'estimate':
+            self.count, self.count_estimated = estimate_count(queryset)
+
+        prefix = '-' if reverse else ''
+        rows = queryset.order_by(f'{prefix}{self.field.name}', f'{prefix}pk')
+        if cursor:
+            rows = rows.filter(self.after(cursor[0], cursor[1], reverse))
+        rows = list(rows[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        self.next = self.encode_cursor(rows[-1], previous=False) if rows and has_next else None
+        self.previous = self.encode_cursor(rows[0], previous=True) if rows and has_previous else None
+        return rows
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.legacy:
+            return self.legacy.get_paginated_response(data)
+        payload = {'next': self.get_link(self.next), 'previous': self.get_link(self.previous)}
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_estimated'] = self.count_estimated
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': 'Avec ?count=exact ou ?count=estimate'},
+                'count_estimated': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': 'Curseur de page (liens next / previous)', 'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param, 'required': False, 'in': 'query',
+                'description': f'Taille de page (max {self.max_page_size})', 'schema': {'type': 'integer'},
+            },
+            {
+                'name': 'count', 'required': False, 'in': 'query',
+                'description': 'Total: exact ou estimate', 'schema': {'type': 'string', 'enum': ['exact', 'estimate']},
+            },
+        ]
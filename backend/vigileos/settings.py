@@ -32,9 +32,13 @@ INSTALLED_APPS = [
     'equipment',
     'alerts',
     'metrics',
+    'dashboard',
+    'sync',
+    'realtime',
 ]
 
 MIDDLEWARE = [
+    'vigileos.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -64,6 +68,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'vigileos.wsgi.application'
+ASGI_APPLICATION = 'vigileos.asgi.application'
 
 # Database
 # Configuration pour développement avec SQLite
@@ -86,6 +91,15 @@ DATABASES = {
 #     }
 # }
 
+# Cache: mémoire locale par défaut (développement, tests), backend partagé en production
+# (ex. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://redis:6379/1)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'vigileos'),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -125,7 +139,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -158,3 +172,29 @@ CORS_ALLOWED_ORIGINS = [
     "https://vigileospro.com",
 ]
 CORS_ALLOW_CREDENTIALS = True
+
+# Flux temps réel (/api/realtime/stream/): PostgresBroker dès qu'il y a plusieurs processus
+REALTIME_BROKER = os.environ.get('REALTIME_BROKER', 'realtime.brokers.LocalBroker')
+# Événements en attente par connexion avant resynchronisation du client
+REALTIME_QUEUE_SIZE = int(os.environ.get('REALTIME_QUEUE_SIZE', 256))
+REALTIME_HEARTBEAT = 15
+
+# Requêtes SQL par requête HTTP au-delà desquelles un avertissement est journalisé (/api/perf/ pour le détail)
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 50))
+
+# Durée de vie en secondes de l'identité mise en cache par l'authentification JWT
+PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 300))
+
+# Rétention des traces de suppression (?updated_since=): un curseur plus ancien impose une resynchronisation complète
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Taille maximale, une fois décompressé, d'un corps envoyé à /api/metrics/ingest/ (413 au-delà)
+METRICS_INGEST_MAX_BYTES = int(os.environ.get('METRICS_INGEST_MAX_BYTES', 256 * 1024 * 1024))
+
+# Rétention des mesures, en jours, par résolution (brut et cumuls 1m/1h/1d)
+METRICS_RETENTION_DAYS = {
+    'raw': int(os.environ.get('METRICS_RETENTION_RAW_DAYS', 14)),
+    '1m': int(os.environ.get('METRICS_RETENTION_1M_DAYS', 30)),
+    '1h': int(os.environ.get('METRICS_RETENTION_1H_DAYS', 730)),
+    '1d': int(os.environ.get('METRICS_RETENTION_1D_DAYS', 730)),
+}
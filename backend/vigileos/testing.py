@@ -0,0 +1,32 @@
+"""Outils de test partagés"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from .middleware import duplicates
+
+
+class QueryBudgetMixin:
+    """À mélanger à un TestCase: plafonds de requêtes SQL par endpoint"""
+
+    @contextmanager
+    def assertMaxQueries(self, num, using=DEFAULT_DB_ALIAS):
+        """
+        Échoue si le bloc exécute plus de ``num`` requêtes; le message liste les
+        instructions répétées (N+1) puis toutes les requêtes.
+        """
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context)
+        if executed <= num:
+            return
+        statements = [query['sql'] for query in context.captured_queries]
+        repeated = sorted(duplicates(statements).items(), key=lambda item: -item[1])
+        lines = [f'{executed} requêtes exécutées, {num} au plus attendues']
+        if repeated:
+            lines.append('Répétées:')
+            lines.extend(f'  {count}x {sql}' for sql, count in repeated)
+        lines.append('Requêtes:')
+        lines.extend(f'  {index}. {sql}' for index, sql in enumerate(statements, start=1))
+        self.fail('\n'.join(lines))
@@ -0,0 +1,218 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from alerts.models import Alert
+from equipment.models import Equipment
+from metrics.models import AlertThreshold, NetworkMetric
+from rest_framework_simplejwt.tokens import AccessToken
+from sites.models import Site
+from users.models import Company
+from .cache import cache_stats
+from .middleware import QueryBudgetMiddleware, request_stats
+from .testing import QueryBudgetMixin
+
+User = get_user_model()
+
+# Plafonds de requêtes SQL par endpoint, indépendants du volume de données
+ENDPOINT_BUDGETS = {
+    '/api/sites/': 2,
+    '/api/sites/{site}/equipment/': 2,
+    '/api/equipment/': 2,
+    '/api/equipment/stats/': 1,
+    '/api/equipment/{equipment}/alerts/': 2,
+    '/api/alerts/': 1,
+    '/api/alerts/stats/': 1,
+    '/api/alerts/critical/': 1,
+    '/api/metrics/': 1,
+    '/api/metrics/latest/': 1,
+    '/api/metrics/summary/': 1,
+    '/api/thresholds/': 2,
+    '/api/threshold-profiles/': 2,
+    '/api/dashboard/overview/': 3,
+    '/api/auth/companies/{company}/stats/': 4,
+}
+
+
+def create_fleet(company, sites=3, equipment_per_site=4, samples=3):
+    now = timezone.now()
+    equipment = []
+    for i in range(sites):
+        site = Site.objects.create(name=f'Site {i}', address='-', company=company)
+        for j in range(equipment_per_site):
+            equipment.append(Equipment.objects.create(name=f'Équipement {i}.{j}', type='switch', site=site))
+    NetworkMetric.objects.bulk_create([
+        NetworkMetric(equipment=item, timestamp=now - timedelta(minutes=k), cpu_usage=50)
+        for item in equipment for k in range(samples)
+    ])
+    AlertThreshold.objects.bulk_create([AlertThreshold(equipment=item) for item in equipment])
+    Alert.objects.bulk_create([
+        Alert(title='Alerte', message='-', equipment=item, type='error') for item in equipment
+    ])
+    return equipment
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name='ACME')
+        self.user = User.objects.create_user('acme', password='acme', company=self.company)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.equipment = create_fleet(self.company)
+
+    def test_endpoint_budgets(self):
+        ids = {'company': self.company.pk, 'site': self.equipment[0].site_id, 'equipment': self.equipment[0].pk}
+        for url, budget in ENDPOINT_BUDGETS.items():
+            url = url.format(**ids)
+            with self.subTest(url=url):
+                with self.assertMaxQueries(budget):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_jwt_identity_served_from_cache(self):
+        self.client.force_authenticate(user=None)
+        login = self.client.post('/api/auth/login/', {'username': 'acme', 'password': 'acme'})
+        self.assertEqual(login.status_code, 200)
+        self.assertEqual(login.data['user']['company']['id'], self.company.pk)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {login.data['access']}")
+        # Même budget qu'avec force_authenticate: aucune lecture de l'utilisateur
+        with self.assertMaxQueries(ENDPOINT_BUDGETS['/api/equipment/']):
+            response = self.client.get('/api/equipment/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), len(self.equipment))
+
+    def test_deactivation_invalidates_cached_identity(self):
+        other = User.objects.create_user('other', password='other', company=self.company)
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(other)}')
+        self.assertEqual(self.client.get('/api/sites/').status_code, 200)
+
+        self.client.credentials()
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.post(f'/api/auth/users/{other.pk}/deactivate/').status_code, 200)
+
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(other)}')
+        self.assertEqual(self.client.get('/api/sites/').status_code, 401)
+
+    def test_failure_lists_repeated_queries(self):
+        with self.assertRaises(AssertionError) as raised:
+            with self.assertMaxQueries(2):
+                for item in Equipment.objects.all():
+                    item.site.name
+        self.assertIn(f'{len(self.equipment) + 1} requêtes exécutées, 2 au plus attendues', str(raised.exception))
+        self.assertIn(f'{len(self.equipment)}x SELECT', str(raised.exception))
+
+
+class PerfStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_stats.reset()
+        request_stats.reset()
+        self.company = Company.objects.create(name='ACME')
+        self.user = User.objects.create_user('acme', password='acme', company=self.company)
+        self.staff = User.objects.create_user('admin', password='admin', company=self.company, is_staff=True)
+        self.client = APIClient()
+        create_fleet(self.company, sites=1)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get('/api/perf/').status_code, 403)
+
+    def test_histograms_by_endpoint(self):
+        self.client.force_authenticate(user=self.user)
+        for _ in range(3):
+            self.client.get('/api/alerts/')
+        self.client.force_authenticate(user=self.staff)
+        data = self.client.get('/api/perf/').json()
+        stats = data['endpoints']['GET alert-list']
+        self.assertEqual(stats['requests'], 3)
+        # Premier appel lu en base, les suivants servis par le cache de réponses
+        self.assertEqual(stats['queries']['buckets']['<=0'], 2)
+        self.assertEqual(stats['queries']['buckets']['<=1'], 1)
+        self.assertEqual(stats['duplicates'], [])
+        self.assertEqual(data['cache']['alert-list'], {'hits': 2, 'misses': 1, 'hit_rate': 0.667})
+
+        self.assertEqual(self.client.delete('/api/perf/').status_code, 204)
+        self.assertNotIn('GET alert-list', self.client.get('/api/perf/').json()['endpoints'])
+
+    def test_repeated_queries_recorded(self):
+        def view(request):
+            # N+1: une lecture du site par équipement
+            for item in Equipment.objects.all():
+                item.site.name
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        QueryBudgetMiddleware(view)(request)
+        stats = request_stats.snapshot()['GET unresolved']
+        self.assertEqual(stats['queries']['max'], 5)
+        self.assertEqual(len(stats['duplicates']), 1)
+        self.assertEqual(stats['duplicates'][0]['max_repeats'], 4)
+        self.assertIn('"sites_site"', stats['duplicates'][0]['sql'])
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_stats.reset()
+        self.clients = {}
+        for name in ('ACME', 'Autre'):
+            company = Company.objects.create(name=name)
+            client = APIClient()
+            client.force_authenticate(user=User.objects.create_user(name.lower(), password='-', company=company))
+            self.clients[name] = client
+            create_fleet(company, sites=2, equipment_per_site=1, samples=1)
+        self.client = self.clients['ACME']
+        self.company = Company.objects.get(name='ACME')
+
+    def values(self, url, field, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row[field] for row in response.json()['results']]
+
+    def test_save_invalidates_list(self):
+        self.assertEqual(self.values('/api/sites/', 'name'), ['Site 0', 'Site 1'])
+        site = Site.objects.get(company=self.company, name='Site 1')
+        site.name = 'Entrepôt'
+        site.save()
+        self.assertEqual(self.values('/api/sites/', 'name'), ['Entrepôt', 'Site 0'])
+
+    def test_bulk_acknowledge_invalidates_list(self):
+        self.assertEqual(set(self.values('/api/alerts/', 'status')), {'active'})
+        response = self.client.post('/api/alerts/bulk_acknowledge/', {'filter': {'status': 'active'}}, format='json')
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(set(self.values('/api/alerts/', 'status')), {'acknowledged'})
+
+    def test_update_path_invalidates_list(self):
+        # Statut recalculé par Equipment.objects.update() à l'ingestion d'une mesure hors ligne
+        Alert.objects.all().delete()
+        self.assertEqual(set(self.values('/api/equipment/', 'status')), {'online'})
+        equipment = Equipment.objects.filter(company=self.company)
+        NetworkMetric.objects.bulk_create([NetworkMetric(equipment=item, is_online=False) for item in equipment])
+        self.assertEqual(set(self.values('/api/equipment/', 'status')), {'offline'})
+
+    def test_tenants_isolated(self):
+        for name, client in self.clients.items():
+            owned = Equipment.objects.filter(company__name=name).values_list('pk', flat=True)
+            self.assertEqual(sorted(self.values('/api/equipment/', 'id', client)), sorted(owned))
+        # Écriture chez ACME: la réponse en cache de l'autre entreprise reste valable
+        Site.objects.filter(company=self.company).first().save()
+        cache_stats.reset()
+        for client in self.clients.values():
+            client.get('/api/equipment/')
+        self.assertEqual(cache_stats.snapshot()['equipment-list'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_hit_and_miss_counters(self):
+        for _ in range(3):
+            self.client.get('/api/sites/')
+        self.client.get('/api/sites/', {'page': 1})
+        etag = self.client.get('/api/sites/')['ETag']
+        self.assertEqual(self.client.get('/api/sites/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(cache_stats.snapshot()['site-list'], {'hits': 4, 'misses': 2, 'hit_rate': 0.667})
@@ -4,6 +4,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from .views import PerfStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
@@ -11,6 +13,8 @@ urlpatterns = [
     path('api/', include('equipment.urls')),
     path('api/', include('alerts.urls')),
     path('api/', include('metrics.urls')),
+    path('api/dashboard/', include('dashboard.urls')),
+    path('api/perf/', PerfStatsView.as_view(), name='perf'),
     
     # Documentation API
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
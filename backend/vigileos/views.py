@@ -0,0 +1,20 @@
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .cache import cache_stats
+from .middleware import request_stats
+
+
+class PerfStatsView(APIView):
+    """Histogrammes par endpoint (requêtes SQL, durées, N+1) et taux de succès du cache, par processus"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'endpoints': request_stats.snapshot(), 'cache': cache_stats.snapshot()})
+
+    def delete(self, request):
+        request_stats.reset()
+        cache_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)